@@ -0,0 +1,144 @@
+# bench_chunking.py
+# Blocks and tokens sent to the LLM per page: the old 5000-char windows with 500 chars of
+# overlap (scraper.chunk_text) against the DOM block packing of chunker.chunk_blocks, with
+# every link and image (LLM_MEDIA=all) and with the compact ones only (LLM_MEDIA=compact).
+#
+#   python bench/bench_chunking.py train_model/html_pages
+#   python bench/bench_chunking.py --synthetic 20          # generated staff directory pages
+#   python bench/bench_chunking.py --synthetic 5 --llm     # also time extraction on Ollama
+#
+# "cards cut" counts list items, table rows, articles and card/profile/person/member
+# elements that a block boundary runs through: some block holds only a part of them
+# (the overlap may repeat the whole card in the next block, the LLM still sees the half).
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import load_corpus
+
+CARD_XPATH = (
+    "//li | //tr | //article | //*[contains(@class, 'card') or contains(@class, 'profile')"
+    " or contains(@class, 'person') or contains(@class, 'member')]"
+)
+MEDIA = re.compile(r"<img [^>]*>|</?block>")
+ANCHOR = re.compile(r"<a href='[^']*'>(.*?)</a>")
+
+
+def synthetic_page(i: int, people: int) -> str:
+    nav = "".join(f'<li><a href="/section/{k}">Section {k}</a></li>' for k in range(25))
+    cards = "".join(
+        f'<div class="member-card"><img src="/img/{i}-{k}.jpg" alt="Dr. Person {i}-{k}">'
+        f'<h3><a href="/faculty/person-{i}-{k}">Dr. Person {i}-{k}</a></h3><p>Associate Professor, Department of Physics {k % 5}</p>'
+        f'<p>Email: <a href="mailto:person{i}.{k}@example.edu">person{i}.{k}@example.edu</a> | Phone: +880 1711-{k:06d}</p>'
+        f"<p>Research on condensed matter, thin films and teaching of undergraduate laboratory courses. "
+        f"Supervises graduate students and leads the materials group since {2000 + k % 20}.</p>"
+        f'<a href="/faculty/person-{i}-{k}/publications">Publications</a> <a href="/faculty/person-{i}-{k}/courses">Courses</a> '
+        f'<a href="https://www.linkedin.com/in/person-{i}-{k}">LinkedIn</a></div>'
+        for k in range(people)
+    )
+    related = "".join(
+        f'<li><img src="/icons/{k}.svg" alt=""><a href="/programs/{k}">Undergraduate program {k}</a></li>'
+        for k in range(30)
+    )
+    return (
+        f"<html><head><title>Faculty {i}</title></head><body><nav><ul>{nav}</ul></nav>"
+        f'<main><div class="banner"><img src="/img/campus.jpg" alt="Campus"></div>'
+        f'<div class="breadcrumb"><a href="/">Home</a> / <a href="/faculty">Faculty</a></div>'
+        f"<section><h1>Faculty members</h1><p>Our department has {people} members.</p>{cards}</section>"
+        f'<section class="related"><h2>Programs</h2><ul>{related}</ul></section>'
+        f"<section><h2>Cookies</h2><p>{'We use cookies to improve your experience. ' * 10}</p></section></main>"
+        f"<footer><p>Copyright</p></footer></body></html>"
+    )
+
+
+def squash(text: str, media: str = "all") -> str:
+    # text only; with LLM_MEDIA=all an anchor's text also follows its <a> entry, with
+    # compact only the entry holds it
+    text = ANCHOR.sub(r"\1" if media == "compact" else " ", MEDIA.sub(" ", text))
+    return "".join(text.split())
+
+
+def cards_cut(page_source: str, text: str, blocks, media: str) -> int:
+    import lxml.html
+    root = lxml.html.document_fromstring(page_source)
+    for el in root.xpath("//nav | //header | //footer | //script | //style"):
+        el.drop_tree()
+    squashed = [squash(b, media) for b in blocks]
+    whole = squash(text)
+    cut = 0
+    for card in root.xpath(CARD_XPATH):
+        card_text = "".join(card.text_content().split())
+        if len(card_text) < 48 or card_text not in whole:
+            continue
+        head, tail = unique_end(card_text, whole, True), unique_end(card_text, whole, False)
+        if any((head and head in b or tail and tail in b) and card_text not in b for b in squashed):
+            cut += 1
+    return cut
+
+
+def unique_end(card_text: str, whole: str, start: bool):
+    # shortest prefix (or suffix) of the card found only once on the page
+    for n in range(24, len(card_text) + 1, 8):
+        piece = card_text[:n] if start else card_text[-n:]
+        if whole.count(piece) == 1:
+            return piece
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default=os.path.join("train_model", "html_pages"))
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N pages instead of reading a folder")
+    parser.add_argument("--people", type=int, default=40, help="cards per synthetic page")
+    parser.add_argument("--llm", action="store_true", help="time extraction of every block (needs Ollama)")
+    args = parser.parse_args()
+
+    from scraper import chunk_text
+    from html_parse import parse_html
+    from chunker import chunk_blocks, count_tokens, get_tokenizer, wrap, CHUNK_TOKENS
+
+    if args.synthetic:
+        pages = [(f"http://bench.local/faculty-{i}", synthetic_page(i, args.people)) for i in range(args.synthetic)]
+    else:
+        pages = load_corpus(args.folder)
+    if not pages:
+        print(f"No .html files found in {args.folder} (try --synthetic 20)")
+        return
+
+    methods = {
+        "5000-char windows": ("all", lambda page: chunk_text(page["text"], chunk_size=5000, overlap=500)),
+        f"DOM blocks ({CHUNK_TOKENS} tok)": ("all", lambda page: chunk_blocks(page["blocks"])),
+        "DOM blocks, compact media": ("compact", lambda page: chunk_blocks(page["blocks"])),
+    }
+    envelope = count_tokens(wrap(""))
+    print(f"{len(pages)} pages, tokens counted with {get_tokenizer()[0]}\n")
+    print(f"{'method':<28}{'blocks/page':>12}{'tokens/page':>13}{'overlap tok':>13}{'cards cut':>11}{'LLM s/page':>12}")
+    for name, (media, chunk) in methods.items():
+        blocks = tokens = overlap = cut = 0
+        llm_seconds = 0.0
+        for url, html in pages:
+            page = parse_html(url, html, media=media)
+            out = chunk(page)
+            blocks += len(out)
+            sent = sum(count_tokens(b) for b in out)
+            tokens += sent
+            # tokens sent beyond the page's own content (the <block> envelope included)
+            overlap += max(0, sent - count_tokens(page["text"]) - len(out) * envelope)
+            cut += cards_cut(html, page["text"], out, media)
+            if args.llm:
+                from llm_extractor import send_to_ollama_chunk
+                start = time.perf_counter()
+                for b in out:
+                    send_to_ollama_chunk(b)
+                llm_seconds += time.perf_counter() - start
+        n = len(pages)
+        llm = f"{llm_seconds / n:.1f}" if args.llm else "-"
+        print(f"{name:<28}{blocks / n:>12.1f}{tokens / n:>13.0f}{overlap / n:>13.0f}{cut:>11}{llm:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# bench_distributed.py
+# Scaling of the lease-based distributed mode with 1, 2, 4... local worker processes
+# against a local MongoDB (MONGO_URI) and a synthetic site served on 127.0.0.1..N.
+#
+#   python bench/bench_distributed.py --workers 1,2,4 --hosts 8 --pages 40 --work-ms 200
+#
+# One distributed job per host. Pages are fetched over HTTP and parsed for real; the
+# LLM step is replaced by --work-ms of sleep so the run needs no Ollama. Per-host
+# politeness (--delay) is enforced across all workers through scraperdb.hosts.
+import os
+import sys
+import time
+import argparse
+import threading
+import multiprocessing as mp
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = (
+    "Our team works with partners across the region on research, consulting and training. "
+    "Contact the office for details about upcoming events, publications and open positions. "
+)
+
+
+def make_page(host: str, port: int, i: int, pages: int) -> bytes:
+    links = "".join(
+        f'<li><a href="http://{host}:{port}/p/{(i * 3 + k) % pages}">Page {(i * 3 + k) % pages}</a></li>'
+        for k in range(1, 4)
+    )
+    body = "".join(f"<p>{PARAGRAPH}</p>" for _ in range(6))
+    return (
+        f"<html><head><title>Page {i}</title></head><body><h1>Page {i}</h1>"
+        f"{body}<ul>{links}</ul></body></html>"
+    ).encode("utf-8")
+
+
+def serve(host: str, port: int, pages: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith("/p/"):
+                self.send_error(404)
+                return
+            body = make_page(host, port, int(self.path.rsplit("/", 1)[-1]), pages)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_handler(url, job, previous):
+    from fetcher import fetch_static
+    from scraper import parse_page
+    html, meta = fetch_static(url)
+    if html is None:
+        raise RuntimeError(f"static fetch failed: {meta}")
+    parsed = parse_page(url, html)
+    time.sleep(int(os.environ.get("BENCH_WORK_MS", "0")) / 1000)
+    return {"url": url, "title": parsed["title"], "base_links": parsed["base_links"], "bench": True}
+
+
+def run_worker(delay: float):
+    from distributed import DistributedWorker
+    from politeness import SharedHostRateLimiter
+    worker = DistributedWorker(handler=bench_handler, limiter=SharedHostRateLimiter(delay))
+    worker.run(idle_exit=3.0, poll=0.2)
+
+
+def run_round(workers: int, hosts, port: int, pages: int, delay: float):
+    from db import get_db
+    from scheduler import submit_crawl
+    db = get_db()
+    db["hosts"].delete_many({"_id": {"$in": [f"{h}:{port}" for h in hosts]}})
+
+    job_ids = []
+    for host in hosts:
+        job_id, error = submit_crawl(f"http://{host}:{port}/p/0", max_pages=pages, max_depth=100, distributed=True)
+        if error:
+            raise RuntimeError(error)
+        job_ids.append(job_id)
+
+    start = time.perf_counter()
+    processes = [mp.Process(target=run_worker, args=(delay,)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    while db["progress"].count_documents({"job_id": {"$in": job_ids}, "status": "running"}):
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    for p in processes:
+        p.join()
+    # workers write progress behind, the counts are final once they exited
+    done = sum(d.get("done", 0) for d in db["progress"].find({"job_id": {"$in": job_ids}}, {"done": 1}))
+
+    db["progress"].delete_many({"job_id": {"$in": job_ids}})
+    db["data"].delete_many({"bench": True})
+    return done, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=40, help="max pages per job (one job per host)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--work-ms", type=int, default=200, help="simulated LLM time per page")
+    parser.add_argument("--delay", type=float, default=0.1, help="per-host politeness delay")
+    args = parser.parse_args()
+
+    os.environ["BENCH_WORK_MS"] = str(args.work_ms)
+    # only the benchmark's workers take part, no scheduler pool of this process
+    os.environ["MAX_CONCURRENT_JOBS"] = "0"
+    hosts = [f"127.0.0.{i}" for i in range(1, args.hosts + 1)]
+    servers = [serve(h, args.port, args.pages * 2) for h in hosts]
+
+    print(f"{'workers':>8}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'efficiency':>12}")
+    base = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        done, elapsed = run_round(workers, hosts, args.port, args.pages, args.delay)
+        rate = done / elapsed
+        base = base or rate / workers
+        print(f"{workers:>8}{done:>8}{elapsed:>10.2f}{rate:>10.1f}{rate / (base * workers):>11.0%}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
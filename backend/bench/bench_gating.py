@@ -0,0 +1,126 @@
+# bench_gating.py
+# Blocks and tokens kept away from the LLM by gating.gate_page, and the recall cost of it:
+# the labeled profiles of train_model/dataset/eval_dataset.jsonl are placed on a page with
+# a menu, a cookie banner, a news link list and a legal footer, and every labeled name,
+# email and phone must still reach the LLM. Generated pages without people (dated events,
+# courses with fees, priced products, in the same chrome) check that every event, course
+# and product name, date and price gets through too.
+#
+#   python bench/bench_gating.py
+#   python bench/bench_gating.py --folder train_model/html_pages   # skipped share only
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parse import load_corpus
+
+DATASET = os.path.join("train_model", "dataset", "eval_dataset.jsonl")
+
+
+def labeled_page(i: int, profile_text: str) -> str:
+    menu = "".join(f'<a href="/{w.lower()}">{w}</a> ' for w in ["Home", "About Us", "Academics", "Admissions", "Research", "News", "Contact"])
+    news = "".join(f'<li><a href="/news/{k}">Campus update number {k} for this week</a></li>' for k in range(12))
+    return (
+        f"<html><head><title>Profile {i}</title></head><body>"
+        f'<div class="top-menu">{menu}</div>'
+        f'<div class="cookie-banner"><p>We use cookies to give you the best experience. '
+        f'By continuing you consent to our use of cookies.</p><a href="/cookies">Cookie settings</a> <a href="/accept">Accept all</a></div>'
+        f'<div class="profile-card">{profile_text}</div>'
+        f'<div class="sidebar"><h3>Latest news</h3><ul>{news}</ul></div>'
+        f'<div class="legal">© 2025 Example University. All rights reserved. '
+        f'<a href="/privacy">Privacy Policy</a> | <a href="/terms">Terms of Use</a></div>'
+        f"</body></html>"
+    )
+
+
+def labeled_listing_page(i: int):
+    # (html, labels) of a page with nobody on it: dated events, courses with fees or priced
+    # products, one kind per page in turn
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    kind = i % 3
+    if kind == 0:
+        items = [(f"Open workshop on water quality {i}-{k}", f"{k + 3} {months[(i + k) % 12]} 2025") for k in range(6)]
+        listing = "<h2>Upcoming events</h2><ul>" + "".join(
+            f"<li><h4>{name}</h4><p>{date}, Main auditorium. Free entry, registration required.</p></li>" for name, date in items
+        ) + "</ul>"
+    elif kind == 1:
+        items = [(f"Certificate in applied statistics {i}-{k}", f"BDT {12000 + 500 * k:,}") for k in range(4)]
+        listing = "<h2>Short courses</h2><table>" + "".join(
+            f"<tr><td>{name}</td><td>12 weeks</td><td>Fee: {fee}</td></tr>" for name, fee in items
+        ) + "</table>"
+    else:
+        items = [(f"Lab notebook edition {i}-{k}", f"${15 + k}.50") for k in range(4)]
+        listing = "<h2>Shop</h2>" + "".join(
+            f'<div class="product"><h4>{name}</h4><p>Price {price}</p></div>' for name, price in items
+        )
+    html = labeled_page(i, "").replace('<div class="profile-card"></div>', f"<section>{listing}</section>")
+    return html, [v for pair in items for v in pair]
+
+
+def labels(completion: str):
+    try:
+        person = json.loads(completion)
+    except json.JSONDecodeError:
+        return []
+    values = [person.get("name") or ""] + list(person.get("email") or []) + list(person.get("phone") or [])
+    return [v for v in values if v]
+
+
+def run(pages, gated: bool):
+    import gating
+    from chunker import chunk_blocks, count_tokens
+    from html_parse import parse_html
+
+    blocks = sent_blocks = tokens = sent_tokens = found = wanted = 0
+    for url, html, expected in pages:
+        tree = parse_html(url, html)["blocks"]
+        everything = chunk_blocks(tree)
+        blocks += len(everything)
+        tokens += sum(count_tokens(b) for b in everything)
+        gating.GATE_BLOCKS = gated
+        out, stats = gating.gate_page(tree)
+        sent_blocks += stats["blocks_sent"]
+        sent_tokens += stats["tokens_sent"]
+        text = " ".join(out)
+        wanted += len(expected)
+        found += sum(1 for v in expected if v in text)
+    return blocks, sent_blocks, tokens, sent_tokens, found, wanted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--folder", help="unlabeled .html pages instead of the dataset")
+    parser.add_argument("--listings", type=int, default=20, help="generated event/course/product pages")
+    args = parser.parse_args()
+
+    if args.folder:
+        pages = [(url, html, []) for url, html in load_corpus(args.folder)]
+    else:
+        with open(args.dataset, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        pages = [(f"http://bench.local/profile-{i}", labeled_page(i, r["prompt"]), labels(r["completion"])) for i, r in enumerate(rows)]
+    sets = {"profiles": pages}
+    if not args.folder and args.listings:
+        sets["listings"] = [(f"http://bench.local/listing-{i}", *labeled_listing_page(i)) for i in range(args.listings)]
+    if not pages:
+        print("No pages")
+        return
+
+    print(f"{'pages':<14}{'gating':<8}{'blocks':>8}{'sent':>8}{'skipped':>9}{'tokens':>9}{'sent':>9}{'skipped':>9}{'recall':>9}")
+    for name, pages in sets.items():
+        for gated in (False, True):
+            blocks, sent_blocks, tokens, sent_tokens, found, wanted = run(pages, gated)
+            recall = f"{found / wanted:.1%}" if wanted else "-"
+            print(
+                f"{f'{name} ({len(pages)})':<14}{'on' if gated else 'off':<8}{blocks:>8}{sent_blocks:>8}"
+                f"{1 - sent_blocks / max(1, blocks):>9.1%}{tokens:>9}{sent_tokens:>9}"
+                f"{1 - sent_tokens / max(1, tokens):>9.1%}{recall:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# bench_parse.py
+# Compares the old BeautifulSoup parse in scrape_website (two html.parser trees +
+# extract_text_with_media) against html_parse.parse_html on a folder of saved pages.
+#
+#   python bench/bench_parse.py train_model/html_pages --repeat 3
+#
+# Each method runs in its own subprocess so peak RSS is not shared between them.
+import os
+import sys
+import glob
+import json
+import time
+import resource
+import argparse
+import subprocess
+from urllib.parse import urljoin, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_corpus(folder):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*.htm*"), recursive=True)):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((f"http://bench.local/{os.path.basename(path)}", f.read()))
+    return pages
+
+
+def parse_old(url, page_source):
+    from bs4 import BeautifulSoup
+    from scraper import extract_text_with_media
+
+    soup = BeautifulSoup(page_source, "html.parser")
+    soup_for_base_url = BeautifulSoup(page_source, "html.parser")
+    base_domain = urlparse(url).netloc
+    base_links, external_links = [], []
+    for a in soup_for_base_url.find_all("a", href=True):
+        abs_link = urljoin(url, a["href"])
+        link_domain = urlparse(abs_link).netloc
+        if link_domain == base_domain and abs_link not in base_links:
+            base_links.append(abs_link)
+        elif link_domain != base_domain and not abs_link.startswith("mailto:") and not abs_link.startswith("tel:"):
+            external_links.append(abs_link)
+    text = extract_text_with_media(soup)
+    return {
+        "title": soup.title.get_text(strip=True) if soup.title else None,
+        "base_links": list(set(base_links)),
+        "external_links": list(set(external_links)),
+        "text": text,
+    }
+
+
+def parse_new(url, page_source):
+    from html_parse import parse_html
+    return parse_html(url, page_source)
+
+
+def run_method(method, folder, repeat):
+    pages = load_corpus(folder)
+    fn = parse_old if method == "old" else parse_new
+    fn(*pages[0])  # warm imports
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, html in pages:
+            fn(url, html)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "pages": len(pages) * repeat,
+        "seconds": elapsed,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def check_equivalence(folder):
+    mismatches = 0
+    for url, html in load_corpus(folder):
+        old, new = parse_old(url, html), parse_new(url, html)
+        same = (
+            old["title"] == new["title"]
+            and sorted(old["base_links"]) == sorted(new["base_links"])
+            and sorted(old["external_links"]) == sorted(new["external_links"])
+            and old["text"].split() == new["text"].split()
+        )
+        if not same:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default=os.path.join("train_model", "html_pages"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--method", choices=["old", "new"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.method:
+        run_method(args.method, args.folder, args.repeat)
+        return
+
+    if not load_corpus(args.folder):
+        print(f"No .html files found in {args.folder}")
+        return
+
+    results = {}
+    for method in ("old", "new"):
+        out = subprocess.run(
+            [sys.executable, __file__, args.folder, "--repeat", str(args.repeat), "--method", method],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        results[method] = json.loads(out)
+
+    print(f"{'method':<8}{'pages':>8}{'ms/page':>12}{'max RSS MB':>14}")
+    for method, r in results.items():
+        print(f"{method:<8}{r['pages']:>8}{1000 * r['seconds'] / r['pages']:>12.2f}{r['max_rss_mb']:>14.1f}")
+    speedup = results["old"]["seconds"] / max(results["new"]["seconds"], 1e-9)
+    print(f"\nspeedup: {speedup:.1f}x")
+    # comments and the doctype are no longer emitted, so small text differences are expected
+    print(f"pages whose output differs (title/links/text tokens): {check_equivalence(args.folder)}")
+
+
+if __name__ == "__main__":
+    main()
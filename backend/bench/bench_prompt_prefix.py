@@ -0,0 +1,103 @@
+# bench_prompt_prefix.py
+# Prompt-eval time per chunk: the old /api/generate request (instructions, schema and HTML
+# in one prompt) against the /api/chat request of llm_extractor (instructions and schema
+# in a fixed system message, the HTML alone in the user message), on the blocks of
+# generated staff directory pages.
+#
+#   python bench/bench_prompt_prefix.py --pages 5 --prompt-ms 2
+#   python bench/bench_prompt_prefix.py --pages 5 --no-prefix-cache
+#   python bench/bench_prompt_prefix.py --pages 5 --ollama http://localhost:11434
+#
+# Every request generates a single token, so prompt_eval_count/prompt_eval_duration of the
+# answer is the whole cost. Without --ollama the model is bench/mock_ollama.py. The chat
+# client starts with llm_extractor.warm_up(), as workers do. Before each client an
+# unrelated prompt is evaluated, so neither starts from the other's cache.
+import os
+import sys
+import time
+import argparse
+import textwrap
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_ollama import MockOllama
+from bench_chunking import synthetic_page
+
+
+def old_prompt(text: str) -> str:
+    # the prompt send_to_ollama_chunk built before the chat API: the same instructions,
+    # indented inside an f-string, with the HTML at the end
+    instructions = llm_extractor.SYSTEM_PROMPT.rsplit("\n\n", 1)[0]
+    return "\n" + textwrap.indent(instructions, " " * 8) + f"\n\n        HTML:\n        {text}\n    "
+
+
+def post(url: str, payload: dict) -> dict:
+    fields = llm_extractor.request_fields()
+    fields["options"] = {**fields["options"], "num_predict": 1}
+    response = llm_extractor.get_session().post(url, json={**fields, **payload, "stream": False}, timeout=1800)
+    response.raise_for_status()
+    return response.json()
+
+
+def evict(base: str):
+    post(base + "/api/generate", {"prompt": f"Unrelated prompt {time.time()}: summarize nothing."})
+
+
+def run(name: str, send, blocks):
+    seconds, evaluated = [], []
+    for block in blocks:
+        data = send(block)
+        seconds.append(data.get("prompt_eval_duration", 0) / 1e9)
+        evaluated.append(data.get("prompt_eval_count", 0))
+    rest = seconds[1:] or seconds
+    print(
+        f"{name:<30}{seconds[0] * 1000:>12.0f}{statistics.mean(rest) * 1000:>14.1f}"
+        f"{statistics.mean(evaluated):>12.0f}{sum(seconds):>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=5, help="generated pages")
+    parser.add_argument("--people", type=int, default=40, help="cards per page")
+    parser.add_argument("--prompt-ms", type=float, default=2, help="mock prompt eval time per token")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="mock evaluates every prompt whole")
+    parser.add_argument("--port", type=int, default=11440)
+    parser.add_argument("--ollama", help="base URL of a real Ollama server instead of the mock")
+    args = parser.parse_args()
+
+    global llm_extractor
+    import llm_extractor
+    from html_parse import parse_html
+    from gating import gate_page
+
+    blocks = []
+    for i in range(args.pages):
+        page = parse_html(f"http://bench.local/faculty-{i}", synthetic_page(i, args.people))
+        blocks.extend(gate_page(page["blocks"])[0])
+
+    mock = None
+    if args.ollama:
+        base = args.ollama.rstrip("/")
+    else:
+        mock = MockOllama(args.port, scenario="clean", token_ms=0, prompt_ms=args.prompt_ms,
+                          prefix_cache=not args.no_prefix_cache)
+        base = mock.url
+    llm_extractor.OLLAMA_URL = base + "/api/chat"
+
+    print(f"{len(blocks)} blocks from {args.pages} pages\n")
+    print(f"{'request':<30}{'first ms':>12}{'ms/chunk':>14}{'tok/chunk':>12}{'total s':>10}")
+    evict(base)
+    run("generate, one prompt", lambda b: post(base + "/api/generate", {"prompt": old_prompt(b)}), blocks)
+    evict(base)
+    llm_extractor.warm_up(background=False)
+    run("chat, system prompt", lambda b: post(llm_extractor.OLLAMA_URL, {
+        "messages": [llm_extractor.SYSTEM_MESSAGE, {"role": "user", "content": b}]
+    }), blocks)
+    if mock:
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# bench_streaming.py
+# Time to a result and tokens generated per chunk: the old non-streaming request (wait for
+# the whole answer, then look for JSON in it) against llm_extractor's streaming client,
+# which hangs up once the object closes or the output degenerates.
+#
+#   python bench/bench_streaming.py --chunks 20 --token-ms 5
+#   python bench/bench_streaming.py --ollama http://localhost:11434   # a real model
+#
+# Without --ollama the model is bench/mock_ollama.py, once per scenario (see there).
+# Against a real model the tokens column is eval_count for the old request and the
+# streamed lines for the new one.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_ollama import MockOllama
+
+CHUNK = (
+    "<block>\n<img src='/img/jane.jpg' alt='Dr. Jane Doe'> Dr. Jane Doe Professor, Department of Physics "
+    "Email: <a href='mailto:jane@example.edu'>jane@example.edu</a> Phone: +880 1711-000001\n</block>"
+)
+
+
+def old_request(url: str, prompt_chunk: str):
+    # the request as it was before streaming: stream False, then parse the whole answer
+    import requests
+    import llm_extractor
+    payload = {"model": llm_extractor.DEFAULT_MODEL, "prompt": prompt_chunk, "stream": False}
+    data = requests.post(url, json=payload, timeout=1800).json()
+    raw = data.get("response", "").strip()
+    obj = llm_extractor.extract_first_json_object(raw)
+    return obj is not None, data.get("eval_count")
+
+
+def new_request(prompt_chunk: str):
+    import metrics
+    import llm_extractor
+    before = metrics.snapshot().get("llm_tokens_generated", 0)
+    res = llm_extractor.send_to_ollama_chunk(prompt_chunk, retries=1)
+    return bool(res.get("parsed")), metrics.snapshot().get("llm_tokens_generated", 0) - before
+
+
+def run(name: str, send, chunks: int, mock=None):
+    seconds, tokens, parsed = [], 0, 0
+    for _ in range(chunks):
+        start = time.perf_counter()
+        ok, n = send()
+        seconds.append(time.perf_counter() - start)
+        parsed += ok
+        tokens += n or 0
+    if mock:
+        tokens = mock.served
+    print(f"{name:<26}{sum(seconds) / chunks:>10.2f}{max(seconds):>10.2f}{tokens / chunks:>14.0f}{parsed:>8}/{chunks}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per scenario and client")
+    parser.add_argument("--token-ms", type=float, default=5, help="mock generation speed")
+    parser.add_argument("--num-predict", type=int, default=1000, help="mock token limit per answer")
+    parser.add_argument("--tail", type=int, default=200, help="tokens after the object in the tail scenario")
+    parser.add_argument("--port", type=int, default=11439)
+    parser.add_argument("--ollama", help="base URL of a real Ollama server instead of the mock")
+    args = parser.parse_args()
+
+    import llm_extractor
+
+    header = f"{'client':<26}{'s/chunk':>10}{'max s':>10}{'tokens/chunk':>14}{'parsed':>10}"
+    if args.ollama:
+        base = args.ollama.rstrip("/")
+        llm_extractor.OLLAMA_URL = base + "/api/chat"
+        print(header)
+        run("non-streaming", lambda: old_request(base + "/api/generate", CHUNK), args.chunks)
+        run("streaming", lambda: new_request(CHUNK), args.chunks)
+        return
+
+    mock = MockOllama(args.port, token_ms=args.token_ms, num_predict=args.num_predict, tail=args.tail)
+    llm_extractor.OLLAMA_URL = mock.url + "/api/chat"
+    for scenario in ("clean", "tail", "repeat", "prose"):
+        print(f"\n[{scenario}]\n{header}")
+        mock.reset(scenario)
+        run("non-streaming", lambda: old_request(mock.url + "/api/generate", CHUNK), args.chunks, mock)
+        # let the server notice the last hang-up before counting again
+        time.sleep(0.2)
+        mock.reset(scenario)
+        run("streaming", lambda: new_request(CHUNK), args.chunks, mock)
+        time.sleep(0.2)
+    mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
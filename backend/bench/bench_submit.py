@@ -0,0 +1,107 @@
+# bench_submit.py
+# Latency of job submission (/api/crawl and /api/search-and-crawl) with 1, 8, 32...
+# clients submitting at once, against a local MongoDB (MONGO_URI).
+#
+#   python bench/bench_submit.py --concurrency 1,8,32 --requests 200 --robots-ms 500
+#
+# Requests go through the ASGI app in-process (no server). The seeds point at a local
+# site whose robots.txt takes --robots-ms to answer, so a handler that still waited for
+# it would show up in the numbers. No worker pool runs; the created jobs are deleted.
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve(host: str, port: int, robots_ms: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(robots_ms / 1000)
+            body = b"User-agent: *\nAllow: /\n"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_round(client, path: str, make_body, total: int, concurrency: int):
+    latencies, job_ids = [], []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            start = time.perf_counter()
+            res = await client.post(path, json=make_body(i))
+            latencies.append(time.perf_counter() - start)
+            data = res.json()
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            job_ids.append(data["job_id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, job_ids, time.perf_counter() - start
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def main_async(args, hosts):
+    import httpx
+    from main import app, progress_collection
+
+    endpoints = [
+        ("/api/crawl", lambda i: {"url": f"http://{hosts[i % len(hosts)]}:{args.port}/page/{i}", "max_pages": 1}),
+        ("/api/search-and-crawl", lambda i: {"query": f"bench query {i}", "count": 10}),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    print(f"{'endpoint':<24}{'clients':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'req/s':>9}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path, make_body in endpoints:
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                latencies, job_ids, elapsed = await run_round(client, path, make_body, args.requests, concurrency)
+                progress_collection.delete_many({"job_id": {"$in": job_ids}})
+                print(
+                    f"{path:<24}{concurrency:>8}{statistics.median(latencies) * 1000:>9.1f}"
+                    f"{percentile(latencies, 0.95) * 1000:>9.1f}{max(latencies) * 1000:>9.1f}"
+                    f"{len(latencies) / elapsed:>9.0f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="submissions per round")
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--robots-ms", type=int, default=500, help="robots.txt response time")
+    args = parser.parse_args()
+
+    # nothing runs the jobs; admission control must not reject the benchmark's own
+    os.environ["MAX_CONCURRENT_JOBS"] = "0"
+    os.environ["MAX_PENDING_JOBS"] = str(args.requests * 10)
+    # distinct hosts, so submissions have robots.txt files to fetch
+    hosts = [f"127.0.0.{i}" for i in range(1, args.hosts + 1)]
+    servers = [serve(h, args.port, args.robots_ms) for h in hosts]
+    asyncio.run(main_async(args, hosts))
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
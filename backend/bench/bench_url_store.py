@@ -0,0 +1,95 @@
+# bench_url_store.py
+# Bytes per url of the crawl bookkeeping: the old set of url strings + deque of
+# (url, depth) tuples against the digest table, the bloom filter and the interning
+# MemoryFrontier.
+#
+#   python bench/bench_url_store.py --urls 200000 --hosts 50
+#
+# Memory is measured with tracemalloc around building each structure.
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_urls(count: int, hosts: int):
+    sections = ["news", "people", "research", "events", "about", "contact", "departments"]
+    return [
+        f"https://www.site{i % hosts}.example.edu/{sections[i % len(sections)]}/item-{i}/details"
+        for i in range(count)
+    ]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=200000)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--fp-rates", default="0.01,0.001")
+    args = parser.parse_args()
+
+    from frontier import VisitedSet, MemoryFrontier
+    from url_store import ScalableBloom
+
+    # the urls come from pages in a real crawl; copies stop them from sharing string objects
+    urls = make_urls(args.urls, args.hosts)
+
+    def old_visited():
+        return {u[:-1] + u[-1] for u in urls}
+
+    def old_queue():
+        return deque((u[:-1] + u[-1], 1) for u in urls)
+
+    def exact_visited():
+        v = VisitedSet("exact")
+        for u in urls:
+            v.add(u)
+        return v
+
+    def bloom_visited(fp):
+        def build():
+            v = VisitedSet("bloom")
+            v._set = ScalableBloom(capacity=args.urls, fp_rate=fp)
+            for u in urls:
+                v.add(u)
+            return v
+        return build
+
+    def new_queue():
+        f = MemoryFrontier()
+        for u in urls:
+            f.append((u, 1))
+        return f
+
+    rows = [("visited: set of str (old)", old_visited), ("visited: digest table", exact_visited)]
+    for fp in [float(x) for x in args.fp_rates.split(",")]:
+        rows.append((f"visited: bloom fp={fp}", bloom_visited(fp)))
+    rows += [("queue: deque of tuples (old)", old_queue), ("queue: interned MemoryFrontier", new_queue)]
+
+    print(f"{len(urls)} urls on {args.hosts} hosts, {sum(map(len, urls)) / len(urls):.0f} chars per url\n")
+    print(f"{'structure':<34}{'bytes/url':>10}{'MB':>9}{'build s':>9}{'false pos':>11}")
+    probes = [f"https://www.site0.example.edu/missing/{i}" for i in range(20000)]
+    for name, build in rows:
+        obj, size, elapsed = measure(build)
+        fp = ""
+        if name.startswith("visited"):
+            fp = f"{sum(p in obj for p in probes) / len(probes):.4%}"
+        print(f"{name:<34}{size / len(urls):>10.1f}{size / 1e6:>9.1f}{elapsed:>9.2f}{fp:>11}")
+        del obj
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# mock_ollama.py
+# A stand-in for Ollama's /api/generate and /api/chat for the LLM benches: answers every
+# request with one extraction object, a token every --token-ms, then behaves like a model
+# that does not stop cleanly, depending on the scenario:
+#
+#   clean    the object, then done
+#   tail     the object, then an explanation of `tail` tokens
+#   repeat   the object never closes, the same token repeats until num_predict
+#   prose    prose instead of JSON until num_predict
+#
+# An answer cut at num_predict ends with done_reason "length".
+#
+# With "stream": true every token is its own NDJSON line, and generation stops when the
+# client hangs up, like Ollama does. `served` counts the tokens actually generated. The
+# first request pays `load_ms` for loading the model (reported as load_duration); a
+# generate request with an empty prompt or a chat without messages only loads it.
+#
+# The prompt is rendered with a llama3-style chat template and costs `prompt_ms` per token
+# (4 characters) to evaluate, reported as prompt_eval_count/prompt_eval_duration. Like
+# Ollama's runner, the mock keeps the last prompt of each of its `slots` and only
+# evaluates what follows the longest common prefix with one of them (prefix_cache=False
+# evaluates every prompt whole).
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ANSWER = json.dumps({
+    "people": [{"name": "Dr. Jane Doe", "role": "Professor", "title": "", "email": ["jane@example.edu"],
+                "phone": ["+880 1711-000001"], "location": "", "image": "", "description": "", "social": []}],
+    "organization": [], "products": [], "events": [], "services": [], "courses": [],
+    "content": {"articles": [], "news": [], "blogs": [], "faqs": [], "policies": [], "announcements": []},
+    "other_info": []
+}, indent=2)
+TAIL = " Note: the HTML above describes one faculty member of the department, all other sections are empty."
+
+
+def tokens(text: str):
+    # about 4 characters per token
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def generate(scenario: str, num_predict: int, tail: int):
+    if scenario == "prose":
+        out = tokens(TAIL * 100)
+    elif scenario == "repeat":
+        out = tokens(ANSWER[:ANSWER.index('"organization"')] + '"", ' * 1000)
+    else:
+        out = tokens(ANSWER)
+        if scenario == "tail":
+            out += tokens(TAIL * 100)[:tail]
+    return out[:num_predict], len(out) > num_predict
+
+
+def render(payload: dict) -> str:
+    # the prompt as the model sees it; /api/generate puts `prompt` in one user message
+    messages = payload.get("messages")
+    if messages is None:
+        messages = [{"role": "user", "content": payload.get("prompt", "")}] if payload.get("prompt") else []
+    if not messages:
+        return ""
+    parts = [f"<|start_header_id|>{m['role']}<|end_header_id|>\n\n{m['content']}<|eot_id|>" for m in messages]
+    return "<|begin_of_text|>" + "".join(parts) + "<|start_header_id|>assistant<|end_header_id|>\n\n"
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class MockOllama:
+    def __init__(self, port: int, scenario: str = "tail", token_ms: float = 5, num_predict: int = 1000, tail: int = 200,
+                 load_ms: float = 0, prompt_ms: float = 0, prefix_cache: bool = True, slots: int = 1):
+        self.scenario = scenario
+        self.loaded = False
+        self.served = 0
+        self.requests = 0
+        self.prefix_cache = prefix_cache
+        self.cached = [""] * slots
+        self.lock = threading.Lock()
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                chat = self.path.endswith("/api/chat")
+                prompt = render(payload)
+                limit = (payload.get("options") or {}).get("num_predict") or num_predict
+                if limit < 0:
+                    limit = num_predict
+                out, cut = generate(mock.scenario, limit, tail) if prompt else ([], False)
+                with mock.lock:
+                    mock.requests += 1
+                    load, mock.loaded = (0 if mock.loaded else load_ms), True
+                    evaluated = mock.evaluate(prompt)
+                time.sleep((load + evaluated * prompt_ms) / 1000)
+                done = {
+                    "done": True, "done_reason": "length" if cut else "stop", "eval_count": len(out),
+                    "load_duration": int(load * 1e6),
+                    "prompt_eval_count": evaluated, "prompt_eval_duration": int(evaluated * prompt_ms * 1e6),
+                }
+                if not payload.get("stream", True):
+                    time.sleep(len(out) * token_ms / 1000)
+                    mock.count(len(out))
+                    body = json.dumps({**done, **self.piece("".join(out), chat), "model": payload.get("model")}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in out:
+                        time.sleep(token_ms / 1000)
+                        mock.count(1)
+                        self.chunk({**self.piece(token, chat), "done": False})
+                    self.chunk({**self.piece("", chat), **done})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client hung up; Ollama stops generating here too
+                    self.close_connection = True
+
+            def piece(self, text: str, chat: bool) -> dict:
+                return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+            def chunk(self, data: dict):
+                line = json.dumps(data).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # hang-ups are expected from the streaming client
+                pass
+
+        self.server = Server(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def evaluate(self, prompt: str) -> int:
+        # prompt tokens to evaluate; the slot sharing the longest prefix takes the prompt
+        total = len(tokens(prompt))
+        if not self.prefix_cache:
+            return total
+        slot = max(range(len(self.cached)), key=lambda i: common_prefix(self.cached[i], prompt))
+        reused = common_prefix(self.cached[slot], prompt) // 4
+        self.cached[slot] = prompt
+        return total - reused
+
+    def count(self, n: int):
+        with self.lock:
+            self.served += n
+
+    def reset(self, scenario: str):
+        with self.lock:
+            self.scenario, self.served, self.requests = scenario, 0, 0
+
+    def shutdown(self):
+        self.server.shutdown()
@@ -0,0 +1,368 @@
+# browser_pool.py
+import os
+import atexit
+import asyncio
+from collections import Counter
+from urllib.parse import urlparse
+from contextlib import contextmanager, asynccontextmanager
+from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+
+try:
+    import psutil
+except ImportError:  # memory based recycling is skipped without psutil
+    psutil = None
+
+# recycle the browser after this many pages
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+
+# recycle the browser when chromium (and the driver) use more than this (MB), 0 disables the check
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1500"))
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-web-security"
+]
+
+# resource types aborted during render; we only read the DOM and <img src> attributes
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()}
+
+# ad/analytics hosts (and their subdomains) whose requests are aborted; BLOCK_DOMAINS_EXTRA adds to the list
+BLOCK_DOMAINS = {
+    "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+    "adservice.google.com", "connect.facebook.net", "hotjar.com", "clarity.ms", "segment.io",
+    "segment.com", "mixpanel.com", "scorecardresearch.com", "quantserve.com", "criteo.com",
+    "taboola.com", "outbrain.com", "adnxs.com", "amazon-adsystem.com", "nr-data.net",
+    "fullstory.com", "intercomcdn.com", "hs-analytics.net", "mc.yandex.ru",
+} | {d.strip() for d in os.getenv("BLOCK_DOMAINS_EXTRA", "").split(",") if d.strip()}
+
+# abort sub-resources larger than this (bytes); 0 disables. Checking the size means the body
+# is fetched through the playwright driver, so only enable it when large assets are a problem.
+MAX_RESPONSE_BYTES = int(os.getenv("MAX_RESPONSE_BYTES", "0"))
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/117.0.0.0 Safari/537.36"
+)
+
+# Installed in every context before any page script runs: a MutationObserver and
+# fetch/XHR counters, so "quiet for X ms" can be read without serializing the DOM.
+STABILITY_SCRIPT = """
+(() => {
+    if (window.__scraperQuietFor) return;
+    let last = performance.now();
+    let pending = 0;
+    const touch = () => { last = performance.now(); };
+    const start = () => { pending++; touch(); };
+    const end = () => { pending = Math.max(0, pending - 1); touch(); };
+    new MutationObserver(touch).observe(document, { subtree: true, childList: true, characterData: true });
+    const origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function (...args) {
+            start();
+            return origFetch.apply(this, args).finally(end);
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        start();
+        this.addEventListener("loadend", end, { once: true });
+        return origSend.apply(this, args);
+    };
+    window.__scraperQuietFor = () => (pending > 0 ? 0 : performance.now() - last);
+})()
+"""
+
+
+def children_rss_mb(pid: int) -> float:
+    # chromium and the playwright driver are child processes of the worker
+    if psutil is None:
+        return 0.0
+    total = 0
+    try:
+        for child in psutil.Process(pid).children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except Exception:
+        return 0.0
+    return total / (1024 * 1024)
+
+
+class ResourcePolicy:
+    # Decides per request whether to abort it; counts go into a per-page Counter.
+
+    def __init__(self, resource_types=BLOCK_RESOURCE_TYPES, domains=BLOCK_DOMAINS, max_bytes=MAX_RESPONSE_BYTES):
+        self.resource_types = set(resource_types)
+        self.domains = set(domains)
+        self.max_bytes = int(max_bytes)
+
+    def block_reason(self, resource_type: str, url: str):
+        if resource_type in self.resource_types:
+            return resource_type
+        # the page itself and its frames are never blocked, even on a listed host
+        if resource_type == "document":
+            return None
+        host = urlparse(url).hostname or ""
+        parts = host.split(".")
+        # example: a.b.doubleclick.net -> checks a.b.doubleclick.net, b.doubleclick.net, doubleclick.net
+        for i in range(len(parts) - 1):
+            if ".".join(parts[i:]) in self.domains:
+                return "tracker"
+        return None
+
+    def _check_size(self, resource_type: str) -> bool:
+        return self.max_bytes > 0 and resource_type != "document"
+
+    def handle(self, route, stats: Counter):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        if reason:
+            stats[reason] += 1
+            route.abort()
+            return
+        if self._check_size(request.resource_type):
+            try:
+                response = route.fetch()
+                body = response.body()
+            except Exception:
+                # the browser retries it itself and sees the same error, if any
+                route.continue_()
+                return
+            if len(body) > self.max_bytes:
+                stats["too_large"] += 1
+                route.abort()
+            else:
+                route.fulfill(response=response, body=body)
+            return
+        route.continue_()
+
+    async def handle_async(self, route, stats: Counter):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        if reason:
+            stats[reason] += 1
+            await route.abort()
+            return
+        if self._check_size(request.resource_type):
+            try:
+                response = await route.fetch()
+                body = await response.body()
+            except Exception:
+                # the browser retries it itself and sees the same error, if any
+                await route.continue_()
+                return
+            if len(body) > self.max_bytes:
+                stats["too_large"] += 1
+                await route.abort()
+            else:
+                await route.fulfill(response=response, body=body)
+            return
+        await route.continue_()
+
+
+def blocked_summary(stats: Counter) -> dict:
+    summary = dict(stats)
+    summary["total"] = sum(stats.values())
+    return summary
+
+
+class BrowserPool:
+    # One Chromium per worker process, one isolated context per page.
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, max_rss_mb: int = BROWSER_MAX_RSS_MB, policy: ResourcePolicy = None):
+        self.max_pages = max(1, int(max_pages))
+        self.max_rss_mb = int(max_rss_mb)
+        self.policy = policy or ResourcePolicy()
+        self.pid = os.getpid()
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._blocked = {}
+
+    def _launch(self):
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+        self._pages_served = 0
+        print(f"🚀 Browser launched (pid={self.pid})")
+
+    def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            self._close_browser()
+            self._launch()
+        return self._browser
+
+    def _close_browser(self):
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+
+    def _should_recycle(self) -> bool:
+        if self._pages_served >= self.max_pages:
+            return True
+        if self.max_rss_mb > 0 and children_rss_mb(self.pid) >= self.max_rss_mb:
+            return True
+        return False
+
+    def recycle(self):
+        print(f"♻️ Recycling browser after {self._pages_served} pages")
+        self._close_browser()
+
+    def blocked_counts(self, page) -> dict:
+        # requests aborted so far for a page handed out by page(), by reason
+        return blocked_summary(self._blocked.get(page, Counter()))
+
+    @contextmanager
+    def page(self, **context_kwargs):
+        # Yields a fresh page in its own browser context; the context is always closed afterwards.
+        browser = self._ensure_browser()
+        context_kwargs.setdefault("user_agent", USER_AGENT)
+        context = browser.new_context(**context_kwargs)
+        context.add_init_script(script=STABILITY_SCRIPT)
+        stats = Counter()
+        context.route("**/*", lambda route: self.policy.handle(route, stats))
+        page = None
+        try:
+            page = context.new_page()
+            self._blocked[page] = stats
+            yield page
+        finally:
+            self._blocked.pop(page, None)
+            try:
+                context.close()
+            except Exception:
+                pass
+            self._pages_served += 1
+            if self._should_recycle():
+                self.recycle()
+
+    def close(self):
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = None
+
+
+class AsyncBrowserPool:
+    # asyncio twin of BrowserPool; many pages may be open at once, so a browser due for
+    # recycling is retired and only closed once its last open context is done.
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, max_rss_mb: int = BROWSER_MAX_RSS_MB, policy: ResourcePolicy = None):
+        self.max_pages = max(1, int(max_pages))
+        self.max_rss_mb = int(max_rss_mb)
+        self.policy = policy or ResourcePolicy()
+        self.pid = os.getpid()
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._open_pages = {}
+        self._blocked = {}
+        self._lock = asyncio.Lock()
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+                self._open_pages[self._browser] = 0
+                self._pages_served = 0
+                print(f"🚀 Browser launched (pid={self.pid}, async)")
+            return self._browser
+
+    def _should_recycle(self) -> bool:
+        if self._pages_served >= self.max_pages:
+            return True
+        if self.max_rss_mb > 0 and children_rss_mb(self.pid) >= self.max_rss_mb:
+            return True
+        return False
+
+    @asynccontextmanager
+    async def page(self, **context_kwargs):
+        browser = await self._ensure_browser()
+        self._open_pages[browser] = self._open_pages.get(browser, 0) + 1
+        context_kwargs.setdefault("user_agent", USER_AGENT)
+        context = None
+        page = None
+        try:
+            context = await browser.new_context(**context_kwargs)
+            await context.add_init_script(script=STABILITY_SCRIPT)
+            stats = Counter()
+
+            async def handle(route):
+                await self.policy.handle_async(route, stats)
+
+            await context.route("**/*", handle)
+            page = await context.new_page()
+            self._blocked[page] = stats
+            yield page
+        finally:
+            if page is not None:
+                self._blocked.pop(page, None)
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            self._open_pages[browser] -= 1
+            if browser is self._browser:
+                self._pages_served += 1
+                if self._should_recycle():
+                    print(f"♻️ Recycling browser after {self._pages_served} pages")
+                    self._browser = None
+            if browser is not self._browser and self._open_pages.get(browser) == 0:
+                self._open_pages.pop(browser, None)
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+
+    def blocked_counts(self, page) -> dict:
+        return blocked_summary(self._blocked.get(page, Counter()))
+
+    async def close(self):
+        for browser in list(self._open_pages):
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._open_pages.clear()
+        self._browser = None
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = None
+
+
+_pool = None
+
+
+def get_browser_pool() -> BrowserPool:
+    # Lazily started once per process; a forked worker never reuses its parent's browser.
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        _pool = BrowserPool()
+    return _pool
+
+
+def close_browser_pool():
+    global _pool
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.close()
+    _pool = None
+
+
+atexit.register(close_browser_pool)
@@ -0,0 +1,153 @@
+# chunker.py
+import os
+import re
+import math
+import threading
+
+# tokens of page content per block sent to the LLM; the prompt (~600 tokens) and the
+# answer come on top, so keep budget + prompt + answer under the model's num_ctx
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "1500"))
+
+# carried over from the end of the previous block, only where a text had to be cut
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+
+# tokenizer of the target model: a Hugging Face name or local path (e.g. the llama3 one);
+# without it tiktoken's cl100k_base is used, and without tiktoken a chars/token estimate
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "")
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+CHARS_PER_TOKEN = 4.0
+
+# a text longer than the budget is cut after sentences, then between words
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _load_tokenizer():
+    # (name, count function), first one that loads wins
+    if LLM_TOKENIZER:
+        try:
+            from transformers import AutoTokenizer
+            tok = AutoTokenizer.from_pretrained(LLM_TOKENIZER)
+            return LLM_TOKENIZER, lambda text: len(tok.encode(text, add_special_tokens=False))
+        except Exception as e:
+            print(f"⚠️ Tokenizer {LLM_TOKENIZER} not available ({e}), falling back")
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        return f"tiktoken:{TIKTOKEN_ENCODING}", lambda text: len(enc.encode(text, disallowed_special=()))
+    except Exception:
+        pass
+    return "estimate", lambda text: math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def get_tokenizer():
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            _tokenizer = _load_tokenizer()
+            print(f"🔢 Counting tokens with {_tokenizer[0]}")
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    return get_tokenizer()[1](text) if text else 0
+
+
+def wrap(text: str) -> str:
+    # same envelope as scraper.chunk_text
+    return f"<block>\n{text}\n</block>"
+
+
+# -------- Block tree -> text blocks --------
+def measure(node, sizes: dict):
+    # (text, tokens) of a piece or block; a block costs the sum of its children, so each
+    # piece of text goes through the tokenizer once
+    if isinstance(node, str):
+        return node, count_tokens(node)
+    key = id(node)
+    if key not in sizes:
+        parts, tokens = [], 0
+        for child in node:
+            text, n = measure(child, sizes)
+            if text:
+                parts.append(text)
+                tokens += n
+        sizes[key] = (" ".join(parts), tokens)
+    return sizes[key]
+
+
+def _cut(text: str, budget: int, overlap: int, room: int = None):
+    # Splits one text that is over budget into pieces within it; the first one only gets
+    # `room` tokens (what is left of the block being filled). Each piece after the first
+    # repeats up to `overlap` tokens from the end of the previous one.
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        if count_tokens(sentence) <= budget:
+            pieces.append(sentence)
+        else:
+            pieces.extend(sentence.split())
+    sized = [(p, count_tokens(p)) for p in pieces if p]
+
+    out, current, used = [], [], 0
+    limit = budget if room is None else room
+    for piece, n in sized:
+        if used + n > limit and (current or limit < budget):
+            limit = budget
+            out.append(" ".join(p for p, _ in current))
+            carried, carried_tokens = [], 0
+            for p, m in reversed(current):
+                if carried_tokens + m > overlap or carried_tokens + m + n > budget:
+                    break
+                carried.insert(0, (p, m))
+                carried_tokens += m
+            current, used = carried, carried_tokens
+        current.append((piece, n))
+        used += n
+    if current:
+        out.append(" ".join(p for p, _ in current))
+    return out
+
+
+def chunk_blocks(tree, budget: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS):
+    # Packs the block tree of html_parse.parse_html into <block> texts of at most `budget`
+    # tokens. A block (card, list item, table row, section) goes whole into one text if it
+    # fits in one; only larger ones are split into their children, and only a single text
+    # longer than the budget is cut (with overlap).
+    budget = max(1, int(budget))
+    sizes = {}
+    chunks, current, used = [], [], 0
+
+    def flush():
+        nonlocal current, used
+        if current:
+            chunks.append(" ".join(current))
+        current, used = [], 0
+
+    def add(node):
+        nonlocal current, used
+        text, tokens = measure(node, sizes)
+        if not text:
+            return
+        if used + tokens <= budget:
+            current.append(text)
+            used += tokens
+        elif tokens <= budget:
+            flush()
+            current, used = [text], tokens
+        elif isinstance(node, str):
+            pieces = _cut(text, budget, overlap, room=budget - used)
+            if pieces[0]:
+                current.append(pieces[0])
+            for piece in pieces[1:]:
+                flush()
+                current.append(piece)
+            used = count_tokens(" ".join(current))
+        else:
+            for child in node:
+                add(child)
+
+    add(tree)
+    flush()
+    return [wrap(c) for c in chunks]
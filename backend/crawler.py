@@ -1,13 +1,24 @@
 # crawler.py
 import time
 import uuid
-from collections import deque, defaultdict
+import asyncio
+from collections import defaultdict
 from urllib.parse import urlparse, urlunparse
 import os
 import multiprocessing as mp
-import urllib.robotparser
+import metrics
 from db import get_db
-from scraper import scrape_website
+from scraper import (
+    scrape_website, fetch_page_async, parse_page, extract_information, build_document,
+    is_unchanged, fetch_static_tier,
+)
+from browser_pool import AsyncBrowserPool
+from politeness import HostRateLimiter
+from robots import get_robots
+from pipeline import Pipeline, Stage
+from frontier import CRAWL_FRONTIER, DURABLE_FRONTIERS, VisitedSet, make_frontier
+from url_store import split_url
+from writer import get_writer
 
 db = get_db()
 scraperdb_collection = db["data"]
@@ -19,15 +30,58 @@ POLITENESS_DELAY = float(os.getenv("POLITENESS_DELAY", "1.0"))
 # max links enqueued per domain to avoid explosion
 MAX_QUEUE_PER_DOMAIN = int(os.getenv("MAX_QUEUE_PER_DOMAIN", "2000"))
 
+# pages in flight per job; 1 keeps the original serial loop, >1 switches to the asyncio engine
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "1"))
+
+# worker counts for the pipeline stages after rendering (async engine only)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "2"))
+PERSIST_WORKERS = int(os.getenv("PERSIST_WORKERS", "1"))
+
+# recrawl mode: conditional request first, skip render/LLM for unchanged pages
+INCREMENTAL_RECRAWL = os.getenv("INCREMENTAL_RECRAWL", "0").lower() in ("1", "true", "yes")
+
+# pages between two frontier checkpoints (durable frontiers only)
+CHECKPOINT_EVERY = int(os.getenv("CHECKPOINT_EVERY", "25"))
+
+# seconds between two reads of a job's pause/cancel flag
+CONTROL_POLL_INTERVAL = float(os.getenv("CONTROL_POLL_INTERVAL", "2.0"))
+
+# a "running" job run outside the worker pool (crawl_website/start_async_crawl) whose
+# progress was not updated for this long has lost its process
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "300"))
+
+RESUMABLE_STATUSES = ("paused", "interrupted", "error")
+
+# fields of a stored page needed to decide whether it changed
+PREVIOUS_FIELDS = {"_id": 0, "etag": 1, "last_modified": 1, "content_fingerprint": 1, "base_links": 1, "external_links": 1}
+
 
 def normalize_url(url: str) -> str:
+    return normalize_with_host(url)[0]
+
+
+def normalize_with_host(url: str):
+    # (normalized url, netloc) from a single urlparse
     if not url:
-        return url
+        return url, ""
     parsed = urlparse(url, scheme="http")
+    if not parsed.netloc and "://" not in url:
+        # 'example.com/path' (or 'localhost:8000') passed without scheme
+        parsed = urlparse("http://" + url.lstrip("/"))
     scheme = parsed.scheme or "http"
-    netloc = parsed.netloc or parsed.path  # handle 'example.com' passed without scheme
+    netloc = parsed.netloc
     path = parsed.path.rstrip("/") or "/"
-    return urlunparse((scheme, netloc, path, "", "", ""))
+    return urlunparse((scheme, netloc, path, "", "", "")), netloc
+
+
+def page_fields(url: str, job_id: str) -> dict:
+    # stored with every page so /api/data can filter by job, domain and date
+    return {
+        "job_id": job_id,
+        "domain": split_url(url)[0].split("://", 1)[-1],
+        "crawled_at": time.time(),
+    }
 
 
 def is_binary_url(url: str) -> bool:
@@ -37,75 +91,245 @@ def is_binary_url(url: str) -> bool:
 
 
 class CrawlTask:
-    def __init__(self, start_url: str, job_id: str = None, max_pages: int = 50, max_depth: int = 100):
+    def __init__(self, start_url: str, job_id: str = None, max_pages: int = 50, max_depth: int = 100, concurrency: int = None, incremental: bool = None, frontier: str = None, resume: bool = False, slice_pages: int = 0):
         self.start_url = normalize_url(start_url)
         self.start_domain = urlparse(self.start_url).netloc
         self.job_id = job_id or str(uuid.uuid4())
         self.max_pages = max(1, int(max_pages))
         self.max_depth = int(max_depth)
-        self.visited = set()
-        self.queue = deque([(self.start_url, 0)])
+        self.concurrency = max(1, int(concurrency or CRAWL_CONCURRENCY))
+        self.incremental = INCREMENTAL_RECRAWL if incremental is None else bool(incremental)
+        self.frontier = (frontier or CRAWL_FRONTIER).lower()
+        self.visited = VisitedSet()
+        self.queue = make_frontier(self.frontier, self.job_id)
         self.count = 0
         self.domain_queue_counts = defaultdict(int)
-        # Initialize progress in DB
-        self._set_progress({
-            "job_id": self.job_id,
-            "url": self.start_url,
-            "total": self.max_pages,
-            "done": 0,
-            "status": "running",
-            "current_url": None,
-            "started_at": time.time()
-        })
+        self._in_flight = set()
+        self._retry = set()
+        self._checkpointed_at = 0
+        self._control_checked_at = 0.0
+        # pages per scheduling slice before the job yields its worker (durable frontiers only)
+        self.slice_pages = int(slice_pages or 0) if self.queue.durable else 0
+        self.outcome = None
 
-        # robots parser for start domain
-        self.rp = urllib.robotparser.RobotFileParser()
-        try:
-            base = f"{urlparse(self.start_url).scheme}://{self.start_domain}"
-            self.rp.set_url(f"{base}/robots.txt")
-            self.rp.read()
-        except Exception:
-            # if robots can't be read, default to allow
-            self.rp = None
+        state = self.queue.load_checkpoint() if resume else None
+        if state:
+            # continue from the last checkpoint; unfinished urls are still queued in the frontier
+            self.visited = VisitedSet.from_bytes(state["visited"])
+            # pages that were in flight at the checkpoint are crawled again
+            self._retry = set(state.get("retry") or ())
+            self.count = self._checkpointed_at = int(state.get("count", 0))
+            self.domain_queue_counts.update(state.get("domain_counts") or {})
+        if resume:
+            self._set_progress({"status": "running", "done": self.count, "control": None, "resumed_at": time.time()}, flush=True)
+            print(f"▶️ Resuming job {self.job_id} at {self.count} pages")
+        else:
+            self.queue.append((self.start_url, 0))
+            # Initialize progress in DB
+            self._set_progress({
+                "job_id": self.job_id,
+                "url": self.start_url,
+                "total": self.max_pages,
+                "done": 0,
+                "status": "running",
+                "current_url": None,
+                "started_at": time.time(),
+                # needed to resume the job in another process
+                "max_depth": self.max_depth,
+                "concurrency": self.concurrency,
+                "incremental": self.incremental,
+                "frontier": self.frontier,
+                "control": None,
+            }, flush=True)
+        self._slice_start = self.count
 
-    def _set_progress(self, data: dict):
+    def _set_progress(self, data: dict, flush: bool = False):
+        # buffered and coalesced per job; flush=True for state changes others must see now
         data["updated_at"] = time.time()
-        try:
-            progress_collection.update_one({"job_id": self.job_id}, {"$set": data}, upsert=True)
-        except Exception:
+        writer = get_writer()
+        writer.progress(self.job_id, data)
+        if flush:
             # avoid crashes on DB error; best-effort
-            pass
+            writer.flush_quietly()
 
     def _can_fetch(self, url: str) -> bool:
-        if self.rp is None:
-            return True
+        # robots.txt comes from the cache shared by all jobs and workers
+        return get_robots().can_fetch(url)
+
+    def _delay(self, url: str) -> float:
+        # our politeness delay, or the site's Crawl-delay when that is longer
+        return max(POLITENESS_DELAY, get_robots().crawl_delay(url) or 0)
+
+    def _next_url(self, check_robots: bool = True):
+        # Pops queued urls until one passes the visited/robots/binary/per-domain checks.
+        # Everything in the frontier was normalized when it was enqueued. The async engine
+        # checks robots.txt in its fetch stage instead, off the event loop.
+        while self.queue:
+            normalized_url, depth = self.queue.popleft()
+            retry = normalized_url in self._retry
+            if normalized_url in self.visited and not retry:
+                self.queue.ack(normalized_url)
+                continue
+            self._retry.discard(normalized_url)
+            # robots.txt check
+            if check_robots and not self._can_fetch(normalized_url):
+                self._set_progress({"current_url": normalized_url, "status": "running", "note": "disallowed_by_robots"})
+                self.queue.ack(normalized_url)
+                continue
+            # skip binary files
+            if is_binary_url(normalized_url):
+                self.queue.ack(normalized_url)
+                continue
+
+            # per-domain queue limits (a retried page was already counted before the checkpoint)
+            domain = split_url(normalized_url)[0].split("://", 1)[-1]
+            if not retry and self.domain_queue_counts[domain] >= MAX_QUEUE_PER_DOMAIN:
+                self.queue.ack(normalized_url)
+                continue
+
+            if not retry:
+                self.visited.add(normalized_url)
+                self.domain_queue_counts[domain] += 1
+            return normalized_url, depth
+        return None
+
+    def _previous(self, normalized_url: str):
+        # stored document of an earlier crawl, only looked up in incremental mode
+        if not self.incremental:
+            return None
         try:
-            return self.rp.can_fetch("*", url)
+            return scraperdb_collection.find_one({"url": normalized_url}, PREVIOUS_FIELDS)
+        except Exception as e:
+            print(f"⚠️ Could not load previous crawl of {normalized_url}: {e}")
+            return None
+
+    def _save(self, normalized_url: str, scraped):
+        # Save to DB (upsert to avoid duplicates); written behind in bulk, blocks only
+        # when MongoDB falls behind
+        if isinstance(scraped, dict) and scraped.get("url"):
+            get_writer().save_page(scraped["url"], {**scraped, **page_fields(scraped["url"], self.job_id)})
+        else:
+            # fallback: store minimal doc
+            get_writer().save_page(normalized_url, {"url": normalized_url, "raw": scraped, **page_fields(normalized_url, self.job_id)})
+
+    def _enqueue_links(self, scraped, depth: int):
+        # enqueue same-domain links
+        if depth < self.max_depth:
+            for link in scraped.get("base_links", []) if isinstance(scraped, dict) else []:
+                norm_link, link_domain = normalize_with_host(link)
+                if link_domain == self.start_domain and norm_link not in self.visited:
+                    self.queue.append((norm_link, depth + 1))
+
+    # -------- Durable state: checkpoints and pause/resume/cancel --------
+    def _control(self):
+        # pause/cancel requests are written to the job's progress doc by the API
+        now = time.time()
+        if now - self._control_checked_at < CONTROL_POLL_INTERVAL:
+            return None
+        self._control_checked_at = now
+        try:
+            doc = progress_collection.find_one({"job_id": self.job_id}, {"_id": 0, "control": 1})
         except Exception:
-            return True
+            return None
+        control = (doc or {}).get("control")
+        if control == "pause" and not self.queue.durable:
+            # nothing to resume from (request_control refuses this; a pause set anyway is ignored)
+            return None
+        return control if control in ("pause", "cancel") else None
 
-    def run(self):
+    def _should_stop(self):
+        # "yield" once this scheduling slice is used up, else a pending pause/cancel
+        if self.slice_pages and self.count < self.max_pages and self.count - self._slice_start >= self.slice_pages:
+            return "yield"
+        return self._control()
+
+    def _checkpoint(self, force: bool = False):
+        if not self.queue.durable:
+            return
+        if not force and self.count - self._checkpointed_at < CHECKPOINT_EVERY:
+            return
         try:
-            while self.queue and self.count < self.max_pages:
-                url, depth = self.queue.popleft()
-                normalized_url = normalize_url(url)
-                if normalized_url in self.visited:
-                    continue
-                # robots.txt check
-                if not self._can_fetch(normalized_url):
-                    self._set_progress({"current_url": normalized_url, "status": "running", "note": "disallowed_by_robots"})
-                    continue
-                # skip binary files
-                if is_binary_url(normalized_url):
-                    continue
+            # pages counted in the checkpoint must be in MongoDB before it is written
+            get_writer().flush()
+            self.queue.checkpoint({
+                "visited": self.visited.to_bytes(),
+                "retry": list(self._in_flight),
+                "domain_counts": dict(self.domain_queue_counts),
+                "count": self.count,
+            })
+            self._checkpointed_at = self.count
+        except Exception as e:
+            print(f"⚠️ Checkpoint failed for job {self.job_id}: {e}")
 
-                # per-domain queue limits
-                domain = urlparse(normalized_url).netloc
-                if self.domain_queue_counts[domain] >= MAX_QUEUE_PER_DOMAIN:
-                    continue
+    def _finish(self):
+        try:
+            self.queue.purge()
+        except Exception as e:
+            print(f"⚠️ Could not purge frontier of job {self.job_id}: {e}")
+        self._set_progress({
+            "status": "finished",
+            "current_url": None,
+            "done": self.count,
+            "finished_at": time.time()
+        }, flush=True)
+        print(f"\n✅ Crawl finished. Total crawled {self.count} pages.\n")
+        metrics.flush()
 
-                self.visited.add(normalized_url)
-                self.domain_queue_counts[domain] += 1
+    def _pause(self):
+        self._checkpoint(force=True)
+        self._set_progress({"status": "paused", "control": None, "current_url": None, "done": self.count, "paused_at": time.time()}, flush=True)
+        print(f"\n⏸️ Crawl paused after {self.count} pages.\n")
+        metrics.flush()
+
+    def _cancel(self):
+        try:
+            self.queue.purge()
+        except Exception as e:
+            print(f"⚠️ Could not purge frontier of job {self.job_id}: {e}")
+        self._set_progress({"status": "cancelled", "control": None, "current_url": None, "done": self.count, "finished_at": time.time()}, flush=True)
+        print(f"\n⏹️ Crawl cancelled after {self.count} pages.\n")
+        metrics.flush()
+
+    def _yield(self):
+        # back to the tail of the job queue so other jobs get a turn (round-robin)
+        self._checkpoint(force=True)
+        self._set_progress({"status": "queued", "current_url": None, "done": self.count, "queued_at": time.time()}, flush=True)
+        print(f"\n🔁 Job {self.job_id} yielded its worker after {self.count} pages.\n")
+        metrics.flush()
+
+    def _end(self, stop):
+        self.outcome = stop or "finished"
+        if stop == "yield":
+            self._yield()
+        elif stop == "pause":
+            self._pause()
+        elif stop == "cancel":
+            self._cancel()
+        else:
+            self._finish()
+
+    def _fail(self, e: Exception):
+        # keep the frontier and a checkpoint so the job can be resumed
+        self.outcome = "error"
+        self._checkpoint(force=True)
+        self._set_progress({"status": "error", "current_url": None, "last_error": str(e)}, flush=True)
+        print(f"⚠️ Crawl error: {e}")
+        metrics.flush()
+
+    def run(self):
+        if self.concurrency > 1:
+            asyncio.run(self.run_async())
+            return
+        stop = None
+        try:
+            while self.queue and self.count < self.max_pages:
+                stop = self._should_stop()
+                if stop:
+                    break
+                nxt = self._next_url()
+                if nxt is None:
+                    break
+                normalized_url, depth = nxt
 
                 # update progress
                 self._set_progress({
@@ -114,7 +338,7 @@ class CrawlTask:
                 })
 
                 try:
-                    scraped = scrape_website(normalized_url)
+                    scraped = scrape_website(normalized_url, previous=self._previous(normalized_url))
                 except Exception as e:
                     # record error note
                     self._set_progress({
@@ -122,66 +346,264 @@ class CrawlTask:
                         "status": "running",
                         "last_error": str(e),
                     })
+                    self.queue.ack(normalized_url)
                     continue
 
-                # Save to DB (upsert to avoid duplicates)
-                try:
-                    if isinstance(scraped, dict) and scraped.get("url"):
-                        scraperdb_collection.update_one(
-                            {"url": scraped["url"]},
-                            {"$set": scraped},
-                            upsert=True
-                        )
-                    else:
-                        # fallback: store minimal doc
-                        scraperdb_collection.insert_one({"url": normalized_url, "raw": scraped})
-                except Exception as e:
-                    # log but don't crash
-                    print(f"❌ MongoDB Insert failed for {normalized_url}: {e}")
+                self._save(normalized_url, scraped)
 
                 self.count += 1
                 self._set_progress({"done": self.count})
 
                 print(f"[{self.count}] Scraped: {normalized_url} (depth={depth})")
 
-                # enqueue same-domain links
-                if depth < self.max_depth:
-                    for link in scraped.get("base_links", []) if isinstance(scraped, dict) else []:
-                        norm_link = normalize_url(link)
-                        link_domain = urlparse(norm_link).netloc
-                        if link_domain == self.start_domain and norm_link not in self.visited:
-                            self.queue.append((norm_link, depth + 1))
+                self._enqueue_links(scraped, depth)
+                self.queue.ack(normalized_url)
+                self._checkpoint()
 
-                time.sleep(POLITENESS_DELAY)
+                time.sleep(self._delay(normalized_url))
 
-            # finished
-            self._set_progress({
-                "status": "finished",
-                "current_url": None,
-                "done": self.count,
-                "finished_at": time.time()
-            })
-            print(f"\n✅ Crawl finished. Total crawled {self.count} pages.\n")
+            self._end(stop)
         except Exception as e:
-            self._set_progress({"status": "error", "current_url": None, "last_error": str(e)})
-            print(f"⚠️ Crawl error: {e}")
+            self._fail(e)
+
+    # -------- Pipelined async engine: fetch -> parse -> extract -> persist --------
+    def _settle(self, item: dict):
+        # a page is settled once its links reached the frontier (or it can't produce any)
+        if not item.get("settled"):
+            item["settled"] = True
+            self._in_discovery -= 1
+            self._wakeup.set()
+
+    def _drop(self, item: dict, exc: Exception):
+        # a page that failed in any stage frees its max_pages slot, like a failed scrape in run()
+        self._settle(item)
+        self._dispatched -= 1
+        self._in_flight.discard(item["url"])
+        self.queue.ack(item["url"])
+        self._wakeup.set()
+        self._set_progress({"current_url": item.get("url"), "status": "running", "last_error": str(exc)})
+
+    def _disallowed(self, item: dict):
+        # like _drop, for a url robots.txt turned down after it was dispatched; it doesn't
+        # count towards its domain's MAX_QUEUE_PER_DOMAIN either
+        domain = split_url(item["url"])[0].split("://", 1)[-1]
+        if self.domain_queue_counts[domain] > 0:
+            self.domain_queue_counts[domain] -= 1
+        self._settle(item)
+        self._dispatched -= 1
+        self._in_flight.discard(item["url"])
+        self.queue.ack(item["url"])
+        self._wakeup.set()
+
+    async def _fetch_stage(self, item: dict):
+        url = item["url"]
+        # an expired or still loading robots.txt entry is fetched (or waited for) in a
+        # thread, so other pages keep going meanwhile
+        robots = get_robots()
+        allowed, delay = await asyncio.to_thread(lambda: (robots.can_fetch(url), robots.crawl_delay(url)))
+        if not allowed:
+            self._disallowed(item)
+            await asyncio.to_thread(self._set_progress, {"current_url": url, "status": "running", "note": "disallowed_by_robots"})
+            return None
+        await self._limiter.acquire(urlparse(url).netloc, delay)
+        await asyncio.to_thread(self._set_progress, {"current_url": url, "status": "running"})
+        previous = await asyncio.to_thread(self._previous, url)
+        page_source, meta = await asyncio.to_thread(fetch_static_tier, url, previous)
+        if isinstance(page_source, dict):
+            # not modified since the last crawl
+            item["doc"] = page_source
+            self._enqueue_links(item["doc"], item["depth"])
+            self._settle(item)
+            return item
+        if page_source is None:
+            page_source, page_meta, error = await fetch_page_async(url, self._pool)
+            if error:
+                self._settle(item)
+                item["doc"] = error
+                return item
+            meta.update(page_meta)
+        item["page_source"] = page_source
+        item["meta"] = meta
+        item["previous"] = previous
+        return item
+
+    async def _parse_stage(self, item: dict):
+        if "doc" in item:
+            return item
+        parsed = await asyncio.to_thread(parse_page, item["url"], item.pop("page_source"))
+        # link discovery feeds the frontier now, without waiting for the LLM
+        self._enqueue_links(parsed, item["depth"])
+        self._settle(item)
+        if is_unchanged(parsed, item.get("previous")):
+            print(f"⏭️ Content unchanged, skipping LLM extraction: {item['url']}")
+            item["doc"] = build_document(parsed, None, item.get("meta"))
+        else:
+            item["parsed"] = parsed
+        return item
+
+    async def _extract_stage(self, item: dict):
+        if "doc" in item:
+            return item
+        parsed = item.pop("parsed")
+        information = await asyncio.to_thread(extract_information, parsed["blocks"])
+        item["doc"] = build_document(parsed, information, item.get("meta"))
+        return item
+
+    async def _persist_stage(self, item: dict):
+        await asyncio.to_thread(self._save, item["url"], item["doc"])
+        self.count += 1
+        self._in_flight.discard(item["url"])
+        self.queue.ack(item["url"])
+        await asyncio.to_thread(self._set_progress, {"done": self.count, "pipeline": self._pipeline.stats()})
+        print(f"[{self.count}] Scraped: {item['url']} (depth={item['depth']})")
+        self._checkpoint()
+        return None
+
+    async def run_async(self):
+        # Up to `concurrency` pages render at once; parsing, LLM extraction and persistence
+        # each have their own workers and a bounded queue in front of them. Politeness is a
+        # per-host token bucket instead of a global sleep.
+        self._pool = AsyncBrowserPool()
+        self._limiter = HostRateLimiter(POLITENESS_DELAY)
+        self._dispatched = self.count
+        self._in_discovery = 0
+        self._wakeup = asyncio.Event()
+        self._pipeline = Pipeline([
+            Stage("fetch", self._fetch_stage, workers=self.concurrency, maxsize=self.concurrency, on_error=self._drop),
+            Stage("parse", self._parse_stage, workers=PARSE_WORKERS, on_error=self._drop),
+            Stage("extract", self._extract_stage, workers=LLM_WORKERS, on_error=self._drop),
+            Stage("persist", self._persist_stage, workers=PERSIST_WORKERS, on_error=self._drop),
+        ])
+        self._pipeline.start()
+        # warm the robots.txt cache for the start url while the pipeline starts
+        await asyncio.to_thread(get_robots().get, self.start_url)
+        stop = None
+        try:
+            while True:
+                stop = self._should_stop()
+                if stop:
+                    break
+                self._wakeup.clear()
+                while self._dispatched < self.max_pages:
+                    nxt = self._next_url(check_robots=False)
+                    if nxt is None:
+                        break
+                    self._dispatched += 1
+                    self._in_discovery += 1
+                    self._in_flight.add(nxt[0])
+                    await self._pipeline.head.queue.put({"url": nxt[0], "depth": nxt[1]})
+                # done once no page can still discover links and there is nothing left to start
+                if self._in_discovery == 0 and (self._dispatched >= self.max_pages or not self.queue):
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=CONTROL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+            # a pause/yield lets in-flight pages finish so the checkpoint is exact; a cancel does not wait
+            if stop != "cancel":
+                await self._pipeline.join()
+            self._set_progress({"pipeline": self._pipeline.stats()})
+            self._end(stop)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            await self._pipeline.stop()
+            await self._pool.close()
 
     @staticmethod
-    def start_async(start_url: str, max_pages: int = 50, max_depth: int = 100, job_id: str = None):
-        task = CrawlTask(start_url=start_url, job_id=job_id, max_pages=max_pages, max_depth=max_depth)
+    def start_async(start_url: str, max_pages: int = 50, max_depth: int = 100, job_id: str = None, concurrency: int = None, incremental: bool = None, frontier: str = None):
+        task = CrawlTask(start_url=start_url, job_id=job_id, max_pages=max_pages, max_depth=max_depth, concurrency=concurrency, incremental=incremental, frontier=frontier)
         p = mp.Process(target=task.run, daemon=True)
         p.start()
         return task.job_id
 
+    @staticmethod
+    def from_progress(job_id: str, statuses=RESUMABLE_STATUSES, slice_pages: int = 0):
+        # Rebuilds a job from its progress doc; None if it is not in `statuses` or can't be resumed.
+        doc = progress_collection.find_one({"job_id": job_id}, {"_id": 0})
+        if not doc or doc.get("status") not in statuses:
+            return None
+        # a job that never started has nothing to resume, any frontier will do
+        started = "started_at" in doc
+        if started and (doc.get("frontier") or "memory") == "memory":
+            return None
+        return CrawlTask(
+            start_url=doc["url"],
+            job_id=job_id,
+            max_pages=doc.get("total", 50),
+            max_depth=doc.get("max_depth", 100),
+            concurrency=doc.get("concurrency"),
+            incremental=doc.get("incremental"),
+            frontier=doc.get("frontier"),
+            resume=started,
+            slice_pages=slice_pages,
+        )
+
+
+def can_pause(job_id: str) -> bool:
+    # A started job on an in-memory frontier loses it when it stops, so a pause would
+    # really be a cancel; one that never started can be paused in the queue.
+    doc = progress_collection.find_one({"job_id": job_id}, {"_id": 0, "started_at": 1, "frontier": 1})
+    return bool(doc) and ("started_at" not in doc or (doc.get("frontier") or "memory") in DURABLE_FRONTIERS)
+
+
+def request_control(job_id: str, action: str) -> bool:
+    # Asks a running job to pause or cancel; the worker picks it up within CONTROL_POLL_INTERVAL.
+    query = {"job_id": job_id, "status": "running"}
+    if action == "pause":
+        query["frontier"] = {"$in": list(DURABLE_FRONTIERS)}
+    res = progress_collection.update_one(
+        query,
+        {"$set": {"control": action, "updated_at": time.time()}}
+    )
+    return res.matched_count > 0
+
+
+def cancel_stopped_job(job_id: str) -> bool:
+    # Cancels a job that has no worker (queued/paused/interrupted/error) and drops its frontier.
+    doc = progress_collection.find_one_and_update(
+        {"job_id": job_id, "status": {"$in": ["queued", *RESUMABLE_STATUSES]}},
+        {"$set": {"status": "cancelled", "control": None, "current_url": None, "updated_at": time.time()}},
+        projection={"_id": 0, "frontier": 1}
+    )
+    if not doc:
+        return False
+    try:
+        make_frontier(doc.get("frontier"), job_id).purge()
+    except Exception as e:
+        print(f"⚠️ Could not purge frontier of job {job_id}: {e}")
+    return True
+
+
+def recover_stale_jobs():
+    # Jobs left "running" by a dead process become "interrupted" (resumable with a durable
+    # frontier). Pool workers are tracked by heartbeat (scheduler.release_dead_workers) and
+    # distributed jobs by their leases, so this only covers jobs without a worker.
+    try:
+        res = progress_collection.update_many(
+            {
+                "status": {"$in": ["starting", "running"]}, "worker": None, "distributed": {"$ne": True},
+                "updated_at": {"$lt": time.time() - JOB_STALE_AFTER}
+            },
+            {"$set": {"status": "interrupted", "current_url": None}}
+        )
+        if res.modified_count:
+            print(f"⚠️ Marked {res.modified_count} stale crawl jobs as interrupted")
+    except Exception as e:
+        print(f"⚠️ Could not check for stale jobs: {e}")
+
+
 # Backwards-friendly helper functions
-def crawl_website(start_url: str, max_pages: int = 50, max_depth: int = 100, job_id: str = None):
+def crawl_website(start_url: str, max_pages: int = 50, max_depth: int = 100, job_id: str = None, concurrency: int = None, incremental: bool = None, frontier: str = None):
     #Synchronous call (keeps compatibility), runs crawl in current process. Prefer start_async_crawl for background runs.
 
-    task = CrawlTask(start_url=start_url, job_id=job_id, max_pages=max_pages, max_depth=max_depth)
+    task = CrawlTask(start_url=start_url, job_id=job_id, max_pages=max_pages, max_depth=max_depth, concurrency=concurrency, incremental=incremental, frontier=frontier)
     task.run()
     return task.job_id
 
-def start_async_crawl(start_url: str, max_pages: int = 50, max_depth: int = 100):
+def start_async_crawl(start_url: str, max_pages: int = 50, max_depth: int = 100, concurrency: int = None, incremental: bool = None, frontier: str = None):
     # Starts a crawl as a separate process and returns job_id immediately. Used by main.py to avoid blocking.
 
-    return CrawlTask.start_async(start_url=start_url, max_pages=max_pages, max_depth=max_depth)
+    return CrawlTask.start_async(start_url=start_url, max_pages=max_pages, max_depth=max_depth, concurrency=concurrency, incremental=incremental, frontier=frontier)
+
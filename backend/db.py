@@ -24,7 +24,12 @@ def get_db():
         # Ensure indexes
         try:
             _db["data"].create_index([("url", ASCENDING)], unique=True, background=True)
+            # /api/data filters, paginated by _id
+            _db["data"].create_index([("job_id", ASCENDING), ("_id", ASCENDING)], background=True)
+            _db["data"].create_index([("domain", ASCENDING), ("_id", ASCENDING)], background=True)
+            _db["data"].create_index([("crawled_at", ASCENDING)], background=True)
             _db["progress"].create_index([("job_id", ASCENDING)], unique=True, background=True)
+            _db["progress"].create_index([("status", ASCENDING), ("queued_at", ASCENDING)], background=True)
         except Exception:
             # If index creation fails (permissions, already exists) we continue
             pass
@@ -0,0 +1,303 @@
+# distributed.py
+import os
+import time
+import socket
+import threading
+from urllib.parse import urlparse
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+import metrics
+from db import get_db
+from crawler import normalize_url, is_binary_url, page_fields, POLITENESS_DELAY, PREVIOUS_FIELDS
+from politeness import SharedHostRateLimiter
+from robots import get_robots
+from writer import get_writer
+from llm_extractor import warm_up
+
+db = get_db()
+frontier_items = db["frontier"]
+progress_collection = db["progress"]
+scraperdb_collection = db["data"]
+
+try:
+    frontier_items.create_index([("job_id", ASCENDING), ("url", ASCENDING)], unique=True, background=True)
+    frontier_items.create_index([("job_id", ASCENDING), ("state", ASCENDING), ("seq", ASCENDING)], background=True)
+except Exception:
+    # If index creation fails (permissions, already exists) we continue
+    pass
+
+# a claimed url goes back to the queue if its worker doesn't ack or renew it within this time
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", "300"))
+
+# seconds between two reads of the running distributed jobs (and their pause/cancel flags)
+JOBS_REFRESH_INTERVAL = float(os.getenv("JOBS_REFRESH_INTERVAL", "2.0"))
+
+
+# -------- Shared frontier: one doc per (job_id, url) in scraperdb.frontier --------
+def push_urls(job_id: str, items):
+    # The unique (job_id, url) index doubles as the visited set across every node.
+    docs = [
+        {"job_id": job_id, "url": url, "depth": depth, "seq": time.time_ns(), "state": "queued"}
+        for url, depth in items
+    ]
+    if not docs:
+        return
+    try:
+        frontier_items.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+
+def seed_job(job_id: str, start_url: str):
+    push_urls(job_id, [(start_url, 0)])
+
+
+def _claim(job_id: str, worker_id: str, query: dict):
+    now = time.time()
+    return frontier_items.find_one_and_update(
+        {"job_id": job_id, **query},
+        {"$set": {"state": "leased", "lease_owner": worker_id, "lease_until": now + LEASE_SECONDS}},
+        sort=[("seq", 1)],
+        projection={"_id": 1, "url": 1, "depth": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def claim_expired(job_id: str, worker_id: str):
+    # a lease whose worker died; its max_pages slot was already reserved
+    return _claim(job_id, worker_id, {"state": "leased", "lease_until": {"$lt": time.time()}})
+
+
+def claim_queued(job_id: str, worker_id: str):
+    return _claim(job_id, worker_id, {"state": "queued"})
+
+
+def ack(item_id, worker_id: str):
+    frontier_items.update_one(
+        {"_id": item_id, "lease_owner": worker_id},
+        {"$set": {"state": "done"}, "$unset": {"lease_until": ""}}
+    )
+
+
+def renew(item_ids, worker_id: str):
+    if item_ids:
+        frontier_items.update_many(
+            {"_id": {"$in": list(item_ids)}, "state": "leased", "lease_owner": worker_id},
+            {"$set": {"lease_until": time.time() + LEASE_SECONDS}}
+        )
+
+
+def purge_job(job_id: str):
+    frontier_items.delete_many({"job_id": job_id})
+
+
+# -------- Job bookkeeping in the progress doc --------
+def reserve_slot(job_id: str) -> bool:
+    # max_pages holds across nodes: a page is only started if the counter is below total
+    res = progress_collection.update_one(
+        {"job_id": job_id, "status": "running", "$expr": {"$lt": [{"$ifNull": ["$dispatched", 0]}, "$total"]}},
+        {"$inc": {"dispatched": 1}}
+    )
+    return res.modified_count > 0
+
+
+def release_slot(job_id: str):
+    progress_collection.update_one({"job_id": job_id}, {"$inc": {"dispatched": -1}})
+
+
+def maybe_finish(job_id: str):
+    # Finished once no url is queued or leased. An expired lease still counts: it holds a
+    # max_pages slot of a dead worker, and claim_expired hands the url to a live one.
+    # _process pushes a page's links before it hands the page to the writer, whose flush
+    # acks it, so a done url's links are always queued by then.
+    now = time.time()
+    doc = progress_collection.find_one({"job_id": job_id}, {"_id": 0, "dispatched": 1, "total": 1})
+    if not doc:
+        return
+    if frontier_items.count_documents({"job_id": job_id, "state": "leased"}, limit=1):
+        return
+    full = doc.get("dispatched", 0) >= doc.get("total", 0)
+    if not full and frontier_items.count_documents({"job_id": job_id, "state": "queued"}, limit=1):
+        return
+    res = progress_collection.update_one(
+        {"job_id": job_id, "status": "running"},
+        {"$set": {"status": "finished", "current_url": None, "finished_at": now, "updated_at": now}}
+    )
+    if res.modified_count:
+        purge_job(job_id)
+        print(f"\n✅ Distributed crawl {job_id} finished.\n")
+
+
+def default_handler(url: str, job: dict, previous: dict):
+    from scraper import scrape_website
+    return scrape_website(url, previous=previous)
+
+
+class DistributedWorker:
+    # Claims urls of running distributed jobs under time-limited leases. Any number of
+    # these can run on any number of machines against the same scraperdb.
+
+    def __init__(self, worker_id: str = None, handler=None, limiter=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.handler = handler or default_handler
+        self.limiter = limiter or SharedHostRateLimiter(POLITENESS_DELAY)
+        self.robots = get_robots()
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._jobs = []
+        self._jobs_read_at = 0.0
+        self._turn = 0
+        self._keeper = None
+
+    # -------- leases --------
+    def _keep_leases(self):
+        # renews the leases of pages still being worked on (long renders, slow LLM)
+        while True:
+            time.sleep(LEASE_SECONDS / 3)
+            with self._held_lock:
+                held = list(self._held)
+            try:
+                renew(held, self.worker_id)
+            except Exception as e:
+                print(f"⚠️ Lease renewal failed: {e}")
+
+    def _start_keeper(self):
+        if self._keeper is None:
+            self._keeper = threading.Thread(target=self._keep_leases, daemon=True)
+            self._keeper.start()
+
+    # -------- jobs --------
+    def jobs(self):
+        now = time.time()
+        if now - self._jobs_read_at >= JOBS_REFRESH_INTERVAL:
+            self._jobs_read_at = now
+            docs = list(progress_collection.find(
+                {"distributed": True, "status": "running"},
+                {"_id": 0, "job_id": 1, "url": 1, "max_depth": 1, "incremental": 1, "control": 1}
+            ))
+            self._jobs = [d for d in docs if not self._apply_control(d)]
+        return self._jobs
+
+    def _apply_control(self, job: dict) -> bool:
+        control = job.get("control")
+        if control not in ("pause", "cancel"):
+            return False
+        status = "paused" if control == "pause" else "cancelled"
+        res = progress_collection.update_one(
+            {"job_id": job["job_id"], "status": "running"},
+            {"$set": {"status": status, "control": None, "current_url": None, "updated_at": time.time()}}
+        )
+        if res.modified_count and control == "cancel":
+            purge_job(job["job_id"])
+        return True
+
+    # -------- work --------
+    def _previous(self, job: dict, url: str):
+        if not job.get("incremental"):
+            return None
+        try:
+            return scraperdb_collection.find_one({"url": url}, PREVIOUS_FIELDS)
+        except Exception:
+            return None
+
+    def _save(self, job_id: str, url: str, scraped, on_saved=None):
+        if isinstance(scraped, dict) and scraped.get("url"):
+            get_writer().save_page(scraped["url"], {**scraped, **page_fields(scraped["url"], job_id)}, on_saved)
+        else:
+            get_writer().save_page(url, {"url": url, "raw": scraped, **page_fields(url, job_id)}, on_saved)
+
+    def _enqueue_links(self, job: dict, scraped, depth: int):
+        if depth >= job.get("max_depth", 100) or not isinstance(scraped, dict):
+            return
+        start_domain = urlparse(job["url"]).netloc
+        links = set()
+        for link in scraped.get("base_links", []):
+            norm_link = normalize_url(link)
+            if urlparse(norm_link).netloc == start_domain and not is_binary_url(norm_link):
+                links.add(norm_link)
+        push_urls(job["job_id"], [(link, depth + 1) for link in links])
+
+    def _process(self, job: dict, item: dict):
+        url, job_id = item["url"], job["job_id"]
+        with self._held_lock:
+            self._held.add(item["_id"])
+        # set once the lease is left to the writer's ack or to expiry
+        settled = False
+        try:
+            if not self.robots.can_fetch(url):
+                release_slot(job_id)
+                get_writer().progress(job_id, {"note": "disallowed_by_robots"})
+                return
+            self.limiter.acquire(urlparse(url).netloc, self.robots.crawl_delay(url))
+            get_writer().progress(job_id, {"current_url": url, "updated_at": time.time()})
+            try:
+                scraped = self.handler(url, job, self._previous(job, url))
+            except Exception as e:
+                release_slot(job_id)
+                get_writer().progress(job_id, {"last_error": str(e), "updated_at": time.time()})
+                return
+            # Links go in before the page is handed to the writer: the ack runs from the
+            # writer's flush, and maybe_finish on another node must not see the url done
+            # while its links are missing. If pushing fails the lease is left to expire,
+            # so another worker redoes the page.
+            try:
+                self._enqueue_links(job, scraped, item["depth"])
+            except Exception:
+                self._drop(item["_id"])
+                settled = True
+                raise
+            # the url is done once its page is in MongoDB, not when it leaves this worker;
+            # until then the keeper keeps renewing its lease
+            self._save(job_id, url, scraped, lambda: self._done(item["_id"]))
+            settled = True
+            get_writer().progress(job_id, {"updated_at": time.time()}, {"done": 1})
+            metrics.incr("distributed_pages")
+            print(f"[{self.worker_id}] Scraped: {url} (depth={item['depth']})")
+        finally:
+            if not settled:
+                self._done(item["_id"])
+
+    def _done(self, item_id):
+        ack(item_id, self.worker_id)
+        self._drop(item_id)
+
+    def _drop(self, item_id):
+        with self._held_lock:
+            self._held.discard(item_id)
+
+    def work_once(self) -> bool:
+        # Processes one url from the next job in turn; False when there was nothing to do.
+        self._start_keeper()
+        jobs = self.jobs()
+        for i in range(len(jobs)):
+            job = jobs[(self._turn + i) % len(jobs)]
+            job_id = job["job_id"]
+            item = claim_expired(job_id, self.worker_id)
+            if item is None:
+                if not reserve_slot(job_id):
+                    maybe_finish(job_id)
+                    continue
+                item = claim_queued(job_id, self.worker_id)
+                if item is None:
+                    release_slot(job_id)
+                    maybe_finish(job_id)
+                    continue
+            self._turn = (self._turn + i + 1) % len(jobs)
+            self._process(job, item)
+            return True
+        return False
+
+    def run(self, stop: threading.Event = None, idle_exit: float = None, poll: float = 1.0):
+        # idle_exit: return after this many seconds without work (benchmarks, batch nodes)
+        idle_since = time.time()
+        warm_up()
+        while stop is None or not stop.is_set():
+            if self.work_once():
+                idle_since = time.time()
+                continue
+            metrics.flush()
+            get_writer().flush_quietly()
+            if idle_exit is not None and time.time() - idle_since >= idle_exit:
+                return
+            time.sleep(poll)
@@ -0,0 +1,138 @@
+# fetcher.py
+import os
+import re
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from browser_pool import USER_AGENT
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+# try a plain HTTP GET before rendering in Chromium
+FETCH_FAST_PATH = os.getenv("FETCH_FAST_PATH", "1").lower() in ("1", "true", "yes")
+
+# below these the static HTML is not trusted and the page is rendered in the browser
+FAST_PATH_MIN_TEXT = int(os.getenv("FAST_PATH_MIN_TEXT", "500"))
+FAST_PATH_MIN_LINKS = int(os.getenv("FAST_PATH_MIN_LINKS", "3"))
+FAST_PATH_MIN_DENSITY = float(os.getenv("FAST_PATH_MIN_DENSITY", "0.02"))
+
+_HIDDEN_RE = re.compile(r"<(script|style|noscript|template|svg)\b.*?</\1\s*>", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+_LINK_RE = re.compile(r"<a\s[^>]*href\s*=", re.I)
+_NOSCRIPT_RE = re.compile(r"<noscript\b[^>]*>(.*?)</noscript\s*>", re.S | re.I)
+_JS_REQUIRED_RE = re.compile(r"enable javascript|javascript is (?:disabled|required)|requires javascript|turn on javascript", re.I)
+# empty client-side mount points (React/Vue/Next/Nuxt/Svelte)
+_SPA_ROOT_RE = re.compile(
+    r"<(div|main)\b[^>]*\bid\s*=\s*[\"'](?:root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</\1\s*>"
+    r"|<app-root\b[^>]*>\s*</app-root\s*>",
+    re.I
+)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _after_fork():
+    # a prefetch thread of the parent may have held the lock when the worker forked
+    global _session_lock
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_http_session():
+    # pooled keep-alive session for plain page requests, one per process; a forked worker
+    # builds its own instead of sharing the parent's sockets
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = requests.Session()
+            _session_pid = os.getpid()
+            _session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def response_validators(headers) -> dict:
+    # HTTP validators worth storing for the next conditional request
+    validators = {}
+    if not headers:
+        return validators
+    etag = headers.get("etag") or headers.get("ETag")
+    last_modified = headers.get("last-modified") or headers.get("Last-Modified")
+    if etag:
+        validators["etag"] = etag
+    if last_modified:
+        validators["last_modified"] = last_modified
+    return validators
+
+
+def conditional_get(url: str, previous: dict, timeout: float = HTTP_TIMEOUT):
+    # Returns (not_modified, response). response is None when no request could be made.
+    headers = {}
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+    if not headers:
+        return False, None
+    try:
+        response = get_http_session().get(url, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Conditional request failed for {url}: {e}")
+        return False, None
+    return response.status_code == 304, response
+
+
+def needs_browser(html: str):
+    # Cheap regex heuristics on the raw HTML; returns (escalate, signals).
+    visible = _TAG_RE.sub(" ", _HIDDEN_RE.sub(" ", html))
+    text_chars = len(" ".join(visible.split()))
+    signals = {
+        "html_bytes": len(html),
+        "text_chars": text_chars,
+        "links": len(_LINK_RE.findall(html)),
+        "text_density": round(text_chars / max(len(html), 1), 4),
+        "reason": None,
+    }
+    noscript = " ".join(_NOSCRIPT_RE.findall(html))
+    if _SPA_ROOT_RE.search(html) and text_chars < FAST_PATH_MIN_TEXT * 4:
+        signals["reason"] = "spa_root"
+    elif _JS_REQUIRED_RE.search(noscript) and text_chars < FAST_PATH_MIN_TEXT * 4:
+        signals["reason"] = "noscript_js_required"
+    elif text_chars < FAST_PATH_MIN_TEXT:
+        signals["reason"] = "low_text"
+    elif signals["links"] < FAST_PATH_MIN_LINKS:
+        signals["reason"] = "few_links"
+    elif signals["text_density"] < FAST_PATH_MIN_DENSITY:
+        signals["reason"] = "low_text_density"
+    return signals["reason"] is not None, signals
+
+
+def fetch_static(url: str, response=None, timeout: float = HTTP_TIMEOUT):
+    # Tier 1: plain pooled GET. Returns (html, meta) when the static HTML is good enough,
+    # (None, meta) when the page has to go to the browser. meta records the tier decision.
+    if response is None:
+        try:
+            response = get_http_session().get(url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            return None, {"fetch_tier": "browser", "fetch_signals": {"reason": "http_error", "error": str(e)}}
+
+    content_type = response.headers.get("content-type", "")
+    if response.status_code != 200:
+        return None, {"fetch_tier": "browser", "fetch_signals": {"reason": f"status_{response.status_code}"}}
+    if "html" not in content_type.lower():
+        return None, {"fetch_tier": "browser", "fetch_signals": {"reason": "content_type", "content_type": content_type}}
+
+    html = response.text
+    escalate, signals = needs_browser(html)
+    if escalate:
+        return None, {"fetch_tier": "browser", "fetch_signals": signals}
+    meta = {"fetch_tier": "http", "fetch_signals": signals}
+    meta.update(response_validators(response.headers))
+    return html, meta
@@ -0,0 +1,358 @@
+# frontier.py
+import os
+import time
+import zlib
+import pickle
+import sqlite3
+from array import array
+from collections import deque
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from url_store import VISITED_MODE, DigestSet, ScalableBloom, UrlStore, url_digest
+from writer import get_writer
+
+# "memory" (in-process deque, lost on restart), "mongo" (scraperdb.frontier) or "disk" (sqlite per job)
+CRAWL_FRONTIER = os.getenv("CRAWL_FRONTIER", "memory").lower()
+FRONTIER_DIR = os.getenv("FRONTIER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "frontier"))
+
+# urls read from / written to the store per round trip
+FRONTIER_BATCH = int(os.getenv("FRONTIER_BATCH", "200"))
+
+_BLOOM_MAGIC = b"BLOOM1"
+_DEPTH_BITS = 16
+_DEPTH_MASK = (1 << _DEPTH_BITS) - 1
+
+
+def _pages_written() -> bool:
+    # a url is acked only once its page is in MongoDB; buffered writes go first
+    try:
+        get_writer().flush()
+        return True
+    except Exception as e:
+        print(f"⚠️ Keeping frontier acks, pages not written yet: {e}")
+        return False
+
+
+class VisitedSet:
+    # Visited urls as 64-bit digests in a flat hash table ("exact") or as a scalable bloom
+    # filter ("bloom", VISITED_MODE). Serializes to compressed bytes for checkpoints.
+
+    def __init__(self, mode: str = None):
+        self.mode = (mode or VISITED_MODE).lower()
+        self._set = ScalableBloom() if self.mode == "bloom" else DigestSet()
+
+    def add(self, url: str):
+        self._set.add(url if self.mode == "bloom" else url_digest(url))
+
+    def __contains__(self, url: str) -> bool:
+        return (url if self.mode == "bloom" else url_digest(url)) in self._set
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+    def nbytes(self) -> int:
+        return self._set.nbytes()
+
+    def to_bytes(self) -> bytes:
+        if self.mode == "bloom":
+            return _BLOOM_MAGIC + zlib.compress(pickle.dumps(self._set.state()), 6)
+        packed = array("Q", sorted(self._set))
+        return zlib.compress(packed.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if data.startswith(_BLOOM_MAGIC):
+            visited = cls("bloom")
+            visited._set = ScalableBloom.from_state(pickle.loads(zlib.decompress(data[len(_BLOOM_MAGIC):])))
+            return visited
+        packed = array("Q")
+        packed.frombytes(zlib.decompress(data))
+        visited = cls("exact")
+        visited._set = DigestSet(capacity=len(packed))
+        for digest in packed:
+            visited._set.add(digest)
+        return visited
+
+
+class MemoryFrontier:
+    # In-process queue, nothing survives the worker process. Urls are interned in a
+    # UrlStore and queued once each as one 64-bit int (url id and depth packed) in a flat array.
+    durable = False
+
+    def __init__(self):
+        self.store = UrlStore()
+        self._queue = array("Q")
+        self._head = 0
+
+    def append(self, item):
+        url, depth = item
+        uid, new = self.store.intern(url)
+        if new:
+            self._queue.append(uid << _DEPTH_BITS | min(depth, _DEPTH_MASK))
+
+    def popleft(self):
+        if self._head >= len(self._queue):
+            raise IndexError("pop from an empty frontier")
+        packed = self._queue[self._head]
+        self._head += 1
+        if self._head > 4096 and self._head * 2 > len(self._queue):
+            # drop the consumed half so the array doesn't keep growing
+            del self._queue[:self._head]
+            self._head = 0
+        return self.store.url(packed >> _DEPTH_BITS), packed & _DEPTH_MASK
+
+    def __bool__(self) -> bool:
+        return self._head < len(self._queue)
+
+    def __len__(self) -> int:
+        return len(self._queue) - self._head
+
+    def ack(self, url: str):
+        pass
+
+    def flush(self):
+        pass
+
+    def checkpoint(self, state: dict):
+        pass
+
+    def load_checkpoint(self):
+        return None
+
+    def purge(self):
+        self._queue = array("Q")
+        self._head = 0
+        self.store = UrlStore()
+
+
+class MongoFrontier:
+    # Queue in scraperdb.frontier, one document per (job_id, url), plus a checkpoint document
+    # in scraperdb.frontier_checkpoints. Pushes, pops and acks are batched.
+    durable = True
+
+    def __init__(self, job_id: str, batch: int = FRONTIER_BATCH):
+        from db import get_db
+        db = get_db()
+        self.job_id = job_id
+        self.batch = max(1, int(batch))
+        self.items = db["frontier"]
+        self.checkpoints = db["frontier_checkpoints"]
+        try:
+            self.items.create_index([("job_id", ASCENDING), ("url", ASCENDING)], unique=True, background=True)
+            self.items.create_index([("job_id", ASCENDING), ("state", ASCENDING), ("seq", ASCENDING)], background=True)
+        except Exception:
+            # If index creation fails (permissions, already exists) we continue
+            pass
+        last = self.items.find_one({"job_id": job_id}, {"seq": 1}, sort=[("seq", -1)])
+        self._seq = (last or {}).get("seq", 0)
+        self._cursor_seq = 0  # pops continue after this seq
+        self._to_push = []
+        self._to_ack = []
+        self._buffer = deque()
+        self._exhausted = False
+
+    def append(self, item):
+        url, depth = item
+        self._seq += 1
+        self._to_push.append({"job_id": self.job_id, "url": url, "depth": depth, "seq": self._seq, "state": "queued"})
+        self._exhausted = False
+        if len(self._to_push) >= self.batch:
+            self._flush_pushes()
+
+    def _flush_pushes(self):
+        if not self._to_push:
+            return
+        try:
+            self.items.insert_many(self._to_push, ordered=False)
+        except BulkWriteError as e:
+            # duplicate (job_id, url) pairs are expected, anything else is not
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        self._to_push = []
+
+    def _fill(self):
+        self._flush_pushes()
+        docs = list(self.items.find(
+            {"job_id": self.job_id, "state": "queued", "seq": {"$gt": self._cursor_seq}},
+            {"_id": 0, "url": 1, "depth": 1, "seq": 1}
+        ).sort("seq", 1).limit(self.batch))
+        for d in docs:
+            self._buffer.append((d["url"], d["depth"]))
+            self._cursor_seq = d["seq"]
+        self._exhausted = not docs
+
+    def popleft(self):
+        if not self._buffer:
+            self._fill()
+        if not self._buffer:
+            raise IndexError("pop from an empty frontier")
+        return self._buffer.popleft()
+
+    def __bool__(self) -> bool:
+        if self._buffer:
+            return True
+        if self._exhausted and not self._to_push:
+            return False
+        self._fill()
+        return bool(self._buffer)
+
+    def __len__(self) -> int:
+        # queued in the store (not yet popped) plus local buffers
+        stored = self.items.count_documents({"job_id": self.job_id, "state": "queued", "seq": {"$gt": self._cursor_seq}})
+        return stored + len(self._buffer) + len(self._to_push)
+
+    def ack(self, url: str):
+        # url is done for good; unacked pops are served again after a restart
+        self._to_ack.append(url)
+        if len(self._to_ack) >= self.batch:
+            self._flush_acks()
+
+    def _flush_acks(self):
+        if self._to_ack and _pages_written():
+            self.items.update_many({"job_id": self.job_id, "url": {"$in": self._to_ack}}, {"$set": {"state": "done"}})
+            self._to_ack = []
+
+    def flush(self):
+        self._flush_pushes()
+        self._flush_acks()
+
+    def checkpoint(self, state: dict):
+        self.flush()
+        self.checkpoints.update_one(
+            {"_id": self.job_id},
+            {"$set": {**state, "saved_at": time.time()}},
+            upsert=True
+        )
+
+    def load_checkpoint(self):
+        return self.checkpoints.find_one({"_id": self.job_id}, {"_id": 0})
+
+    def purge(self):
+        self._buffer.clear()
+        self._to_push = []
+        self._to_ack = []
+        self.items.delete_many({"job_id": self.job_id})
+        self.checkpoints.delete_one({"_id": self.job_id})
+
+
+class DiskFrontier:
+    # Same contract as MongoFrontier in a local sqlite file per job.
+    durable = True
+
+    def __init__(self, job_id: str, batch: int = FRONTIER_BATCH, folder: str = FRONTIER_DIR):
+        os.makedirs(folder, exist_ok=True)
+        self.job_id = job_id
+        self.batch = max(1, int(batch))
+        self.path = os.path.join(folder, f"{job_id}.sqlite3")
+        self._conn = None
+        self._pid = None
+        self._cursor_seq = 0
+        self._to_push = []
+        self._to_ack = []
+        self._buffer = deque()
+        self._exhausted = False
+
+    @property
+    def conn(self):
+        # opened lazily so a task built in the API process and run in a forked worker
+        # never shares a sqlite connection across the fork
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL, depth INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS checkpoint (id INTEGER PRIMARY KEY CHECK (id = 1), data BLOB NOT NULL)")
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def append(self, item):
+        self._to_push.append(item)
+        self._exhausted = False
+        if len(self._to_push) >= self.batch:
+            self._flush_pushes()
+
+    def _flush_pushes(self):
+        if self._to_push:
+            self.conn.executemany("INSERT OR IGNORE INTO queue (url, depth) VALUES (?, ?)", self._to_push)
+            self.conn.commit()
+            self._to_push = []
+
+    def _fill(self):
+        self._flush_pushes()
+        rows = self.conn.execute(
+            "SELECT seq, url, depth FROM queue WHERE done = 0 AND seq > ? ORDER BY seq LIMIT ?",
+            (self._cursor_seq, self.batch)
+        ).fetchall()
+        for seq, url, depth in rows:
+            self._buffer.append((url, depth))
+            self._cursor_seq = seq
+        self._exhausted = not rows
+
+    def popleft(self):
+        if not self._buffer:
+            self._fill()
+        if not self._buffer:
+            raise IndexError("pop from an empty frontier")
+        return self._buffer.popleft()
+
+    def __bool__(self) -> bool:
+        if self._buffer:
+            return True
+        if self._exhausted and not self._to_push:
+            return False
+        self._fill()
+        return bool(self._buffer)
+
+    def __len__(self) -> int:
+        stored = self.conn.execute("SELECT COUNT(*) FROM queue WHERE done = 0 AND seq > ?", (self._cursor_seq,)).fetchone()[0]
+        return stored + len(self._buffer) + len(self._to_push)
+
+    def ack(self, url: str):
+        self._to_ack.append((url,))
+        if len(self._to_ack) >= self.batch:
+            self._flush_acks()
+
+    def _flush_acks(self):
+        if self._to_ack and _pages_written():
+            self.conn.executemany("UPDATE queue SET done = 1 WHERE url = ?", self._to_ack)
+            self.conn.commit()
+            self._to_ack = []
+
+    def flush(self):
+        self._flush_pushes()
+        self._flush_acks()
+
+    def checkpoint(self, state: dict):
+        self.flush()
+        self.conn.execute("INSERT OR REPLACE INTO checkpoint (id, data) VALUES (1, ?)", (pickle.dumps(state),))
+        self.conn.commit()
+
+    def load_checkpoint(self):
+        row = self.conn.execute("SELECT data FROM checkpoint WHERE id = 1").fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def purge(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except OSError:
+                pass
+
+
+# frontiers that outlive their worker process, so a job on one can be paused and resumed
+DURABLE_FRONTIERS = ("mongo", "disk")
+
+
+def make_frontier(kind: str, job_id: str):
+    kind = (kind or CRAWL_FRONTIER).lower()
+    if kind == "mongo":
+        return MongoFrontier(job_id)
+    if kind == "disk":
+        return DiskFrontier(job_id)
+    return MemoryFrontier()
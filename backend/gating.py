@@ -0,0 +1,142 @@
+# gating.py
+import os
+import re
+from chunker import chunk_blocks, count_tokens, measure
+from html_parse import SOCIAL_LINK
+
+# "0" sends every block to the LLM like before
+GATE_BLOCKS = os.getenv("GATE_BLOCKS", "1") != "0"
+
+# blocks scoring below this are not sent to the LLM (see WEIGHTS)
+GATE_MIN_SCORE = float(os.getenv("GATE_MIN_SCORE", "1"))
+
+# share of a block's text inside links above which it counts as a link list
+GATE_LINK_DENSITY = float(os.getenv("GATE_LINK_DENSITY", "0.5"))
+
+# subtrees larger than this (tokens) are never dropped whole, only their parts
+GATE_PRUNE_TOKENS = int(os.getenv("GATE_PRUNE_TOKENS", "512"))
+
+WEIGHTS = {"email": 3, "phone": 3, "social": 2, "price": 2, "date": 1, "name": 1, "role": 1}
+
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE = re.compile(r"(?<![\w.])\+?\(?\d[\d\s().-]{6,}\d(?![\w.])")
+SOCIAL = SOCIAL_LINK
+PRICE = re.compile(r"(?:[$€£৳₹]|\b(?:USD|BDT|EUR|GBP|Tk|Rs)\.?)\s?\d[\d,]*(?:\.\d+)?|\b\d[\d,]*(?:\.\d+)?\s?(?:USD|BDT|EUR|taka|dollars)\b", re.I)
+DATE = re.compile(
+    r"\b(?:\d{1,2}\s+)?(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b"
+    r"|\b\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?,?\s+\d{4}\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b"
+)
+TITLED_NAME = re.compile(r"\b(?:Dr|Prof|Mr|Mrs|Ms|Md|Mst|Engr|Sir)\.?\s+[A-Z][a-z]+")
+NAME = re.compile(r"\b([A-Z][a-z]+)(?:\s+[A-Z]\.)?\s+([A-Z][a-z]{2,})\b")
+ROLE = re.compile(
+    r"\b(?:professor|lecturer|director|manager|ceo|cto|cfo|founder|officer|dean|chair(?:man|person)?|"
+    r"engineer|researcher|scientist|doctor|surgeon|president|coordinator|head of|principal|"
+    r"teacher|consultant|advisor|secretary|registrar|librarian|specialist|analyst|developer)\b",
+    re.I
+)
+BOILERPLATE = re.compile(
+    r"\bcookies?\b|privacy policy|terms (?:of (?:use|service)|and conditions)|all rights reserved|"
+    r"©|\bconsent\b|accept all|skip to (?:main )?content",
+    re.I
+)
+
+# capitalized word pairs of menus and banners that are not names
+NOT_NAMES = {
+    "about", "us", "our", "home", "contact", "news", "events", "privacy", "policy", "terms",
+    "cookie", "cookies", "settings", "read", "more", "sign", "log", "login", "register", "search",
+    "menu", "main", "page", "next", "previous", "back", "top", "view", "all", "learn", "apply",
+    "now", "site", "map", "the", "and", "for", "with", "accept", "reject", "manage", "quick",
+    "links", "useful", "follow", "share", "subscribe", "student", "students", "faculty", "staff",
+    "department", "departments", "university", "college", "school", "office", "services",
+    "research", "academic", "academics", "admission", "admissions", "international", "welcome",
+}
+
+
+def signals(text: str) -> dict:
+    names = sum(
+        1 for first, last in NAME.findall(text)
+        if first.lower() not in NOT_NAMES and last.lower() not in NOT_NAMES
+    )
+    return {
+        "email": len(EMAIL.findall(text)),
+        "phone": sum(1 for p in PHONE.findall(text) if sum(c.isdigit() for c in p) >= 8),
+        "social": len(SOCIAL.findall(text)),
+        "price": len(PRICE.findall(text)),
+        "date": len(DATE.findall(text)),
+        "name": names + len(TITLED_NAME.findall(text)),
+        "role": len(ROLE.findall(text)),
+    }
+
+
+def score(found: dict) -> float:
+    return sum(WEIGHTS[k] * n for k, n in found.items())
+
+
+def link_counts(node, counts: dict):
+    # (links, link chars, text chars) of a block and everything in it, from the counts
+    # html_parse.Block keeps per block; they hold whether or not anchors were kept in the
+    # text (LLM_MEDIA), so compact blocks gate like "all" ones
+    if isinstance(node, str):
+        return 0, 0, 0
+    key = id(node)
+    if key not in counts:
+        total = [getattr(node, "links", 0), getattr(node, "link_chars", 0), getattr(node, "text_chars", 0)]
+        for child in node:
+            for i, n in enumerate(link_counts(child, counts)):
+                total[i] += n
+        counts[key] = tuple(total)
+    return counts[key]
+
+
+def is_boilerplate(text: str, links: int = 0, link_chars: int = 0, text_chars: int = 0) -> bool:
+    # link lists (menus, tag clouds, pagination) and cookie/legal banners without any
+    # scored signal (contact data, social profile, price, date, name or role) in them
+    if score(signals(text)):
+        return False
+    if links >= 2 and link_chars >= GATE_LINK_DENSITY * text_chars:
+        return True
+    return bool(BOILERPLATE.search(text))
+
+
+def prune_blocks(tree):
+    # Drops small boilerplate subtrees of html_parse's block tree (never the root, never
+    # one over GATE_PRUNE_TOKENS); returns (tree, texts dropped).
+    sizes, counts, dropped = {}, {}, []
+
+    def prune(node, root=False):
+        if isinstance(node, str):
+            return node
+        text, tokens = measure(node, sizes)
+        if not root and text and tokens <= GATE_PRUNE_TOKENS and is_boilerplate(text, *link_counts(node, counts)):
+            dropped.append(text)
+            return None
+        return [c for c in (prune(child) for child in node) if c is not None and c != []]
+
+    return prune(tree, root=True) or [], dropped
+
+
+def gate_page(tree):
+    # Block tree -> (<block> texts for the LLM, stats). Boilerplate subtrees are removed
+    # before packing, so what is left merges into fewer blocks; packed blocks that still
+    # score below GATE_MIN_SCORE are not sent.
+    tree, dropped = prune_blocks(tree) if GATE_BLOCKS else (tree, [])
+    sent, skipped_tokens, skipped_blocks = [], 0, 0
+    for block in chunk_blocks(tree):
+        if GATE_BLOCKS and score(signals(block)) < GATE_MIN_SCORE:
+            skipped_blocks += 1
+            skipped_tokens += count_tokens(block)
+        else:
+            sent.append(block)
+    tokens_sent = sum(count_tokens(b) for b in sent)
+    skipped_tokens += sum(count_tokens(t) for t in dropped)
+    stats = {
+        "blocks_sent": len(sent),
+        "blocks_skipped": skipped_blocks,
+        "subtrees_pruned": len(dropped),
+        "tokens_sent": tokens_sent,
+        "tokens_skipped": skipped_tokens,
+        "tokens_skipped_share": round(skipped_tokens / max(1, tokens_sent + skipped_tokens), 3),
+    }
+    return sent, stats
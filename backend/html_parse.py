@@ -0,0 +1,215 @@
+# html_parse.py
+import os
+import re
+from urllib.parse import urljoin, urlparse
+import lxml.html
+from lxml import etree
+
+# subtrees left out of the text sent to the LLM (links inside them still feed the frontier)
+SKIP_TAGS = {"script", "style", "header", "footer", "nav", "noscript", "template", "svg"}
+
+# links and images in the blocks sent to the LLM: "all" (every anchor and image), or
+# "compact": only social profile, mailto: and tel: links, and images inside person-like
+# containers; the prompt only needs links for "social" and images for people
+LLM_MEDIA = os.getenv("LLM_MEDIA", "compact").lower()
+
+SOCIAL_LINK = re.compile(
+    r"(?:facebook|linkedin|twitter|instagram|youtube|github|tiktok|researchgate|scholar\.google)\.com|//(?:www\.)?x\.com/",
+    re.I
+)
+
+# class/id of elements holding one person (staff cards, author boxes, team members); whole
+# words of it only, so "biology-dept" or "discard" don't match
+PERSON_CONTAINER = re.compile(
+    r"(?:^|[\s_-])(?:person|people|profile|member|staff|faculty|team|author|speaker|teacher|employee|"
+    r"bio|biography|avatar|card|vcard)s?(?:$|[\s_-])",
+    re.I
+)
+
+# elements that start a new block of the chunker's tree (cards, list items, table rows, sections)
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "dd", "details", "dialog", "div", "dl",
+    "dt", "fieldset", "figcaption", "figure", "form", "h1", "h2", "h3", "h4", "h5", "h6", "li",
+    "main", "ol", "p", "pre", "section", "summary", "table", "tbody", "td", "tfoot", "th",
+    "thead", "tr", "ul",
+}
+
+
+class Block(list):
+    # A block of the tree: its pieces and nested blocks, plus counts of the visible text
+    # directly in it (not in nested blocks) for the gate's link density, whether or not
+    # the anchors themselves are kept
+    __slots__ = ("links", "link_chars", "text_chars")
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.links = 0
+        self.link_chars = 0
+        self.text_chars = 0
+
+
+def _is_visible(el) -> bool:
+    style = el.get("style") or ""
+    if "display:none" in style.replace(" ", "").lower():
+        return False
+    if (el.get("aria-hidden") or "").lower() == "true":
+        return False
+    return True
+
+
+def _local_name(el):
+    # comments / processing instructions have a callable tag; svg children may carry a namespace
+    tag = el.tag
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit("}", 1)[-1].lower()
+
+
+def _anchor_text(a) -> str:
+    # same as BeautifulSoup's get_text(strip=True), minus skipped subtrees
+    out = []
+
+    def walk(el):
+        if el.text and el.text.strip():
+            out.append(el.text.strip())
+        for child in el:
+            name = _local_name(child)
+            if name is not None and name not in SKIP_TAGS:
+                walk(child)
+            if child.tail and child.tail.strip():
+                out.append(child.tail.strip())
+
+    walk(a)
+    return "".join(out)
+
+
+def classify_link(url: str, base_domain: str, href: str, base_links: set, external_links: set):
+    abs_link = urljoin(url, href)
+    link_domain = urlparse(abs_link).netloc
+
+    if link_domain == base_domain:
+        base_links.add(abs_link)
+    elif (
+        link_domain != base_domain
+        and not abs_link.startswith("mailto:")
+        and not abs_link.startswith("tel:")
+    ):
+        external_links.add(abs_link)
+
+
+def keep_link(href: str) -> bool:
+    return href.lower().startswith(("mailto:", "tel:")) or bool(SOCIAL_LINK.search(href))
+
+
+def _is_person_container(el) -> bool:
+    return bool(PERSON_CONTAINER.search(f"{el.get('class') or ''} {el.get('id') or ''}"))
+
+
+def parse_html(url: str, page_source: str, media: str = None) -> dict:
+    # One lxml parse and one traversal for title, links, visible text, images and anchors.
+    # The text matches scraper.extract_text_with_media, except that comments and the
+    # doctype are no longer emitted as text.
+    # "blocks" is the same content as a tree for chunker.chunk_blocks: a Block per block
+    # element holding text pieces and nested Blocks, images and anchors where they appear
+    # (which of them depends on `media`, see LLM_MEDIA).
+    compact = (media or LLM_MEDIA) == "compact"
+    base_domain = urlparse(url).netloc
+    result = {"title": None, "base_links": [], "external_links": [], "text": "", "blocks": []}
+    try:
+        try:
+            root = lxml.html.document_fromstring(page_source)
+        except ValueError:
+            # str input with an XML encoding declaration
+            root = lxml.html.document_fromstring(page_source.encode("utf-8"))
+    except (etree.ParserError, ValueError):
+        return result
+
+    base_links, external_links = set(), set()
+    texts, images, anchors = [], [], []
+    skipping = None  # element whose subtree is currently skipped
+    tree = Block()
+    stack = [tree]  # open blocks, innermost last
+    opened = []  # block elements matching stack[1:]
+    people = []  # open person-like containers
+    link = None  # kept anchor whose text is already in its <a> entry (compact)
+    anchor = None  # outermost open anchor, kept or not
+
+    def add_text(text):
+        texts.append(text)
+        chars = len("".join(text.split()))
+        stack[-1].text_chars += chars
+        if anchor is not None:
+            stack[-1].link_chars += chars
+        # the entry already carries all of the link's text
+        if link is None:
+            stack[-1].append(text)
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        name = _local_name(el)
+
+        if event == "start":
+            if name == "a" and el.get("href") is not None:
+                # every anchor feeds the frontier, even inside nav/header/footer
+                classify_link(url, base_domain, el.get("href"), base_links, external_links)
+            if skipping is not None or name is None:
+                continue
+            if name in SKIP_TAGS:
+                skipping = el
+                continue
+            if compact and _is_person_container(el):
+                people.append(el)
+            if name in BLOCK_TAGS:
+                block = Block()
+                stack[-1].append(block)
+                stack.append(block)
+                opened.append(el)
+            if name == "title" and result["title"] is None:
+                result["title"] = el.text_content().strip()
+            elif name == "img":
+                images.append(f"<img src='{el.get('src', '')}' alt='{el.get('alt', '')}'>")
+                if not compact or people:
+                    stack[-1].append(images[-1])
+            elif name == "a" and el.get("href") is not None:
+                anchors.append(f"<a href='{el.get('href')}'>{_anchor_text(el)}</a>")
+                stack[-1].links += 1
+                if anchor is None:
+                    anchor = el
+                if not compact or keep_link(el.get("href").strip()):
+                    stack[-1].append(anchors[-1])
+                    if compact and link is None:
+                        link = el
+            if el.text and _is_visible(el):
+                text = el.text.strip()
+                if text:
+                    add_text(text)
+        else:
+            if el is skipping:
+                skipping = None
+            elif skipping is not None:
+                continue
+            if opened and opened[-1] is el:
+                opened.pop()
+                stack.pop()
+            if people and people[-1] is el:
+                people.pop()
+            if el is link:
+                link = None
+            if el is anchor:
+                anchor = None
+            # a tail belongs to the parent element, it survives removal of `el`
+            parent = el.getparent()
+            if el.tail and parent is not None and _is_visible(parent):
+                text = el.tail.strip()
+                if text:
+                    add_text(text)
+
+    result["base_links"] = list(base_links)
+    result["external_links"] = list(external_links)
+    if root.find("body") is None:
+        # same fallback as extract_text_with_media: no <body>, send the raw markup
+        result["text"] = page_source
+        result["blocks"] = [page_source]
+    else:
+        result["text"] = " ".join(texts + images + anchors)
+        result["blocks"] = tree
+    return result
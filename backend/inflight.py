@@ -0,0 +1,159 @@
+# inflight.py
+# Caps the requests in flight to one Ollama server across processes: pool workers and
+# worker.py processes each have their own threads, so a per-process semaphore lets
+# Ollama see the limit times the number of processes.
+import os
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# where the limit holds: "host" (lock files shared by every process on the machine),
+# "cluster" (leases in scraperdb.llm_slots, for several machines on one Ollama server)
+# or "process" (each process on its own)
+OLLAMA_INFLIGHT_SCOPE = os.getenv("OLLAMA_INFLIGHT_SCOPE", "host").lower()
+OLLAMA_SLOTS_PATH = os.getenv("OLLAMA_SLOTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "ollama_slots"))
+
+# a cluster slot whose process stops renewing it is free again after this many seconds
+OLLAMA_SLOT_LEASE = float(os.getenv("OLLAMA_SLOT_LEASE", "60"))
+
+# seconds between two tries while every slot is taken
+SLOT_POLL_INTERVAL = 0.05
+
+
+class FileSlots:
+    # One lock file per slot; the kernel drops a dead process's locks with its descriptors.
+
+    def __init__(self, server: str, size: int, path: str = OLLAMA_SLOTS_PATH):
+        import fcntl
+        self.fcntl = fcntl
+        self.size = max(1, int(size))
+        self.path = os.path.join(path, hashlib.sha1(server.encode("utf-8")).hexdigest()[:12])
+        os.makedirs(self.path, exist_ok=True)
+
+    def _try(self, i: int):
+        fd = os.open(os.path.join(self.path, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self.fcntl.flock(fd, self.fcntl.LOCK_EX | self.fcntl.LOCK_NB)
+            return fd
+        except OSError:
+            os.close(fd)
+            return None
+
+    @contextmanager
+    def hold(self):
+        while True:
+            for i in range(self.size):
+                fd = self._try(i)
+                if fd is not None:
+                    try:
+                        yield
+                    finally:
+                        os.close(fd)
+                    return
+            time.sleep(SLOT_POLL_INTERVAL)
+
+
+class MongoSlots:
+    # `size` docs in scraperdb.llm_slots per server, each held under a lease this process
+    # renews while the request runs (like the leases of distributed.py).
+
+    def __init__(self, server: str, size: int, collection=None, lease: float = OLLAMA_SLOT_LEASE):
+        if collection is None:
+            from db import get_db
+            collection = get_db()["llm_slots"]
+        self.collection = collection
+        self.lease = lease
+        self.ids = [f"{server}#{i}" for i in range(max(1, int(size)))]
+        self._held = set()
+        self._lock = threading.Lock()
+        self._keeper = None
+        self._created = False
+
+    def _create(self):
+        from pymongo.errors import BulkWriteError
+        try:
+            self.collection.insert_many([{"_id": i, "owner": None, "until": 0} for i in self.ids], ordered=False)
+        except BulkWriteError:
+            # other processes created them first
+            pass
+        self._created = True
+
+    def _keep(self):
+        while True:
+            time.sleep(self.lease / 3)
+            with self._lock:
+                held = list(self._held)
+            if held:
+                try:
+                    self.collection.update_many(
+                        {"owner": {"$in": held}}, {"$set": {"until": time.time() + self.lease}}
+                    )
+                except Exception as e:
+                    print(f"⚠️ Ollama slot renewal failed: {e}")
+
+    def _claim(self, owner: str) -> bool:
+        now = time.time()
+        return self.collection.find_one_and_update(
+            {"_id": {"$in": self.ids}, "$or": [{"owner": None}, {"until": {"$lt": now}}]},
+            {"$set": {"owner": owner, "until": now + self.lease}},
+            projection={"_id": 1}
+        ) is not None
+
+    @contextmanager
+    def hold(self):
+        owner = uuid.uuid4().hex
+        with self._lock:
+            if self._keeper is None:
+                self._keeper = threading.Thread(target=self._keep, daemon=True)
+                self._keeper.start()
+        while not self._claim(owner):
+            if not self._created:
+                self._create()
+                continue
+            time.sleep(SLOT_POLL_INTERVAL)
+        with self._lock:
+            self._held.add(owner)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held.discard(owner)
+            try:
+                self.collection.update_one({"owner": owner}, {"$set": {"owner": None, "until": 0}})
+            except Exception as e:
+                # the lease runs out on its own
+                print(f"⚠️ Ollama slot release failed: {e}")
+
+
+class NoSlots:
+    # "process" scope: the caller's own semaphore is the only limit
+
+    @contextmanager
+    def hold(self):
+        yield
+
+
+_slots = None
+_slots_pid = None
+_slots_lock = threading.Lock()
+
+
+def get_slots(server: str, size: int):
+    # one per process; falls back to the per-process limit if the shared one can't be set up
+    global _slots, _slots_pid
+    with _slots_lock:
+        if _slots is None or _slots_pid != os.getpid():
+            _slots_pid = os.getpid()
+            try:
+                if OLLAMA_INFLIGHT_SCOPE == "cluster":
+                    _slots = MongoSlots(server, size)
+                elif OLLAMA_INFLIGHT_SCOPE == "host":
+                    _slots = FileSlots(server, size)
+                else:
+                    _slots = NoSlots()
+            except Exception as e:
+                print(f"⚠️ Shared Ollama limit not available ({e}), limiting this process only")
+                _slots = NoSlots()
+    return _slots
@@ -0,0 +1,187 @@
+# llm_cache.py
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+import metrics
+
+# "disk" (local sqlite file), "mongo" (scraperdb.llm_cache) or "off"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "disk").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "llm_cache.sqlite3"))
+
+# entries older than this are ignored and evicted (seconds)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+# least recently used entries are evicted above this size
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "200000"))
+
+# run eviction every N writes
+EVICT_EVERY = 500
+
+
+def cache_key(model: str, prompt_version: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(f"{model}\0{prompt_version}\0".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class DiskCache:
+    # sqlite file shared by every worker process on the machine
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl > 0 and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        if self.ttl > 0:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        conn.commit()
+
+
+class MongoCache:
+    # scraperdb.llm_cache; a TTL index expires entries, size is trimmed by last access
+
+    def __init__(self, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        from db import get_db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.collection = get_db()["llm_cache"]
+        self._writes = 0
+        try:
+            if ttl > 0:
+                self.collection.create_index("created_at", expireAfterSeconds=ttl, background=True)
+            self.collection.create_index("accessed_at", background=True)
+        except Exception:
+            # If index creation fails (permissions, already exists) we continue
+            pass
+
+    def get(self, key: str):
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            {"$set": {"accessed_at": datetime.now(timezone.utc)}},
+            projection={"value": 1, "created_at": 1}
+        )
+        if not doc:
+            return None
+        created = doc.get("created_at")
+        if self.ttl > 0 and created is not None:
+            # the TTL monitor only runs once a minute; don't serve entries it hasn't removed yet
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            if (datetime.now(timezone.utc) - created).total_seconds() > self.ttl:
+                return None
+        return doc.get("value")
+
+    def set(self, key: str, value):
+        now = datetime.now(timezone.utc)
+        self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "created_at": now, "accessed_at": now}},
+            upsert=True
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self._evict()
+
+    def _evict(self):
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        oldest = [d["_id"] for d in self.collection.find({}, {"_id": 1}).sort("accessed_at", 1).limit(excess)]
+        if oldest:
+            self.collection.delete_many({"_id": {"$in": oldest}})
+
+
+class LLMCache:
+    # Content-addressed cache of parsed extraction results; failures never break extraction.
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, key: str):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ LLM cache read failed: {e}")
+            value = None
+        metrics.incr("llm_cache_hits" if value is not None else "llm_cache_misses")
+        return value
+
+    def set(self, key: str, value):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # None when caching is turned off
+    global _cache
+    if LLM_CACHE_BACKEND == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            backend = MongoCache() if LLM_CACHE_BACKEND == "mongo" else DiskCache()
+            _cache = LLMCache(backend)
+    return _cache
@@ -3,66 +3,324 @@ import requests
 import re
 import json
 import time
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import metrics
+from llm_cache import get_cache, cache_key
+from chunker import CHUNK_TOKENS
+from inflight import get_slots
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+OLLAMA_URL = f"{OLLAMA_BASE_URL}/api/chat"
 DEFAULT_MODEL = "llama3:8b"
 DEFAULT_RETRIES = 2
 RETRY_BACKOFF = 1.5
 
+# bump whenever the prompt or schema below changes, so cached extractions are not reused
+PROMPT_VERSION = "3"
+
+# max requests in flight to the Ollama server, across all pages, threads and processes
+# (of the machine, or of every machine with OLLAMA_INFLIGHT_SCOPE=cluster, see inflight.py)
+OLLAMA_MAX_INFLIGHT = int(os.getenv("OLLAMA_MAX_INFLIGHT", "4"))
+
+# blocks of one page sent concurrently by process_blocks
+BLOCK_CONCURRENCY = int(os.getenv("BLOCK_CONCURRENCY", "4"))
+
+# whole generation, including a cold model load (seconds)
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "1800"))
+
+# streamed output is abandoned when it has this many characters and still no "{" (prose)
+OLLAMA_PROSE_LIMIT = int(os.getenv("OLLAMA_PROSE_LIMIT", "300"))
+
+# ... or when its tail is one short pattern repeated over this many characters
+OLLAMA_REPEAT_SPAN = int(os.getenv("OLLAMA_REPEAT_SPAN", "240"))
+
+# lines read after the closing brace while waiting for the final one (structured output)
+OLLAMA_DONE_GRACE = int(os.getenv("OLLAMA_DONE_GRACE", "8"))
+
+# "0" leaves the output format to the prompt alone instead of EXTRACTION_SCHEMA
+OLLAMA_STRUCTURED = os.getenv("OLLAMA_STRUCTURED", "1") != "0"
+
+# generation options; num_ctx must hold the prompt, a CHUNK_TOKENS block and the answer.
+# The JSON of a dense block is longer than the block; an answer cut at num_predict is
+# asked again once with the rest of the context as its limit.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", str(3 * CHUNK_TOKENS)))
+OLLAMA_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0"))
+
+# how long Ollama keeps the model loaded after a request ("30m", "-1" for ever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# a load_duration above this counts as a model (re)load
+OLLAMA_COLD_LOAD = float(os.getenv("OLLAMA_COLD_LOAD", "1.0"))
+
+_inflight = threading.BoundedSemaphore(OLLAMA_MAX_INFLIGHT)
+_session = None
+_session_lock = threading.Lock()
+_warmed = False
+
+# -------- Prompt and output schema --------
+# Sent as the system message of every chat request, so the start of every prompt is the
+# same and Ollama reuses its evaluated prefix; the HTML goes in the user message.
+SYSTEM_PROMPT = """You are an information extraction system.
+Input:
+- HTML content grouped into <block>...</block>.
+- Each block may describe people, organizations, products, events, services, courses, or general information.
+- Images may appear as <img src='...' alt='...'> → map these to "image" field.
+- Links appear as <a href='...'>text</a> → if they are social media (Facebook, LinkedIn, Twitter, Instagram, YouTube, GitHub, etc.), map them to "social".
+
+Task:
+- Extract all factual data into the schema below.
+- Output must be valid JSON **only**. No explanations, no markdown fences.
+- Preserve numbers, currencies, emails, phones, and proper names exactly.
+- If a field is missing, use empty string, empty list, or empty object.
+
+Schema:
+{
+    "people": [
+        {"name":"","role":"","title":"","email":[],"phone":[],"location":"","image":"","description":"","social":[]}
+    ],
+    "organization": [
+        {"name":"","description":"","address":"","contact":{"email":[],"phone":[],"social":[]}}
+    ],
+    "products": [
+        {"name":"","price":"","description":"","image":"","reviews":[]}
+    ],
+    "events": [
+        {"name":"","date":"","time":"","location":"","description":"","organizer":"","speakers":[]}
+    ],
+    "services": [
+        {"name":"","description":"","fee":"", "department":"","contact":{"email":[],"phone":[]}}
+    ],
+    "courses": [
+        {"name":"","department":"","duration":"", "fee":"","instructor":"","description":"","contact":{"email":[],"phone":[]}}
+    ],
+    "content": {"articles":[],"news":[],"blogs":[],"faqs":[],"policies":[],"announcements":[]},
+    "other_info":[]
+}
+
+Rules:
+- Always return JSON with all keys present.
+- If no data for a section, return empty list, empty string, or empty object.
+- No explanations, no text outside JSON.
+
+The user message is the HTML to extract from."""
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+_STR = {"type": "string"}
+_STRS = {"type": "array", "items": _STR}
+_LIST = {"type": "array"}
+
+
+def _obj(**properties):
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+
+def _list_of(**properties):
+    return {"type": "array", "items": _obj(**properties)}
+
+
+# same shape as the schema in the prompt; sent as "format" so the output always parses
+EXTRACTION_SCHEMA = _obj(
+    people=_list_of(
+        name=_STR, role=_STR, title=_STR, email=_STRS, phone=_STRS, location=_STR,
+        image=_STR, description=_STR, social=_STRS
+    ),
+    organization=_list_of(
+        name=_STR, description=_STR, address=_STR, contact=_obj(email=_STRS, phone=_STRS, social=_STRS)
+    ),
+    products=_list_of(name=_STR, price=_STR, description=_STR, image=_STR, reviews=_LIST),
+    events=_list_of(
+        name=_STR, date=_STR, time=_STR, location=_STR, description=_STR, organizer=_STR, speakers=_STRS
+    ),
+    services=_list_of(
+        name=_STR, description=_STR, fee=_STR, department=_STR, contact=_obj(email=_STRS, phone=_STRS)
+    ),
+    courses=_list_of(
+        name=_STR, department=_STR, duration=_STR, fee=_STR, instructor=_STR, description=_STR,
+        contact=_obj(email=_STRS, phone=_STRS)
+    ),
+    content=_obj(articles=_LIST, news=_LIST, blogs=_LIST, faqs=_LIST, policies=_LIST, announcements=_LIST),
+    other_info=_LIST,
+)
+
+
+def get_session():
+    # one pooled keep-alive session per process, sized to the in-flight limit
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_MAX_INFLIGHT)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
 
-def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
-    prompt = f"""
-        You are an information extraction system.
-        Input:
-        - HTML content grouped into <block>...</block>.
-        - Each block may describe people, organizations, products, events, services, courses, or general information.
-        - Images may appear as <img src='...' alt='...'> → map these to "image" field.
-        - Links appear as <a href='...'>text</a> → if they are social media (Facebook, LinkedIn, Twitter, Instagram, YouTube, GitHub, etc.), map them to "social".
-
-        Task:
-        - Extract all factual data into the schema below.
-        - Output must be valid JSON **only**. No explanations, no markdown fences.
-        - Preserve numbers, currencies, emails, phones, and proper names exactly.
-        - If a field is missing, use empty string, empty list, or empty object.
-        
-        Schema:
-        {{
-            "people": [
-                {{"name":"","role":"","title":"","email":[],"phone":[],"location":"","image":"","description":"","social":[]}}
-            ],
-            "organization": [
-                {{"name":"","description":"","address":"","contact":{{"email":[],"phone":[],"social":[]}}}}
-            ],
-            "products": [
-                {{"name":"","price":"","description":"","image":"","reviews":[]}}
-            ],
-            "events": [
-                {{"name":"","date":"","time":"","location":"","description":"","organizer":"","speakers":[]}}
-            ],
-            "services": [
-                {{"name":"","description":"","fee":"", "department":"","contact":{{"email":[],"phone":[]}}}}
-            ],
-            "courses": [
-                {{"name":"","department":"","duration":"", "fee":"","instructor":"","description":"","contact":{{"email":[],"phone":[]}}}}
-            ],
-            "content": {{"articles":[],"news":[],"blogs":[],"faqs":[],"policies":[],"announcements":[]}},
-            "other_info":[]
-        }}
-
-        Rules:
-        - Always return JSON with all keys present.
-        - If no data for a section, return empty list, empty string, or empty object.
-        - No explanations, no text outside JSON.
-
-        HTML:
-        {text}
-    """
 
-    payload = {
+def request_fields() -> dict:
+    # model, format, options and keep_alive of every request to Ollama
+    fields = {
         "model": DEFAULT_MODEL,
-        "prompt": prompt,
-        "stream": False
+        "options": {"num_ctx": OLLAMA_NUM_CTX, "num_predict": OLLAMA_NUM_PREDICT, "temperature": OLLAMA_TEMPERATURE},
+        "keep_alive": OLLAMA_KEEP_ALIVE,
     }
+    if OLLAMA_STRUCTURED:
+        fields["format"] = EXTRACTION_SCHEMA
+    return fields
+
+
+def record_load(data: dict):
+    # Ollama reports durations in nanoseconds on the last ("done") line
+    load = data.get("load_duration", 0) / 1e9
+    metrics.incr("llm_load_seconds", load)
+    if load > OLLAMA_COLD_LOAD:
+        metrics.incr("llm_model_loads")
+        print(f"🧠 Ollama loaded {DEFAULT_MODEL} in {load:.1f} sec")
+
+
+def warm_up(background: bool = True):
+    # Loads the model with the options of the real requests (another num_ctx would load it
+    # again) and evaluates the system prompt once, so the first page pays for neither;
+    # once per process, best-effort.
+    global _warmed
+    with _session_lock:
+        if _warmed:
+            return
+        _warmed = True
+
+    def load():
+        try:
+            fields = request_fields()
+            fields["options"] = {**fields["options"], "num_predict": 1}
+            payload = {**fields, "messages": [SYSTEM_MESSAGE], "stream": False}
+            response = get_session().post(OLLAMA_URL, json=payload, timeout=OLLAMA_TIMEOUT)
+            response.raise_for_status()
+            record_load(response.json())
+        except Exception as e:
+            print(f"⚠️ Ollama warm-up failed: {e}")
+
+    if background:
+        threading.Thread(target=load, daemon=True).start()
+    else:
+        load()
+
+
+class JsonStream:
+    # Scans generated text as it arrives for the first top-level JSON object, so the
+    # request can stop as soon as the object closes, and tells degenerate output apart.
+
+    def __init__(self, prose_limit: int = OLLAMA_PROSE_LIMIT, repeat_span: int = OLLAMA_REPEAT_SPAN):
+        self.text = ""
+        self.start = -1
+        self.end = -1
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.prose_limit = prose_limit
+        self.repeat_span = repeat_span
+        self._checked = 0
+
+    def feed(self, piece: str) -> bool:
+        # True once the object is complete (self.obj())
+        pos = len(self.text)
+        self.text += piece
+        for i in range(pos, len(self.text)):
+            c = self.text[i]
+            if self.start < 0:
+                if c == "{":
+                    self.start, self.depth = i, 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c == "{":
+                self.depth += 1
+            elif c == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = i + 1
+                    return True
+        return False
+
+    def obj(self):
+        return self.text[self.start:self.end] if self.end > 0 else None
+
+    def degenerate(self):
+        # "prose", "repeat" or None
+        if self.start < 0 and len(self.text.strip()) > self.prose_limit:
+            return "prose"
+        # the tail check runs every 32 characters
+        if len(self.text) - self._checked < 32 or len(self.text) < self.repeat_span:
+            return None
+        self._checked = len(self.text)
+        tail = self.text[-self.repeat_span:]
+        for period in range(1, 65):
+            unit = tail[-period:]
+            if unit * (self.repeat_span // period) == tail[len(tail) - period * (self.repeat_span // period):]:
+                return "repeat"
+        return None
+
+
+def stream_chat(payload: dict):
+    # Streams /api/chat; returns (text, how it ended): "object" when the first JSON
+    # object closed (then the connection is dropped, which stops the generation), "done",
+    # "length" (cut at num_predict), "prose", "repeat" or "timeout". Tokens outside the
+    # object count as wasted.
+    scan = JsonStream()
+    deadline = time.time() + OLLAMA_TIMEOUT
+    tokens = useful = closed_at = 0
+    end = "done"
+    structured = "format" in payload
+    start = time.time()
+    with get_session().post(OLLAMA_URL, json={**payload, "stream": True}, stream=True, timeout=(10, OLLAMA_TIMEOUT)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise requests.exceptions.RequestException(data["error"])
+            if tokens == 0:
+                metrics.incr("llm_first_token_seconds", time.time() - start)
+            tokens += 1
+            if end != "object":
+                if scan.feed((data.get("message") or {}).get("content", "")):
+                    end, closed_at = "object", tokens
+                useful += scan.start >= 0
+            if data.get("done"):
+                record_load(data)
+                if end != "object" and data.get("done_reason") == "length":
+                    end = "length"
+                break
+            if end == "object":
+                # under "format" the final line (with load_duration) follows the closing
+                # brace right away; anything longer is not waited for
+                if not structured or tokens - closed_at > OLLAMA_DONE_GRACE:
+                    break
+                continue
+            stop = scan.degenerate() or ("timeout" if time.time() > deadline else None)
+            if stop:
+                end = stop
+                break
+    metrics.incr(f"llm_stream_{end}")
+    metrics.incr("llm_tokens_generated", tokens)
+    metrics.incr("llm_tokens_wasted", tokens - useful if scan.end > 0 else tokens)
+    if end in ("prose", "repeat", "timeout"):
+        print(f"⚠️ Ollama output abandoned ({end}) after {tokens} tokens")
+    return (scan.obj() if end == "object" else scan.text), end
+
+
+def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
+    # only the user message changes between chunks
+    payload = {**request_fields(), "messages": [SYSTEM_MESSAGE, {"role": "user", "content": text}]}
 
     required_keys = [
         "people", "organization", "products", "events",
@@ -72,14 +330,20 @@ def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
     for attempt in range(1, retries + 1):
         try:
             print("\n🔃 Sending chunk to Ollama (attempt %d)\n" % attempt)
-            start_time = time.time()
-            response = requests.post(OLLAMA_URL, json=payload, timeout=1800)
-            response.raise_for_status()
-            elapsed = time.time() - start_time
-            print(f"⚡ Extraction took {elapsed:.2f} sec\n")
-
-            data = response.json()
-            raw_text = data.get("response", "").strip()
+            with _inflight, get_slots(OLLAMA_BASE_URL, OLLAMA_MAX_INFLIGHT).hold():
+                start_time = time.time()
+                raw_text, end = stream_chat(payload)
+                if end == "length" and payload["options"].get("num_predict") != -2:
+                    metrics.incr("llm_truncated")
+                    print(f"⚠️ Answer cut at {payload['options'].get('num_predict')} tokens, asking again without the cap")
+                    # -2: generate until the context is full
+                    payload = {**payload, "options": {**payload["options"], "num_predict": -2}}
+                    raw_text, end = stream_chat(payload)
+                elapsed = time.time() - start_time
+            metrics.incr("llm_requests")
+            metrics.incr("llm_seconds", elapsed)
+            print(f"⚡ Extraction took {elapsed:.2f} sec ({end})\n")
+            raw_text = raw_text.strip()
 
             # 1) Try parse entire raw_text directly as JSON
             try:
@@ -88,7 +352,8 @@ def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
                 for k in required_keys:
                     if k not in parsed:
                         parsed[k] = [] if isinstance(parsed.get(k, None), list) or k in ["people", "products", "events", "services", "courses"] else {}
-                return {"data": parsed, "raw": raw_text}
+                metrics.incr("llm_parse_ok")
+                return {"data": parsed, "raw": raw_text, "parsed": True}
             except json.JSONDecodeError:
                 pass
 
@@ -100,7 +365,8 @@ def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
                     for k in required_keys:
                         if k not in parsed:
                             parsed[k] = [] if k in ["people", "products", "events", "services", "courses"] else {}
-                    return {"data": parsed, "raw": raw_text}
+                    metrics.incr("llm_parse_repaired")
+                    return {"data": parsed, "raw": raw_text, "parsed": True}
                 except json.JSONDecodeError:
                     pass
 
@@ -110,6 +376,7 @@ def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
                 "services": [], "courses": [], "content": {"articles": [], "news": [], "blogs": [], "faqs": [], "policies": [], "announcements": []},
                 "other_info": []
             }
+            metrics.incr("llm_parse_failed")
             return {"data": empty_schema, "raw": raw_text}
 
         except requests.exceptions.RequestException as e:
@@ -123,6 +390,7 @@ def send_to_ollama_chunk(text: str, retries: int = DEFAULT_RETRIES):
                 "services": [], "courses": [], "content": {"articles": [], "news": [], "blogs": [], "faqs": [], "policies": [], "announcements": []},
                 "other_info": []
             }
+            metrics.incr("llm_request_failed")
             return {"data": empty_schema, "raw": ""}
 
 def extract_first_json_object(s: str):
@@ -212,7 +480,15 @@ def merge_results(results):
 
 
 def process_with_ollama(block: str):
-    res = send_to_ollama_chunk(block)
+    # identical block text (shared sidebars, unchanged pages) is served from the cache
+    cache = get_cache()
+    key = cache_key(DEFAULT_MODEL, PROMPT_VERSION, block) if cache else None
+    res = cache.get(key) if cache else None
+    if res is None:
+        res = send_to_ollama_chunk(block)
+        # only successfully parsed output is cached; fallbacks are retried next time
+        if cache and isinstance(res, dict) and res.get("parsed"):
+            cache.set(key, res)
     all_data, all_raw = None, []
     if isinstance(res, dict):
         if res.get("data"):
@@ -220,3 +496,14 @@ def process_with_ollama(block: str):
         if res.get("raw"):
             all_raw.append(res["raw"])
     return {"data": all_data, "raw": all_raw}
+
+
+def process_blocks(blocks, concurrency: int = BLOCK_CONCURRENCY):
+    # Sends several blocks at once (still capped by OLLAMA_MAX_INFLIGHT); results keep block order.
+    if not blocks:
+        return []
+    workers = max(1, min(int(concurrency), len(blocks)))
+    if workers == 1:
+        return [process_with_ollama(b) for b in blocks]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(process_with_ollama, blocks))
@@ -1,27 +1,45 @@
 # main.py
 import uvicorn
 from fastapi import FastAPI
-from fastapi import Body
+from fastapi import Body, Request
 from typing import Optional
 import requests
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import json
+import asyncio
 from pydantic import BaseModel
 import os
 from db import get_db
+import metrics
 from multiprocessing import Process
-from crawler import start_async_crawl
-from search_api import serpapi_search
+from crawler import request_control, cancel_stopped_job, can_pause
+from scheduler import submit_crawl, submit_search, validate_crawl, resume_job, pause_queued, get_worker_pool, start_supervisor
+from progress_stream import progress_events
 
 class Data(BaseModel):
     url: str
     max_pages: int = 1
     max_depth: int = 10
+    concurrency: Optional[int] = None
+    incremental: Optional[bool] = None
+    frontier: Optional[str] = None
+    distributed: Optional[bool] = False
 
 app = FastAPI()
 
 db = get_db()
 progress_collection = db["progress"]
 
+@app.on_event("startup")
+def start_workers():
+    # jobs whose worker died (with the previous server or since) become resumable
+    start_supervisor()
+    get_worker_pool().ensure()
+
 # ==========================
 # API ROUTES
 # ==========================
@@ -31,12 +49,82 @@ progress_collection = db["progress"]
 def get_root():
     return {"Message": "Backend Server is running"}
 
+# page size of /api/data; the per-page link lists are left out unless asked for
+DATA_PAGE_SIZE = 100
+DATA_MAX_PAGE_SIZE = 1000
+DATA_DEFAULT_EXCLUDE = {"base_links": 0, "external_links": 0}
+
+
+def _timestamp(value: str) -> float:
+    # epoch seconds or an ISO date/datetime
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def data_query(cursor, job_id, domain, since, until) -> dict:
+    query = {}
+    if cursor:
+        query["_id"] = {"$gt": ObjectId(cursor)}
+    if job_id:
+        query["job_id"] = job_id
+    if domain:
+        query["domain"] = domain
+    if since or until:
+        query["crawled_at"] = {}
+        if since:
+            query["crawled_at"]["$gte"] = _timestamp(since)
+        if until:
+            query["crawled_at"]["$lt"] = _timestamp(until)
+    return query
+
+
+def data_projection(fields):
+    if not fields:
+        return DATA_DEFAULT_EXCLUDE
+    return {f.strip(): 1 for f in fields.split(",") if f.strip() and f.strip() != "_id"}
+
+
+def stream_ndjson(find):
+    # one document per line, written as the cursor yields them
+    for doc in find:
+        doc.pop("_id", None)
+        yield json.dumps(doc, default=str) + "\n"
+
+
 @app.get("/api/data")
 
 
-def get_data():
-    datas = list(db["data"].find({}, {"_id": 0}))
-    return {"dataCollections": datas}
+def get_data(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    job_id: Optional[str] = None,
+    domain: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    format: str = "json"
+):
+    # Pages in _id order. Pass next_cursor back as `cursor` for the next page;
+    # format=ndjson streams every match (or `limit` of them) instead.
+    try:
+        query = data_query(cursor, job_id, domain, since, until)
+    except (InvalidId, ValueError) as e:
+        return {"error": f"Invalid parameter: {e}"}
+    find = db["data"].find(query, data_projection(fields)).sort("_id", 1)
+
+    if format == "ndjson":
+        if limit:
+            find = find.limit(limit)
+        return StreamingResponse(stream_ndjson(find.batch_size(500)), media_type="application/x-ndjson")
+
+    limit = max(1, min(limit or DATA_PAGE_SIZE, DATA_MAX_PAGE_SIZE))
+    datas = list(find.limit(limit))
+    next_cursor = str(datas[-1]["_id"]) if len(datas) == limit else None
+    for doc in datas:
+        doc.pop("_id", None)
+    return {"dataCollections": datas, "next_cursor": next_cursor}
 
 @app.get("/api/progress")
 
@@ -45,14 +133,76 @@ def get_progress():
     docs = list(progress_collection.find({}, {"_id": 0}))
     return {"progress": docs}
 
+@app.get("/api/progress/{job_id}")
+
+
+def get_job_progress(job_id: str):
+    doc = progress_collection.find_one({"job_id": job_id}, {"_id": 0})
+    if not doc:
+        return {"error": f"Unknown job {job_id}"}
+    return {"progress": doc}
+
+@app.get("/api/progress/{job_id}/stream")
+async def stream_job_progress(job_id: str, request: Request):
+    # Server-sent events: "snapshot" with the whole doc, then "progress" with changed fields only
+    return StreamingResponse(
+        progress_events(progress_collection, job_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/metrics")
+
+
+def get_metrics():
+    return {"metrics": metrics.read_all()}
+
+@app.get("/api/scheduler")
+
+
+def get_scheduler():
+    return {"scheduler": get_worker_pool().stats()}
+
 @app.post("/api/crawl")
-def start_crawl(data: Data):
-    job_id = start_async_crawl(
+async def start_crawl(data: Data):
+    # only validates and records the job; robots.txt and the crawl itself happen in a worker
+    error = validate_crawl(data.url, data.max_pages, data.max_depth, data.frontier)
+    if error:
+        return {"error": error}
+    job_id, error = await asyncio.to_thread(
+        submit_crawl,
         data.url,
         max_pages=data.max_pages,
-        max_depth=data.max_depth
+        max_depth=data.max_depth,
+        concurrency=data.concurrency,
+        incremental=data.incremental,
+        frontier=data.frontier,
+        distributed=bool(data.distributed)
     )
-    return {"message": f"Crawling started for {data.url}", "job_id": job_id}
+    if error:
+        return {"error": error}
+    return {"message": f"Crawling queued for {data.url}", "job_id": job_id}
+
+@app.post("/api/jobs/{job_id}/{action}")
+def control_job(job_id: str, action: str):
+    if action not in ("pause", "resume", "cancel"):
+        return {"error": f"Unknown action: {action}"}
+
+    if action == "resume":
+        if not resume_job(job_id):
+            return {"error": "Job is not resumable (needs a mongo/disk frontier and a paused, interrupted or failed job)"}
+        return {"message": f"Job {job_id} queued again", "job_id": job_id}
+
+    if action == "pause" and not can_pause(job_id):
+        return {"error": "Job can't be paused: its in-memory frontier is lost when it stops (use a mongo/disk frontier)"}
+
+    if request_control(job_id, action):
+        return {"message": f"{action.capitalize()} requested for job {job_id}", "job_id": job_id}
+    if action == "pause" and pause_queued(job_id):
+        return {"message": f"Job {job_id} paused", "job_id": job_id}
+    if action == "cancel" and cancel_stopped_job(job_id):
+        return {"message": f"Job {job_id} cancelled", "job_id": job_id}
+    return {"error": f"Job {job_id} is not running"}
 
 
 
@@ -64,40 +214,31 @@ def start_crawl(data: Data):
 # /api/search-and-crawl
 # ==========================================
 @app.post("/api/search-and-crawl")
-def search_and_crawl(
+async def search_and_crawl(
     query: str = Body(..., embed=True),
     count: int = Body(10, embed=True),
     max_pages: int = Body(1, embed=True),
     max_depth: int = Body(5, embed=True)
 ):
+    # The SerpAPI query runs in a worker, which then queues one crawl per result. The
+    # search job's progress doc lists them under "jobs" (and "rejected") once it finished.
+    if not query.strip():
+        return {"error": "Empty query"}
+    if not 1 <= count <= 100 or max_pages < 1 or max_depth < 0:
+        return {"error": "count must be 1-100, max_pages at least 1 and max_depth at least 0"}
 
-    # 1. SerpAPI search
-    results = serpapi_search(query, count=count)
-
-    if not results:
-        return {"error": "No results found"}
-
-    urls = [item["url"] for item in results if item.get("url")]
-
-    if not urls:
-        return {"error": "Search returned no URLs"}
-
-    # 2. Start crawl jobs
-    job_ids = []
-    for url in urls:
-        job_id = start_async_crawl(url, max_pages=max_pages, max_depth=max_depth)
-        job_ids.append({"url": url, "job_id": job_id})
-
-    return {
-        "message": f"Started crawl for {len(job_ids)} URLs",
-        "jobs": job_ids
-    }
+    job_id, error = await asyncio.to_thread(submit_search, query.strip(), count, max_pages, max_depth)
+    if error:
+        return {"error": error}
+    return {"message": f"Search queued for {query.strip()!r}", "job_id": job_id}
 
 
 
 def start_crawl(data: Data):
-    job_id = start_async_crawl(data.url, max_pages=data.max_pages, max_depth=data.max_depth)
-    return {"message": f"Crawling started for {data.url}", "job_id": job_id}
+    job_id, error = submit_crawl(data.url, max_pages=data.max_pages, max_depth=data.max_depth)
+    if error:
+        return {"error": error}
+    return {"message": f"Crawling queued for {data.url}", "job_id": job_id}
 
 # ==========================
 # Serve React build (Vite dist/ folder)
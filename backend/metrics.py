@@ -0,0 +1,46 @@
+# metrics.py
+import threading
+from collections import Counter
+
+# in-process counters; flush() adds them to the shared "metrics" document in MongoDB
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name: str, n: float = 1):
+    with _lock:
+        _counters[name] += n
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counters)
+
+
+def flush():
+    # best-effort: counters are kept locally if MongoDB is unreachable
+    with _lock:
+        pending = dict(_counters)
+        _counters.clear()
+    if not pending:
+        return
+    try:
+        from db import get_db
+        get_db()["metrics"].update_one({"_id": "counters"}, {"$inc": pending}, upsert=True)
+    except Exception as e:
+        print(f"⚠️ Metrics flush failed: {e}")
+        with _lock:
+            _counters.update(pending)
+
+
+def read_all() -> dict:
+    # flushed totals from every worker, plus this process' unflushed counters
+    totals = {}
+    try:
+        from db import get_db
+        totals = get_db()["metrics"].find_one({"_id": "counters"}, {"_id": 0}) or {}
+    except Exception:
+        pass
+    for k, v in snapshot().items():
+        totals[k] = totals.get(k, 0) + v
+    return totals
@@ -0,0 +1,109 @@
+# pipeline.py
+import os
+import time
+import asyncio
+
+# bounded queue size between two stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+
+class Stage:
+    # A named step with its own worker count and a bounded input queue.
+    # handler(item) returns the item for the next stage, or None to drop it.
+    # on_error(item, exc) is called when the handler raises.
+
+    def __init__(self, name: str, handler, workers: int = 1, maxsize: int = PIPELINE_QUEUE_SIZE, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = max(1, int(workers))
+        self.queue = asyncio.Queue(maxsize=max(1, int(maxsize)))
+        self.next = None
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            self.busy += 1
+            started = time.monotonic()
+            try:
+                result = await self.handler(item)
+                self.processed += 1
+                self.busy_seconds += time.monotonic() - started
+                started = None
+                if result is not None and self.next is not None:
+                    # blocks while the next stage is full -> backpressure up the chain
+                    await self.next.queue.put(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ Pipeline stage '{self.name}' failed: {e}")
+                if self.on_error is not None:
+                    try:
+                        self.on_error(item, e)
+                    except Exception:
+                        pass
+            finally:
+                self.busy -= 1
+                if started is not None:
+                    self.busy_seconds += time.monotonic() - started
+                self.queue.task_done()
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6) if self.started_at else 0
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_max": self.queue.maxsize,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "per_sec": round(self.processed / elapsed, 3) if elapsed else 0.0,
+            # share of worker time spent in the handler; the stage near 1.0 is the bottleneck
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0,
+        }
+
+
+class Pipeline:
+    # Chains stages in order: stage[i] output feeds stage[i + 1] through its bounded queue.
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        for current, following in zip(self.stages, self.stages[1:]):
+            current.next = following
+
+    @property
+    def head(self) -> Stage:
+        return self.stages[0]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    async def join(self):
+        # stages are drained in order, so nothing can be re-queued upstream afterwards
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def stop(self):
+        for stage in self.stages:
+            await stage.stop()
+
+    def stats(self) -> dict:
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,95 @@
+# politeness.py
+import os
+import time
+import asyncio
+
+# requests allowed back-to-back on one host before the delay kicks in
+POLITENESS_BURST = int(os.getenv("POLITENESS_BURST", "1"))
+
+
+class TokenBucket:
+    # Refills one token every `delay` seconds, holds at most `capacity` tokens.
+
+    def __init__(self, delay: float, capacity: int = POLITENESS_BURST):
+        self.rate = 1.0 / delay if delay > 0 else float("inf")
+        self.capacity = max(1, int(capacity))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long the caller must wait before using it.
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    # One token bucket per host, so a slow host never delays requests to another one.
+
+    def __init__(self, delay: float, capacity: int = POLITENESS_BURST):
+        self.delay = float(delay)
+        self.capacity = capacity
+        self.buckets = {}
+
+    def _bucket(self, host: str, delay: float) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(delay, self.capacity)
+        elif delay > 0:
+            bucket.rate = 1.0 / delay
+        return bucket
+
+    async def acquire(self, host: str, delay: float = None):
+        # delay: the host's robots.txt Crawl-delay, used when longer than ours
+        delay = max(self.delay, delay or 0)
+        if delay <= 0:
+            return
+        wait = self._bucket(host, delay).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SharedHostRateLimiter:
+    # Per-host spacing shared by every worker on every node through scraperdb.hosts:
+    # one document per host holding the earliest time the next request may start.
+
+    def __init__(self, delay: float, collection=None):
+        self.delay = float(delay)
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from db import get_db
+            self._collection = get_db()["hosts"]
+        return self._collection
+
+    def acquire(self, host: str, delay: float = None):
+        # blocks until this worker holds the host's next slot
+        delay = max(self.delay, delay or 0)
+        if delay <= 0:
+            return
+        from pymongo.errors import DuplicateKeyError
+        while True:
+            now = time.time()
+            taken = self.collection.find_one_and_update(
+                {"_id": host, "next_at": {"$lte": now}},
+                {"$set": {"next_at": now + delay}}
+            )
+            if taken:
+                return
+            try:
+                self.collection.insert_one({"_id": host, "next_at": now + delay})
+                return
+            except DuplicateKeyError:
+                pass
+            doc = self.collection.find_one({"_id": host}, {"next_at": 1}) or {}
+            wait = doc.get("next_at", now) - now
+            time.sleep(min(max(wait, 0.01), delay))
@@ -0,0 +1,109 @@
+# progress_stream.py
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import PyMongoError
+
+# fallback poll of a single progress doc when MongoDB has no change streams (standalone server)
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "1.0"))
+
+# comment line sent to idle subscribers so proxies keep the connection open
+PROGRESS_HEARTBEAT = 15.0
+
+# threads for the blocking MongoDB calls of subscribers (each waits up to a second for a
+# change); a pool of their own, so open dashboards can't use up the default executor that
+# job submission runs on
+PROGRESS_STREAM_THREADS = int(os.getenv("PROGRESS_STREAM_THREADS", "32"))
+
+TERMINAL_STATUSES = ("finished", "error", "cancelled")
+
+_executor = ThreadPoolExecutor(max_workers=PROGRESS_STREAM_THREADS, thread_name_prefix="progress-stream")
+
+
+async def _blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def open_change_stream(collection, job_id: str):
+    # None when the deployment can't watch (change streams need a replica set)
+    try:
+        return collection.watch(
+            [{"$match": {"fullDocument.job_id": job_id}}],
+            full_document="updateLookup",
+            max_await_time_ms=1000,
+        )
+    except Exception:
+        return None
+
+
+def change_delta(change: dict) -> dict:
+    if change.get("operationType") == "update":
+        delta = dict(change["updateDescription"].get("updatedFields", {}))
+        for field in change["updateDescription"].get("removedFields", []):
+            delta[field] = None
+        return delta
+    doc = dict(change.get("fullDocument") or {})
+    doc.pop("_id", None)
+    return doc
+
+
+def diff(old: dict, new: dict) -> dict:
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+
+async def progress_events(collection, job_id: str, is_disconnected):
+    # Server-sent events for one job: a snapshot first, then only the changed fields,
+    # until the job reaches a terminal status or the client goes away.
+    projection = {"_id": 0}
+    # watch before reading the snapshot, so an update in between comes through the stream
+    stream = await _blocking(open_change_stream, collection, job_id)
+    try:
+        doc = await _blocking(collection.find_one, {"job_id": job_id}, projection)
+        if not doc:
+            yield sse("error", {"error": f"Unknown job {job_id}"})
+            return
+        yield sse("snapshot", doc)
+
+        last_sent = time.monotonic()
+        while doc.get("status") not in TERMINAL_STATUSES:
+            if await is_disconnected():
+                return
+            delta = None
+            if stream is not None:
+                try:
+                    change = await _blocking(stream.try_next)
+                except PyMongoError:
+                    # e.g. the stream was invalidated; carry on polling
+                    stream.close()
+                    stream = None
+                    continue
+                if change:
+                    delta = change_delta(change)
+            else:
+                await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+                current = await _blocking(collection.find_one, {"job_id": job_id}, projection)
+                delta = diff(doc, current or {})
+            if delta:
+                doc.update(delta)
+                last_sent = time.monotonic()
+                yield sse("progress", delta)
+            elif time.monotonic() - last_sent >= PROGRESS_HEARTBEAT:
+                last_sent = time.monotonic()
+                # re-read the doc too, in case the stream missed a change
+                current = await _blocking(collection.find_one, {"job_id": job_id}, projection)
+                delta = diff(doc, current or {})
+                if delta:
+                    doc.update(delta)
+                    yield sse("progress", delta)
+                else:
+                    yield ": keep-alive\n\n"
+        yield sse("end", {"status": doc.get("status")})
+    finally:
+        if stream is not None:
+            stream.close()
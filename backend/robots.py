@@ -0,0 +1,182 @@
+# robots.py
+import os
+import time
+import threading
+import urllib.robotparser
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import requests
+from fetcher import get_http_session
+from url_store import split_url
+
+# how long a fetched robots.txt (or a plain 404) is trusted
+ROBOTS_TTL = int(os.getenv("ROBOTS_TTL", str(24 * 3600)))
+
+# negative caching: fetch errors, 5xx and 401/403 are retried after this long
+ROBOTS_NEGATIVE_TTL = int(os.getenv("ROBOTS_NEGATIVE_TTL", "3600"))
+
+ROBOTS_TIMEOUT = float(os.getenv("ROBOTS_TIMEOUT", "10"))
+
+# parallel fetches when many seeds arrive at once
+ROBOTS_PREFETCH_WORKERS = int(os.getenv("ROBOTS_PREFETCH_WORKERS", "8"))
+
+# a site's Crawl-delay is honoured up to this many seconds
+ROBOTS_MAX_CRAWL_DELAY = float(os.getenv("ROBOTS_MAX_CRAWL_DELAY", "30"))
+
+
+def robots_origin(url: str) -> str:
+    # cache key: scheme://host[:port]
+    return split_url(url)[0]
+
+
+def parser_from(kind: str, body: str = ""):
+    rp = urllib.robotparser.RobotFileParser()
+    if kind == "ok":
+        rp.parse(body.splitlines())
+    elif kind == "disallow_all":
+        rp.disallow_all = True
+    else:
+        rp.allow_all = True
+    return rp
+
+
+class RobotsCache:
+    # robots.txt per origin: an in-process cache in front of scraperdb.robots, which every
+    # worker on every node shares. Concurrent lookups of one origin share a single fetch.
+
+    def __init__(self, ttl: int = ROBOTS_TTL, negative_ttl: int = ROBOTS_NEGATIVE_TTL, collection=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._collection = collection
+        self._entries = {}  # origin -> (parser, expires_at)
+        self._inflight = {}  # origin -> Future
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from db import get_db
+            self._collection = get_db()["robots"]
+            try:
+                self._collection.create_index("expires_at", expireAfterSeconds=0, background=True)
+            except Exception:
+                # If index creation fails (permissions, already exists) we continue
+                pass
+        return self._collection
+
+    def get(self, url: str):
+        origin = robots_origin(url)
+        entry = self._entries.get(origin)
+        if entry and entry[1] > time.time():
+            return entry[0]
+        with self._lock:
+            future = self._inflight.get(origin)
+            owner = future is None
+            if owner:
+                future = self._inflight[origin] = Future()
+        if not owner:
+            return future.result()
+        try:
+            parser, expires_at = self._load(origin)
+            self._entries[origin] = (parser, expires_at)
+            future.set_result(parser)
+            return parser
+        except Exception as e:
+            # if robots can't be read, default to allow
+            print(f"⚠️ robots.txt lookup failed for {origin}: {e}")
+            parser = parser_from("allow_all")
+            self._entries[origin] = (parser, time.time() + self.negative_ttl)
+            future.set_result(parser)
+            return parser
+        finally:
+            with self._lock:
+                self._inflight.pop(origin, None)
+
+    def _load(self, origin: str):
+        now = datetime.now(timezone.utc)
+        try:
+            doc = self.collection.find_one({"_id": origin})
+        except Exception:
+            doc = None
+        if doc:
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at > now:
+                return parser_from(doc["kind"], doc.get("body", "")), expires_at.timestamp()
+
+        kind, body, ttl = self._fetch(origin)
+        expires_at = now + timedelta(seconds=ttl)
+        try:
+            self.collection.update_one(
+                {"_id": origin},
+                {"$set": {"kind": kind, "body": body, "fetched_at": now, "expires_at": expires_at}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Could not store robots.txt of {origin}: {e}")
+        return parser_from(kind, body), expires_at.timestamp()
+
+    def _fetch(self, origin: str):
+        # (kind, body, ttl); same status handling as RobotFileParser.read()
+        try:
+            response = get_http_session().get(f"{origin}/robots.txt", timeout=ROBOTS_TIMEOUT)
+        except requests.exceptions.RequestException:
+            return "allow_all", "", self.negative_ttl
+        if response.status_code == 200:
+            return "ok", response.text, self.ttl
+        if response.status_code in (401, 403):
+            return "disallow_all", "", self.negative_ttl
+        if 400 <= response.status_code < 500:
+            # no robots.txt: everything allowed
+            return "allow_all", "", self.ttl
+        return "allow_all", "", self.negative_ttl
+
+    def can_fetch(self, url: str, agent: str = "*") -> bool:
+        try:
+            return self.get(url).can_fetch(agent, url)
+        except Exception:
+            return True
+
+    def crawl_delay(self, url: str, agent: str = "*"):
+        # seconds between requests asked for by the site, None if it doesn't say
+        try:
+            rp = self.get(url)
+            delay = rp.crawl_delay(agent)
+            if delay is None:
+                rate = rp.request_rate(agent)
+                if rate and rate.requests:
+                    delay = rate.seconds / rate.requests
+        except Exception:
+            return None
+        if delay is None:
+            return None
+        return min(float(delay), ROBOTS_MAX_CRAWL_DELAY)
+
+    def prefetch(self, urls):
+        # warms the cache in the background; returns immediately
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=ROBOTS_PREFETCH_WORKERS, thread_name_prefix="robots")
+        now = time.time()
+        for origin in {robots_origin(u) for u in urls if u}:
+            entry = self._entries.get(origin)
+            if entry and entry[1] > now:
+                continue
+            self._executor.submit(self.get, origin + "/")
+
+
+_robots = None
+_robots_pid = None
+_robots_lock = threading.Lock()
+
+
+def get_robots() -> RobotsCache:
+    # one cache per process
+    global _robots, _robots_pid
+    with _robots_lock:
+        if _robots is None or _robots_pid != os.getpid():
+            _robots = RobotsCache()
+            _robots_pid = os.getpid()
+    return _robots
@@ -0,0 +1,413 @@
+# scheduler.py
+import os
+import time
+import uuid
+import socket
+import threading
+import multiprocessing as mp
+from pymongo import ReturnDocument
+import metrics
+from db import get_db
+from urllib.parse import urlparse
+from crawler import CrawlTask, CRAWL_FRONTIER, RESUMABLE_STATUSES, normalize_url, recover_stale_jobs
+from distributed import DistributedWorker, seed_job
+from frontier import DURABLE_FRONTIERS
+from robots import get_robots
+from llm_extractor import warm_up
+
+db = get_db()
+progress_collection = db["progress"]
+
+# crawl jobs running at once on this box (one worker process each); 0 makes this an
+# API-only node whose jobs are run by worker.py on other machines
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+
+# admission control: new jobs are rejected while this many are already waiting
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "100"))
+
+# pages a job crawls before it goes back to the end of the queue (needs a mongo/disk
+# frontier, see job_frontier)
+JOB_SLICE_PAGES = int(os.getenv("JOB_SLICE_PAGES", "20"))
+
+# seconds an idle worker waits before looking for a queued job again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+# every worker process writes a heartbeat this often; one silent for WORKER_STALE_AFTER
+# seconds is dead, and the job it claimed becomes "interrupted"
+WORKER_HEARTBEAT = float(os.getenv("WORKER_HEARTBEAT", "10"))
+WORKER_STALE_AFTER = float(os.getenv("WORKER_STALE_AFTER", "60"))
+
+# seconds between two sweeps of the API for dead workers and their jobs
+SUPERVISE_INTERVAL = float(os.getenv("SUPERVISE_INTERVAL", "15"))
+
+workers_collection = db["workers"]
+
+
+# -------- Job queue (the "queued" docs of the progress collection) --------
+def pending_jobs() -> int:
+    return progress_collection.count_documents({"status": "queued"})
+
+
+def job_frontier(frontier: str = None) -> str:
+    # Jobs only take turns on a durable frontier, a memory one keeps its worker to the end.
+    # With slicing on, a job that names no frontier (in the request or CRAWL_FRONTIER)
+    # gets a mongo one, which a worker on any node can pick up again.
+    if frontier:
+        return frontier.lower()
+    if os.getenv("CRAWL_FRONTIER") or not JOB_SLICE_PAGES:
+        return CRAWL_FRONTIER
+    return "mongo"
+
+
+def validate_crawl(start_url: str, max_pages: int = 1, max_depth: int = 0, frontier: str = None):
+    # error message for a crawl request that can't be queued, else None; a url without
+    # scheme is taken as http like queue_crawl stores it
+    parsed = urlparse(normalize_url((start_url or "").strip()) or "")
+    try:
+        parsed.port  # raises on a port that isn't a number in range
+        valid = parsed.scheme in ("http", "https") and bool(parsed.hostname)
+    except ValueError:
+        valid = False
+    if not valid:
+        return f"Invalid url: {start_url!r} (expected http(s)://host/... or host/...)"
+    if max_pages < 1 or max_depth < 0:
+        return "max_pages must be at least 1 and max_depth at least 0"
+    if frontier and frontier.lower() not in ("memory", "mongo", "disk"):
+        return f"Unknown frontier: {frontier}"
+    return None
+
+
+def submit_crawl(start_url: str, max_pages: int = 50, max_depth: int = 100, concurrency: int = None, incremental: bool = None, frontier: str = None, distributed: bool = False):
+    # API side of queue_crawl: also makes sure the worker pool is up.
+    job_id, error = queue_crawl(start_url, max_pages, max_depth, concurrency, incremental, frontier, distributed)
+    if job_id:
+        get_worker_pool().ensure()
+    return job_id, error
+
+
+def queue_crawl(start_url: str, max_pages: int = 50, max_depth: int = 100, concurrency: int = None, incremental: bool = None, frontier: str = None, distributed: bool = False):
+    # Records a queued job for the worker pool, nothing else; no network I/O besides
+    # MongoDB. Returns (job_id, error).
+    # A distributed job starts right away: every worker on every node takes urls from it.
+    if pending_jobs() >= MAX_PENDING_JOBS:
+        metrics.incr("jobs_rejected")
+        return None, f"Too many queued jobs ({MAX_PENDING_JOBS}), try again later"
+
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    doc = {
+        "job_id": job_id,
+        "url": normalize_url(start_url.strip()),
+        "total": max(1, int(max_pages)),
+        "done": 0,
+        "status": "queued",
+        "current_url": None,
+        "queued_at": now,
+        "updated_at": now,
+        "max_depth": int(max_depth),
+        "concurrency": concurrency,
+        "incremental": incremental,
+        "frontier": job_frontier(frontier),
+        "control": None,
+    }
+    if distributed:
+        doc.update({"status": "running", "distributed": True, "frontier": "mongo", "started_at": now, "dispatched": 0})
+        seed_job(job_id, doc["url"])
+    elif JOB_SLICE_PAGES and doc["frontier"] not in DURABLE_FRONTIERS:
+        print(f"⚠️ Job {job_id} has a {doc['frontier']} frontier: it won't yield its worker to other jobs")
+    progress_collection.insert_one(doc)
+    metrics.incr("jobs_submitted")
+    # robots.txt is fetched in the background, so the worker finds it cached
+    get_robots().prefetch([doc["url"]])
+    return job_id, None
+
+
+def submit_search(query: str, count: int = 10, max_pages: int = 1, max_depth: int = 5):
+    # Queues a search job: a worker runs the SerpAPI query and queues one crawl per result.
+    # Returns (job_id, error).
+    if pending_jobs() >= MAX_PENDING_JOBS:
+        metrics.incr("jobs_rejected")
+        return None, f"Too many queued jobs ({MAX_PENDING_JOBS}), try again later"
+
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    progress_collection.insert_one({
+        "job_id": job_id,
+        "type": "search",
+        "query": query,
+        "total": int(count),
+        "done": 0,
+        "status": "queued",
+        "current_url": None,
+        "queued_at": now,
+        "updated_at": now,
+        "max_pages": int(max_pages),
+        "max_depth": int(max_depth),
+        "control": None,
+    })
+    metrics.incr("jobs_submitted")
+    get_worker_pool().ensure()
+    return job_id, None
+
+
+def resume_job(job_id: str) -> bool:
+    # Puts a paused/interrupted/failed job back in the queue; False if it can't be resumed.
+    doc = progress_collection.find_one({"job_id": job_id}, {"_id": 0, "started_at": 1, "frontier": 1, "distributed": 1})
+    if not doc:
+        return False
+    if "started_at" in doc and (doc.get("frontier") or "memory") == "memory":
+        return False
+    # distributed jobs have no single owner, workers pick them up as soon as they run again
+    status = "running" if doc.get("distributed") else "queued"
+    res = progress_collection.update_one(
+        {"job_id": job_id, "status": {"$in": list(RESUMABLE_STATUSES)}},
+        {"$set": {"status": status, "control": None, "queued_at": time.time(), "updated_at": time.time()}}
+    )
+    if res.modified_count:
+        get_worker_pool().ensure()
+    return res.modified_count > 0
+
+
+def pause_queued(job_id: str) -> bool:
+    # A job still waiting for a worker is paused in place.
+    res = progress_collection.update_one(
+        {"job_id": job_id, "status": "queued"},
+        {"$set": {"status": "paused", "paused_at": time.time(), "updated_at": time.time()}}
+    )
+    return res.modified_count > 0
+
+
+def claim_job(worker_id: str):
+    # Oldest queued job first; a job that used up its slice was re-queued with a new
+    # queued_at, so jobs take turns (round-robin).
+    doc = progress_collection.find_one_and_update(
+        {"status": "queued"},
+        {"$set": {"status": "starting", "worker": worker_id, "updated_at": time.time()}},
+        sort=[("queued_at", 1)],
+        projection={"_id": 0, "job_id": 1, "type": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return doc
+
+
+def run_search(job_id: str):
+    # The network-bound half of /api/search-and-crawl, run by a worker.
+    from search_api import serpapi_search
+    doc = progress_collection.find_one({"job_id": job_id, "status": "starting"}, {"_id": 0})
+    if not doc:
+        return None
+    progress_collection.update_one(
+        {"job_id": job_id},
+        {"$set": {"status": "running", "started_at": time.time(), "updated_at": time.time()}}
+    )
+    try:
+        results = serpapi_search(doc["query"], count=doc.get("total", 10))
+    except Exception as e:
+        progress_collection.update_one(
+            {"job_id": job_id},
+            {"$set": {"status": "error", "last_error": f"search failed: {e}", "updated_at": time.time()}}
+        )
+        return "error"
+
+    jobs, rejected = [], []
+    for url in [item["url"] for item in results if item.get("url")]:
+        error = validate_crawl(url)
+        crawl_id = None
+        if not error:
+            crawl_id, error = queue_crawl(url, max_pages=doc.get("max_pages", 1), max_depth=doc.get("max_depth", 5))
+        if error:
+            rejected.append({"url": url, "error": error})
+        else:
+            jobs.append({"url": url, "job_id": crawl_id})
+
+    update = {"status": "finished", "jobs": jobs, "rejected": rejected, "done": len(jobs), "updated_at": time.time()}
+    if not jobs and not rejected:
+        update["note"] = "No results found"
+    progress_collection.update_one({"job_id": job_id}, {"$set": update})
+    print(f"🔎 Search {doc['query']!r}: queued {len(jobs)} crawls, rejected {len(rejected)}")
+    return "finished"
+
+
+def run_job(job_id: str):
+    task = CrawlTask.from_progress(job_id, statuses=("starting",), slice_pages=JOB_SLICE_PAGES)
+    if task is None:
+        # e.g. an interrupted job with an in-memory frontier
+        progress_collection.update_one(
+            {"job_id": job_id, "status": "starting"},
+            {"$set": {"status": "error", "last_error": "job can't be resumed", "updated_at": time.time()}}
+        )
+        return None
+    task.run()
+    if task.outcome == "yield":
+        progress_collection.update_one({"job_id": job_id}, {"$inc": {"slices": 1}})
+    return task.outcome
+
+
+def worker_name(pid: int = None) -> str:
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+def release_worker_jobs(worker_id: str) -> int:
+    # a dead worker's claimed job becomes "interrupted" (resumable with a durable frontier)
+    res = progress_collection.update_many(
+        {"worker": worker_id, "status": {"$in": ["starting", "running"]}},
+        {"$set": {"status": "interrupted", "current_url": None, "updated_at": time.time()}}
+    )
+    return res.modified_count
+
+
+def beat(worker_id: str):
+    workers_collection.update_one({"_id": worker_id}, {"$set": {"seen_at": time.time()}}, upsert=True)
+
+
+def _heartbeat(worker_id: str, stop: threading.Event = None):
+    # a thread of its own: the worker's main thread is busy in a job for minutes
+    while stop is None or not stop.is_set():
+        time.sleep(WORKER_HEARTBEAT)
+        try:
+            beat(worker_id)
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id} heartbeat failed: {e}")
+
+
+def release_dead_workers() -> int:
+    # Jobs claimed by a worker (on any node) whose heartbeat stopped become "interrupted".
+    cutoff = time.time() - WORKER_STALE_AFTER
+    live = {d["_id"] for d in workers_collection.find({"seen_at": {"$gte": cutoff}}, {"_id": 1})}
+    owners = progress_collection.distinct("worker", {"status": {"$in": ["starting", "running"]}, "worker": {"$ne": None}})
+    released = sum(release_worker_jobs(worker_id) for worker_id in owners if worker_id not in live)
+    workers_collection.delete_many({"seen_at": {"$lt": cutoff}})
+    return released
+
+
+def supervise(stop: threading.Event = None):
+    # API side: replaces dead pool workers and keeps recovering the jobs of dead workers,
+    # not just on startup and job submission.
+    while stop is None or not stop.is_set():
+        try:
+            get_worker_pool().ensure()
+        except Exception as e:
+            print(f"⚠️ Could not check the crawl workers: {e}")
+        try:
+            released = release_dead_workers()
+            if released:
+                print(f"⚠️ Marked {released} jobs of dead workers as interrupted")
+        except Exception as e:
+            print(f"⚠️ Could not check for dead workers: {e}")
+        recover_stale_jobs()
+        time.sleep(SUPERVISE_INTERVAL)
+
+
+_supervisor = None
+
+
+def start_supervisor():
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = threading.Thread(target=supervise, daemon=True)
+        _supervisor.start()
+
+
+def run_worker(worker_id: str = None, stop: threading.Event = None):
+    # Worker loop: claim a job and run it for one slice (or to the end); with no queued
+    # job, help with a url of a distributed job; repeat.
+    worker_id = worker_id or worker_name()
+    shared = DistributedWorker(worker_id)
+    try:
+        # before the first claim, so a sweep never takes this worker for dead
+        beat(worker_id)
+    except Exception as e:
+        print(f"⚠️ Worker {worker_id} heartbeat failed: {e}")
+    threading.Thread(target=_heartbeat, args=(worker_id, stop), daemon=True).start()
+    print(f"👷 Worker {worker_id} started")
+    # the model loads while the first job renders its pages
+    warm_up()
+    while stop is None or not stop.is_set():
+        try:
+            job = claim_job(worker_id)
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id} could not read the job queue: {e}")
+            job = None
+        if job is None:
+            try:
+                busy = shared.work_once()
+            except Exception as e:
+                print(f"⚠️ Worker {worker_id} distributed work failed: {e}")
+                busy = False
+            if not busy:
+                metrics.flush()
+                time.sleep(JOB_POLL_INTERVAL)
+            continue
+        job_id = job["job_id"]
+        try:
+            if job.get("type") == "search":
+                run_search(job_id)
+            else:
+                run_job(job_id)
+        except Exception as e:
+            print(f"⚠️ Worker {worker_id} failed on job {job_id}: {e}")
+            progress_collection.update_one(
+                {"job_id": job_id},
+                {"$set": {"status": "error", "last_error": str(e), "current_url": None, "updated_at": time.time()}}
+            )
+
+
+# -------- Worker pool --------
+class WorkerPool:
+    # Fixed number of long-lived worker processes, each one job at a time. Browsers and
+    # HTTP sessions stay warm across jobs instead of being started per request.
+
+    def __init__(self, size: int = MAX_CONCURRENT_JOBS):
+        self.size = max(0, int(size))
+        self.processes = []
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        # starts missing workers and replaces dead ones
+        with self._lock:
+            alive = [p for p in self.processes if p.is_alive()]
+            for p in self.processes:
+                if p.is_alive():
+                    continue
+                print("⚠️ A crawl worker exited, starting a new one")
+                try:
+                    if release_worker_jobs(worker_name(p.pid)):
+                        print(f"⚠️ Marked the job of worker {p.pid} as interrupted")
+                except Exception as e:
+                    print(f"⚠️ Could not release the job of worker {p.pid}: {e}")
+            while len(alive) < self.size:
+                p = mp.Process(target=run_worker, daemon=True)
+                p.start()
+                alive.append(p)
+            self.processes = alive
+
+    def stats(self) -> dict:
+        alive = sum(1 for p in self.processes if p.is_alive())
+        counts = {
+            d["_id"]: d["n"] for d in progress_collection.aggregate([
+                {"$match": {"status": {"$in": ["queued", "starting", "running"]}}},
+                {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+            ])
+        }
+        return {
+            "workers": alive,
+            "max_concurrent_jobs": self.size,
+            "max_pending_jobs": MAX_PENDING_JOBS,
+            "job_slice_pages": JOB_SLICE_PAGES,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0) + counts.get("starting", 0),
+        }
+
+
+_pool = None
+
+
+def get_worker_pool() -> WorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
+
+
+if __name__ == "__main__":
+    run_worker()
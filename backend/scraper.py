@@ -1,27 +1,26 @@
 # scraper.py
 import time
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
-from llm_extractor import process_with_ollama, merge_results
+import asyncio
+import hashlib
+import metrics
+from browser_pool import get_browser_pool, STABILITY_SCRIPT
+from fetcher import FETCH_FAST_PATH, conditional_get, fetch_static, response_validators
+from llm_extractor import process_blocks, merge_results
+from html_parse import parse_html
+from gating import gate_page
 
 # -------- Helper: DOM stabilization --------
-def wait_for_stable_dom(page, timeout=15, stable_time=1.0, poll=0.4):
-    end_time = time.time() + timeout
-    last_html = None
-    stable_start = None
-    while time.time() < end_time:
-        html = page.content()
-        if last_html is not None and html == last_html:
-            if stable_start is None:
-                stable_start = time.time()
-            elif time.time() - stable_start >= stable_time:
-                return True
-        else:
-            stable_start = None
-        last_html = html
-        time.sleep(poll)
-    return False
+QUIET_FOR_EXPR = "(ms) => window.__scraperQuietFor() >= ms"
+
+def wait_for_stable_dom(page, timeout=15, stable_time=1.0, poll=0.1):
+    # Waits inside the page until no DOM mutation and no fetch/XHR happened for stable_time
+    # seconds; only a boolean crosses the CDP boundary, the DOM is never serialized here.
+    try:
+        page.evaluate(STABILITY_SCRIPT)  # no-op when the context init script is already active
+        page.wait_for_function(QUIET_FOR_EXPR, arg=stable_time * 1000, timeout=timeout * 1000, polling=int(poll * 1000))
+        return True
+    except Exception:
+        return False
 
 # -------- Helper: Auto-scroll for lazy-loading --------
 def auto_scroll(page, pause=1.0, max_attempts=20):
@@ -42,6 +41,34 @@ def auto_scroll(page, pause=1.0, max_attempts=20):
     print("✅ Finished auto-scrolling\n")
 
 
+async def wait_for_stable_dom_async(page, timeout=15, stable_time=1.0, poll=0.1):
+    try:
+        await page.evaluate(STABILITY_SCRIPT)
+        await page.wait_for_function(QUIET_FOR_EXPR, arg=stable_time * 1000, timeout=timeout * 1000, polling=int(poll * 1000))
+        return True
+    except Exception:
+        return False
+
+
+async def auto_scroll_async(page, pause=1.0, max_attempts=20):
+    try:
+        last_height = await page.evaluate("() => document.body.scrollHeight")
+    except Exception:
+        return
+    for _ in range(max_attempts):
+        await page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
+        await asyncio.sleep(pause)
+        try:
+            new_height = await page.evaluate("() => document.body.scrollHeight")
+        except Exception:
+            break
+        if new_height == last_height:
+            break
+        last_height = new_height
+    print("✅ Finished auto-scrolling\n")
+
+
+# BeautifulSoup reference for html_parse.parse_html (used by bench/bench_parse.py)
 def extract_text_with_media(soup):
     #Collect visible text and inline images/links, while attempting to skip menus, navs, headers, and hidden elements.
     parts = []
@@ -87,6 +114,7 @@ def extract_text_with_media(soup):
 
 
 # -------- Helper: Chunking --------
+# fixed-size windows over the flat text; parse_page packs DOM blocks instead (gating.gate_page)
 def chunk_text(text: str, chunk_size=5000, overlap=500):
     chunks, start = [], 0
     while start < len(text):
@@ -97,126 +125,233 @@ def chunk_text(text: str, chunk_size=5000, overlap=500):
     return chunks
 
 
+# -------- Rendering --------
+def render_page(page, url: str):
+    # Returns (final HTML, HTTP validators of the main document).
+    # page.goto with per-navigation timeout but we guard total time below
+    response = page.goto(url, timeout=60000)
+    validators = response_validators(response.headers if response else None)
+    print("✅ Browser navigated")
+
+    # wait for DOM content, then try networkidle but fallback to stable DOM check
+    try:
+        page.wait_for_load_state("domcontentloaded", timeout=15000)
+        try:
+            page.wait_for_load_state("networkidle", timeout=10000)
+        except Exception:
+            print("⚠️ networkidle not reached, falling back to stable DOM")
+        wait_for_stable_dom(page, timeout=10, stable_time=0.8)
+    except Exception as e:
+        print(f"⚠️ Playwright load issue: {e}")
+
+    # Only auto-scroll if page is scrollable (avoid wasting time)
+    try:
+        scrollable = page.evaluate("() => document.body.scrollHeight > window.innerHeight")
+    except Exception:
+        scrollable = False
+
+    if scrollable:
+        auto_scroll(page, pause=0.8, max_attempts=20)
+
+    # final stabilization
+    wait_for_stable_dom(page, timeout=8, stable_time=0.6)
+
+    return page.content(), validators
+
+
+async def render_page_async(page, url: str):
+    # same steps as render_page on the playwright async API
+    response = await page.goto(url, timeout=60000)
+    validators = response_validators(response.headers if response else None)
+    print("✅ Browser navigated")
+
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=15000)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=10000)
+        except Exception:
+            print("⚠️ networkidle not reached, falling back to stable DOM")
+        await wait_for_stable_dom_async(page, timeout=10, stable_time=0.8)
+    except Exception as e:
+        print(f"⚠️ Playwright load issue: {e}")
+
+    try:
+        scrollable = await page.evaluate("() => document.body.scrollHeight > window.innerHeight")
+    except Exception:
+        scrollable = False
+
+    if scrollable:
+        await auto_scroll_async(page, pause=0.8, max_attempts=20)
+
+    await wait_for_stable_dom_async(page, timeout=8, stable_time=0.6)
+
+    return await page.content(), validators
+
+
 # -------- Scraper Function --------
-def scrape_website(url: str, max_scrape_time: int = 120):
+def record_blocked(blocked: dict) -> dict:
+    if blocked.get("total"):
+        print(f"🚫 Blocked {blocked['total']} requests during render")
+        metrics.incr("render_requests_blocked", blocked["total"])
+    return blocked
+
+
+def not_modified_document(url: str, previous: dict):
+    # the stored document stays as is; links are replayed so the crawl can continue past it
+    print(f"⏭️ Not modified since last crawl: {url}")
+    metrics.incr("recrawl_not_modified")
+    return {
+        "url": url,
+        "unchanged": True,
+        "checked_at": time.time(),
+        "base_links": previous.get("base_links", []),
+        "external_links": previous.get("external_links", []),
+    }
+
+
+def fetch_static_tier(url: str, previous: dict = None):
+    # Conditional request (recrawls) and plain HTTP fast path, before any browser work.
+    # Returns (document, None) for a 304, (html, meta) when static HTML is enough,
+    # or (None, meta) when the page must be rendered; meta records the tier decision.
+    response = None
+    if previous:
+        not_modified, response = conditional_get(url, previous)
+        if not_modified:
+            return not_modified_document(url, previous), None
+    if not FETCH_FAST_PATH:
+        return None, {"fetch_tier": "browser"}
+    page_source, meta = fetch_static(url, response=response)
+    metrics.incr(f"fetch_tier_{meta['fetch_tier']}")
+    if page_source is None:
+        print(f"🌐 Escalating to browser ({meta['fetch_signals'].get('reason')}): {url}")
+    else:
+        print(f"⚡ Served by plain HTTP: {url}")
+    return page_source, meta
+
+
+def scrape_website(url: str, max_scrape_time: int = 120, previous: dict = None):
+    # previous: stored document of an incremental recrawl (validators, fingerprint, links)
 
     print(f"\n\n🔎 Scraping: {url} ...\n\n")
-    start_time = time.time()
-    page_source = ""
-    browser = None
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-gpu",
-                    "--disable-web-security"
-                ]
-            )
-            page = browser.new_page(user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/117.0.0.0 Safari/537.36"
-            ))
+    page_source, meta = fetch_static_tier(url, previous)
+    if isinstance(page_source, dict):
+        return page_source
+    if page_source is not None:
+        return extract_page(url, page_source, meta, previous)
 
+    pool = get_browser_pool()
+    try:
+        with pool.page() as page:
             try:
-                # page.goto with per-navigation timeout but we guard total time below
-                page.goto(url, timeout=60000)
-                print("✅ Browser navigated")
-
-                # wait for DOM content, then try networkidle but fallback to stable DOM check
-                try:
-                    page.wait_for_load_state("domcontentloaded", timeout=15000)
-                    try:
-                        page.wait_for_load_state("networkidle", timeout=10000)
-                    except Exception:
-                        print("⚠️ networkidle not reached, falling back to stable DOM")
-                    wait_for_stable_dom(page, timeout=10, stable_time=0.8)
-                except Exception as e:
-                    print(f"⚠️ Playwright load issue: {e}")
-
-                # Only auto-scroll if page is scrollable (avoid wasting time)
-                try:
-                    scrollable = page.evaluate("() => document.body.scrollHeight > window.innerHeight")
-                except Exception:
-                    scrollable = False
-
-                if scrollable:
-                    auto_scroll(page, pause=0.8, max_attempts=20)
-
-                # final stabilization
-                wait_for_stable_dom(page, timeout=8, stable_time=0.6)
-
-                page_source = page.content()
-
+                page_source, validators = render_page(page, url)
+                meta.update(validators)
+                meta["blocked_requests"] = record_blocked(pool.blocked_counts(page))
             except Exception as e:
                 print(f"⚠️ Playwright error on {url}: {e}")
                 return {"error": f"Playwright error: {e}", "url": url}
-            finally:
-                try:
-                    browser.close()
-                except Exception:
-                    pass
 
     except Exception as e:
-        # Playwright could not start
+        # Playwright / shared browser could not start
         print(f"⚠️ Playwright launcher error on {url}: {e}")
-        try:
-            if browser:
-                browser.close()
-        except Exception:
-            pass
         return {"error": f"Playwright launcher error: {e}", "url": url}
 
-    # --- Parse with BeautifulSoup ---
-    soup = BeautifulSoup(page_source, "html.parser")
-    soup_for_base_url = BeautifulSoup(page_source, "html.parser")
+    return extract_page(url, page_source, meta, previous)
+
+
+async def fetch_page_async(url: str, pool):
+    # Renders url on an AsyncBrowserPool; returns (page_source, page_meta, None) or (None, None, error_doc).
+    # page_meta holds the HTTP validators and the blocked request counts.
+    print(f"\n\n🔎 Scraping: {url} ...\n\n")
+
+    try:
+        async with pool.page() as page:
+            try:
+                page_source, page_meta = await render_page_async(page, url)
+                page_meta["blocked_requests"] = record_blocked(pool.blocked_counts(page))
+                return page_source, page_meta, None
+            except Exception as e:
+                print(f"⚠️ Playwright error on {url}: {e}")
+                return None, None, {"error": f"Playwright error: {e}", "url": url}
+
+    except Exception as e:
+        print(f"⚠️ Playwright launcher error on {url}: {e}")
+        return None, None, {"error": f"Playwright launcher error: {e}", "url": url}
+
+
+# -------- Parsing + LLM extraction --------
+def parse_page(url: str, page_source: str):
+    # --- Single lxml pass: title, links, visible text and media ---
+    page = parse_html(url, page_source)
+    body_text = page["text"]
     print("\n✅ Page parsed\n")
 
-    # --- Links Extraction ---
-    base_domain = urlparse(url).netloc
-    base_links, external_links = [], []
+    blocks, gating = gate_page(page["blocks"])
+    metrics.incr("llm_blocks_sent", gating["blocks_sent"])
+    metrics.incr("llm_blocks_skipped", gating["blocks_skipped"])
+    metrics.incr("llm_tokens_skipped", gating["tokens_skipped"])
+    print(
+        f"\n✅ Body split into {len(blocks)} blocks ({gating['tokens_sent']} tokens), "
+        f"skipped {gating['blocks_skipped']} blocks / {gating['tokens_skipped']} tokens without entities\n"
+    )
+
+    return {
+        "url": url,
+        "title": page["title"],
+        "base_links": page["base_links"],
+        "external_links": page["external_links"],
+        "blocks": blocks,
+        "gating": gating,
+        "fingerprint": content_fingerprint(body_text),
+    }
+
 
-    for a in soup_for_base_url.find_all("a", href=True):
-        abs_link = urljoin(url, a["href"])
-        link_domain = urlparse(abs_link).netloc
+def content_fingerprint(text: str) -> str:
+    # whitespace/case-insensitive hash of the text the LLM would see
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
-        if link_domain == base_domain and abs_link not in base_links:
-            base_links.append(abs_link)
-        elif (
-            link_domain != base_domain
-            and not abs_link.startswith("mailto:")
-            and not abs_link.startswith("tel:")
-        ):
-            external_links.append(abs_link)
 
-    # Extract visible text and media
-    body_text = extract_text_with_media(soup)
+def is_unchanged(parsed, previous) -> bool:
+    return bool(previous) and previous.get("content_fingerprint") == parsed["fingerprint"]
 
-    blocks = chunk_text(body_text, chunk_size=5000, overlap=500)
-    print(f"\n✅ Body split into {len(blocks)} blocks\n")
 
+def extract_information(blocks):
     # --- Send to Ollama in batches ---
-    all_results = []
-    for i, block in enumerate(blocks, 1):
-        print(f"🔹 Processing block {i}/{len(blocks)}")
-        print(block)
-        res = process_with_ollama(block)
-        if res and res.get("data"):
-            all_results.append(res["data"])
+    print(f"🔹 Processing {len(blocks)} blocks")
+    all_results = [res["data"] for res in process_blocks(blocks) if res and res.get("data")]
 
     # Merge results from all blocks using new LLM schema
     information = merge_results([{"data": r} for r in all_results])
 
     print(f"\n✅ Information received from LLM: {len(information.get('people', []))} unique people\n")
-
-    return {
-        "url": url,
-        "title": soup.title.get_text(strip=True) if soup.title else None,
-        "information": information,
-        "base_links": list(set(base_links)),
-        "external_links": list(set(external_links)),
+    return information
+
+
+def build_document(parsed, information, meta=None):
+    # information=None means the content is unchanged and the stored extraction is kept.
+    # meta: extra fields such as HTTP validators and the fetch tier that served the page
+    doc = {
+        "url": parsed["url"],
+        "title": parsed["title"],
+        "base_links": parsed["base_links"],
+        "external_links": parsed["external_links"],
+        "content_fingerprint": parsed["fingerprint"],
+        "llm_gating": parsed.get("gating"),
+        "unchanged": information is None,
+        "checked_at": time.time(),
     }
+    if information is not None:
+        doc["information"] = information
+    else:
+        metrics.incr("recrawl_unchanged_content")
+    doc.update(meta or {})
+    return doc
+
+
+def extract_page(url: str, page_source: str, meta=None, previous=None):
+    parsed = parse_page(url, page_source)
+    if is_unchanged(parsed, previous):
+        print(f"⏭️ Content unchanged, skipping LLM extraction: {url}")
+        return build_document(parsed, None, meta)
+    return build_document(parsed, extract_information(parsed["blocks"]), meta)
@@ -0,0 +1,219 @@
+# url_store.py
+import os
+import math
+import hashlib
+from array import array
+
+# "exact" (64-bit digests, no false positives) or "bloom" (a few bits per url, false positives
+# mean a url is wrongly taken as visited and skipped)
+VISITED_MODE = os.getenv("VISITED_MODE", "exact").lower()
+BLOOM_FP_RATE = float(os.getenv("BLOOM_FP_RATE", "0.001"))
+
+# urls per bloom filter before the next, larger one is chained on
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", "1000000"))
+
+# open addressing tables grow above this fill ratio
+MAX_LOAD = 0.7
+
+
+def url_digest(url: str) -> int:
+    # 64-bit fingerprint of a url; collisions are negligible at crawl sizes
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def split_url(url: str):
+    # "https://host:8080/a/b" -> ("https://host:8080", "/a/b"), without a full urlparse
+    start = url.find("://")
+    start = start + 3 if start >= 0 else 0
+    end = url.find("/", start)
+    if end < 0:
+        return url, ""
+    return url[:end], url[end:]
+
+
+class DigestSet:
+    # Open addressing hash set of 64-bit digests in one flat array: about 11-16 bytes
+    # per entry instead of ~70 for a Python set of ints. 0 marks an empty slot.
+    # With values=True it maps each digest to a 32-bit value.
+
+    def __init__(self, capacity: int = 1024, values: bool = False):
+        size = 1 << max(10, math.ceil(capacity / MAX_LOAD).bit_length())
+        self._keys = array("Q", bytes(8 * size))
+        self._vals = array("I", bytes(4 * size)) if values else None
+        self._mask = size - 1
+        self._len = 0
+
+    def _slot(self, digest: int) -> int:
+        keys, mask = self._keys, self._mask
+        i = digest & mask
+        while True:
+            k = keys[i]
+            if k == 0 or k == digest:
+                return i
+            i = (i + 1) & mask
+
+    def add(self, digest: int, value: int = 0) -> bool:
+        # True when the digest was not in the set yet
+        digest = digest or 1
+        i = self._slot(digest)
+        if self._keys[i] == digest:
+            return False
+        self._keys[i] = digest
+        if self._vals is not None:
+            self._vals[i] = value
+        self._len += 1
+        if self._len > len(self._keys) * MAX_LOAD:
+            self._grow()
+        return True
+
+    def get(self, digest: int, default=None):
+        i = self._slot(digest or 1)
+        if self._keys[i] == 0:
+            return default
+        return self._vals[i] if self._vals is not None else True
+
+    def __contains__(self, digest: int) -> bool:
+        return self._keys[self._slot(digest or 1)] != 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        return (k for k in self._keys if k)
+
+    def _grow(self):
+        keys, vals = self._keys, self._vals
+        size = len(keys) * 2
+        self._keys = array("Q", bytes(8 * size))
+        self._vals = array("I", bytes(4 * size)) if vals is not None else None
+        self._mask = size - 1
+        for i, k in enumerate(keys):
+            if k:
+                j = self._slot(k)
+                self._keys[j] = k
+                if vals is not None:
+                    self._vals[j] = vals[i]
+
+    def nbytes(self) -> int:
+        return self._keys.itemsize * len(self._keys) + (self._vals.itemsize * len(self._vals) if self._vals is not None else 0)
+
+
+class BloomFilter:
+    # Fixed-size bloom filter sized for `capacity` urls at `fp_rate`.
+
+    def __init__(self, capacity: int, fp_rate: float, bits: bytearray = None, count: int = 0):
+        self.capacity = max(1, int(capacity))
+        self.fp_rate = fp_rate
+        self.m = max(8, math.ceil(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / self.capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.m + 7) // 8)
+        self.count = count
+
+    def _positions(self, url: str):
+        # double hashing over one 128-bit digest
+        d = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def add(self, url: str):
+        for p in self._positions(url):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, url: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url))
+
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class ScalableBloom:
+    # Chain of bloom filters: each one twice as large with half the false positive rate,
+    # so the total rate stays under `fp_rate` however many urls come in.
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, fp_rate: float = BLOOM_FP_RATE, filters=None):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.filters = filters or [BloomFilter(capacity, fp_rate / 2)]
+
+    def add(self, url: str):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, current.fp_rate / 2)
+            self.filters.append(current)
+        current.add(url)
+
+    def __contains__(self, url: str) -> bool:
+        return any(url in f for f in self.filters)
+
+    def __len__(self) -> int:
+        return sum(f.count for f in self.filters)
+
+    def state(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "fp_rate": self.fp_rate,
+            "filters": [(f.capacity, f.fp_rate, bytes(f.bits), f.count) for f in self.filters],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        filters = [BloomFilter(c, fp, bytearray(bits), n) for c, fp, bits, n in state["filters"]]
+        return cls(state["capacity"], state["fp_rate"], filters)
+
+    def nbytes(self) -> int:
+        return sum(f.nbytes() for f in self.filters)
+
+
+class UrlStore:
+    # Interns urls as consecutive integer ids: "scheme://host" goes to a host table, the
+    # path is appended to one bytes blob, and a DigestSet maps url digests to ids.
+
+    def __init__(self):
+        self.hosts = []
+        self._host_ids = {}
+        self._index = DigestSet(values=True)
+        self._host_of = array("I")
+        self._offsets = array("Q", [0])
+        self._paths = bytearray()
+
+    def intern(self, url: str):
+        # returns (id, new)
+        digest = url_digest(url)
+        uid = self._index.get(digest)
+        if uid is not None:
+            return uid, False
+        prefix, path = split_url(url)
+        hid = self._host_ids.get(prefix)
+        if hid is None:
+            hid = self._host_ids[prefix] = len(self.hosts)
+            self.hosts.append(prefix)
+        uid = len(self._host_of)
+        self._host_of.append(hid)
+        self._paths += path.encode("utf-8")
+        self._offsets.append(len(self._paths))
+        self._index.add(digest, uid)
+        return uid, True
+
+    def __contains__(self, url: str) -> bool:
+        return url_digest(url) in self._index
+
+    def __len__(self) -> int:
+        return len(self._host_of)
+
+    def url(self, uid: int) -> str:
+        start, end = self._offsets[uid], self._offsets[uid + 1]
+        return self.hosts[self._host_of[uid]] + self._paths[start:end].decode("utf-8")
+
+    def host_id(self, uid: int) -> int:
+        return self._host_of[uid]
+
+    def nbytes(self) -> int:
+        return (
+            self._index.nbytes()
+            + self._host_of.itemsize * len(self._host_of)
+            + self._offsets.itemsize * len(self._offsets)
+            + len(self._paths)
+            + sum(len(h) for h in self.hosts)
+        )
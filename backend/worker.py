@@ -0,0 +1,31 @@
+# worker.py
+# Crawl worker for extra machines pointed at the same MONGO_URI as the API:
+#
+#   python worker.py            # WORKER_PROCESSES worker processes
+#   python worker.py 4          # 4 worker processes
+#
+# Each process takes queued jobs like the API's own pool and, when there are none,
+# claims urls of distributed jobs under a lease (see distributed.py).
+import os
+import sys
+import multiprocessing as mp
+from scheduler import run_worker
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else WORKER_PROCESSES
+    processes = [mp.Process(target=run_worker, daemon=True) for _ in range(max(1, count))]
+    for p in processes:
+        p.start()
+    print(f"👷 Started {len(processes)} crawl workers")
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        print("\n⏹️ Stopping workers")
+
+
+if __name__ == "__main__":
+    main()
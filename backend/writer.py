@@ -0,0 +1,160 @@
+# writer.py
+import os
+import time
+import atexit
+import threading
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# seconds between two background flushes
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "1.0"))
+
+# page documents per bulk_write; a full batch is flushed without waiting for the interval
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+
+# backpressure: save_page blocks while this many page documents wait for MongoDB
+WRITE_MAX_PENDING = int(os.getenv("WRITE_MAX_PENDING", "1000"))
+
+
+class WriteBehind:
+    # Buffers progress updates (coalesced per job) and page upserts (coalesced per url)
+    # and writes them with unordered bulk_write from a background thread.
+
+    def __init__(self, db=None, interval: float = WRITE_FLUSH_INTERVAL, batch: int = WRITE_BATCH_SIZE, max_pending: int = WRITE_MAX_PENDING):
+        if db is None:
+            from db import get_db
+            db = get_db()
+        self.progress_collection = db["progress"]
+        self.data_collection = db["data"]
+        self.interval = interval
+        self.batch = max(1, int(batch))
+        self.max_pending = max(self.batch, int(max_pending))
+        self._progress = {}  # job_id -> {"$set": {...}, "$inc": {...}}
+        self._pages = {}  # url -> $set document
+        self._on_saved = []  # callbacks run once the pages buffered before them are written
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    # -------- producers --------
+    def progress(self, job_id: str, set_fields: dict = None, inc_fields: dict = None):
+        with self._cond:
+            update = self._progress.setdefault(job_id, {})
+            if set_fields:
+                update.setdefault("$set", {}).update(set_fields)
+            for k, v in (inc_fields or {}).items():
+                incs = update.setdefault("$inc", {})
+                incs[k] = incs.get(k, 0) + v
+            self._start()
+
+    def save_page(self, url: str, doc: dict, on_saved=None):
+        # on_saved() runs after the page is in MongoDB (e.g. to ack its frontier item)
+        with self._cond:
+            while len(self._pages) >= self.max_pending:
+                # MongoDB is slower than the crawl: wait for the writer to catch up
+                self._cond.notify_all()
+                self._cond.wait(timeout=self.interval)
+            if url in self._pages:
+                self._pages[url].update(doc)
+            else:
+                self._pages[url] = dict(doc)
+            if on_saved is not None:
+                self._on_saved.append(on_saved)
+            if len(self._pages) >= self.batch:
+                self._cond.notify_all()
+            self._start()
+
+    # -------- flushing --------
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Write-behind flush failed, retrying: {e}")
+                time.sleep(self.interval)
+
+    def _take(self):
+        with self._cond:
+            progress, self._progress = self._progress, {}
+            pages, self._pages = self._pages, {}
+            on_saved, self._on_saved = self._on_saved, []
+        return progress, pages, on_saved
+
+    def _restore(self, progress: dict, pages: dict, on_saved: list):
+        # put back what could not be written, without overwriting anything newer
+        with self._cond:
+            for job_id, update in progress.items():
+                newer = self._progress.get(job_id, {})
+                merged = {"$set": {**update.get("$set", {}), **newer.get("$set", {})}}
+                incs = dict(update.get("$inc", {}))
+                for k, v in newer.get("$inc", {}).items():
+                    incs[k] = incs.get(k, 0) + v
+                if incs:
+                    merged["$inc"] = incs
+                if not merged["$set"]:
+                    del merged["$set"]
+                self._progress[job_id] = merged
+            for url, doc in pages.items():
+                self._pages[url] = {**doc, **self._pages.get(url, {})}
+            self._on_saved[:0] = on_saved
+
+    def flush(self):
+        # Writes everything buffered so far; raises if MongoDB is unreachable (the
+        # buffered writes are kept for the next attempt).
+        with self._flush_lock:
+            progress, pages, on_saved = self._take()
+            try:
+                if pages:
+                    ops = [UpdateOne({"url": url}, {"$set": doc}, upsert=True) for url, doc in pages.items()]
+                    for i in range(0, len(ops), self.batch):
+                        try:
+                            self.data_collection.bulk_write(ops[i:i + self.batch], ordered=False)
+                        except BulkWriteError as e:
+                            # a bad document must not hold back the rest of the batch
+                            print(f"❌ MongoDB bulk write: {len(e.details.get('writeErrors', []))} page writes failed")
+                if progress:
+                    ops = [UpdateOne({"job_id": job_id}, update, upsert=True) for job_id, update in progress.items() if update]
+                    if ops:
+                        self.progress_collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                print(f"⚠️ Progress bulk write failed: {e.details.get('writeErrors', [])[:1]}")
+            except Exception:
+                self._restore(progress, pages, on_saved)
+                raise
+            finally:
+                with self._cond:
+                    self._cond.notify_all()
+            for callback in on_saved:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"⚠️ After-save callback failed: {e}")
+
+    def flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Write-behind flush failed: {e}")
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehind:
+    # one writer (and flush thread) per process; a forked worker builds its own
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = WriteBehind()
+            _writer_pid = os.getpid()
+            atexit.register(_writer.flush_quietly)
+    return _writer
@@ -16,4 +16,57 @@ export const searchAndCrawl = async ({ query, count = 10, maxPages = 1, maxDepth
   return api.post("/search-and-crawl", { query, count, max_pages: maxPages, max_depth: maxDepth });
 };
 
+// Follow one job's progress: server-sent events with a snapshot then changed fields only,
+// or polling the single-job endpoint where EventSource is not available.
+// Returns a function that stops watching.
+const DONE_STATUSES = ["finished", "error", "cancelled"];
+
+export const watchJob = (jobId, onUpdate, onEnd) => {
+  let progress = {};
+  let stop = () => {};
+
+  const apply = (fields) => {
+    progress = { ...progress, ...fields };
+    onUpdate(progress);
+    if (DONE_STATUSES.includes(progress.status)) {
+      stop();
+      // a search job ends once it queued its crawls: follow the last one from there
+      const jobs = progress.type === "search" ? progress.jobs || [] : [];
+      if (jobs.length) {
+        stop = watchJob(jobs[jobs.length - 1].job_id, onUpdate, onEnd);
+        return;
+      }
+      onEnd?.(progress);
+    }
+  };
+
+  if (typeof EventSource !== "undefined") {
+    const source = new EventSource(`/api/progress/${jobId}/stream`);
+    source.addEventListener("snapshot", (e) => apply(JSON.parse(e.data)));
+    source.addEventListener("progress", (e) => apply(JSON.parse(e.data)));
+    source.addEventListener("error", (e) => {
+      // server-side "error" event (unknown job) carries data; connection errors just retry
+      if (e.data) {
+        stop();
+        onEnd?.(null);
+      }
+    });
+    stop = () => source.close();
+    return () => stop();
+  }
+
+  const poll = async () => {
+    try {
+      const res = await api.get(`/progress/${jobId}`);
+      if (res.data?.progress) apply(res.data.progress);
+    } catch (err) {
+      console.error("Error fetching progress", err);
+    }
+  };
+  const interval = setInterval(poll, 3000);
+  stop = () => clearInterval(interval);
+  poll();
+  return () => stop();
+};
+
 export default api;
\ No newline at end of file
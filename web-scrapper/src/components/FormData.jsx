@@ -12,7 +12,7 @@ import {
   Cpu,
   Loader2
 } from "lucide-react";
-import api from "../callApi";
+import api, { watchJob } from "../callApi";
 import { useNavigate } from "react-router-dom";
 
 const FormData = () => {
@@ -20,35 +20,18 @@ const FormData = () => {
   const [input, setInput] = useState("");
   const [isLoading, setIsLoading] = useState(false);
   const [progress, setProgress] = useState(null);
+  const [jobId, setJobId] = useState(null);
   const [inputFocus, setInputFocus] = useState(false);
   const navigate = useNavigate();
 
-  // Poll progress
+  // Follow the submitted job (pushed by the server, no polling of every job)
   useEffect(() => {
-    let interval;
-    if (isLoading) {
-      const fetchProgress = async () => {
-        try {
-          const res = await api.get("/progress");
-          const jobs = res.data?.progress || [];
-          const latest = jobs[jobs.length - 1] || null;
-          setProgress(latest);
-
-          if (latest && (latest.status === "finished" || latest.status === "error")) {
-            clearInterval(interval);
-            setIsLoading(false);
-            navigate("/results", { replace: true, state: { fromScrape: true } });
-          }
-        } catch (err) {
-          console.error("Error fetching progress", err);
-        }
-      };
-
-      interval = setInterval(fetchProgress, 3000);
-      fetchProgress();
-    }
-    return () => clearInterval(interval);
-  }, [isLoading, navigate]);
+    if (!isLoading || !jobId) return;
+    return watchJob(jobId, setProgress, () => {
+      setIsLoading(false);
+      navigate("/results", { replace: true, state: { fromScrape: true, jobId } });
+    });
+  }, [isLoading, jobId, navigate]);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -58,24 +41,28 @@ const FormData = () => {
     setProgress(null);
 
     try {
+      let res;
       if (mode === "url") {
         // Direct URL crawl
-        await api.post(
+        res = await api.post(
           "/crawl",
           { url: input, max_pages: 1, max_depth: 5 },
           { headers: { "Content-Type": "application/json" } }
         );
       } else {
         // Search & crawl 
-        await api.post(
+        res = await api.post(
           "/search-and-crawl",
           { query: input, count: 10, max_pages: 1, max_depth: 5 },
           { headers: { "Content-Type": "application/json" } }
         );
       }
 
+      // a search answers with its search job; watchJob follows it to the last crawl it queues
+      const submittedJobId = res.data?.job_id || null;
+      setJobId(submittedJobId);
       setInput("");
-      navigate("/results", { state: { fromScrape: true } });
+      navigate("/results", { state: { fromScrape: true, jobId: submittedJobId } });
     } catch (err) {
       console.error("Error starting crawl", err);
       setIsLoading(false);
@@ -4,7 +4,7 @@ import { motion } from 'framer-motion';
 import { useLocation, useNavigate } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import DemoSection from '../components/DemoSection';
-import api from "../callApi";
+import api, { watchJob } from "../callApi";
 import { 
   Cpu, 
   Database, 
@@ -56,52 +56,36 @@ const ResultsPage = () => {
   }, [location]);
 
   useEffect(() => {
-    if (showProgress) {
-      startProgressMonitoring();
+    if (!showProgress) return;
+    const jobId = location.state?.jobId;
+    if (!jobId) {
+      setIsLoading(false);
+      setShowProgress(false);
+      fetchData();
+      return;
     }
-  }, [showProgress]);
-
-  const startProgressMonitoring = () => {
-    let interval;
-
-    const fetchProgress = async () => {
-      try {
-        const res = await api.get("/progress");
-
-        const jobs = res.data?.progress || [];
-        const latest = jobs[jobs.length - 1] || null;
-
-        setProgress(latest);
-
-        if (
-          latest &&
-          (latest.status === "finished" || latest.status === "error")
-        ) {
-          clearInterval(interval);
-          setTimeout(() => {
-            setIsLoading(false);
-            setShowProgress(false);
-            fetchData();
-          }, 1500);
-        }
-      } catch (err) {
-        console.error("Error fetching progress", err);
-        clearInterval(interval);
+    return watchJob(jobId, setProgress, () => {
+      setTimeout(() => {
         setIsLoading(false);
         setShowProgress(false);
-      }
-    };
-
-    fetchProgress();
-    interval = setInterval(fetchProgress, 3000);
-
-    return () => clearInterval(interval);
-  };
+        fetchData();
+      }, 1500);
+    });
+  }, [showProgress]);
 
   const fetchData = async () => {
     try {
-      const response = await api.get("/data");
-      setData(response?.data?.dataCollections);
+      // /data is paginated: follow next_cursor until the last page
+      let rows = [];
+      let cursor = null;
+      do {
+        const response = await api.get("/data", {
+          params: { limit: 500, fields: "url,title,information", ...(cursor ? { cursor } : {}) },
+        });
+        rows = rows.concat(response?.data?.dataCollections || []);
+        cursor = response?.data?.next_cursor;
+      } while (cursor);
+      setData(rows);
     } catch (error) {
       console.error("Error fetching data", error);
     }